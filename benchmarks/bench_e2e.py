@@ -0,0 +1,93 @@
+"""Measures mim versions, download and install end to end against recorded responses
+
+Record the responses once, with network access:
+
+    python benchmarks/bench_e2e.py --record
+
+then measure offline, as often as needed, against a local stand-in server which
+replays them with a simulated latency and bandwidth:
+
+    python benchmarks/bench_e2e.py [--latency MS] [--bandwidth KIB_PER_S] [--runs N]
+
+Every run starts from an empty cache in a fresh interpreter. The wall time, the number
+of HTTP requests and the bytes received are reported per case, the last two from the
+trace written by --trace-out.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mim.util.StandIn import StandInServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    'versions': ['versions', '--name', 'LuckPerms'],
+    'download': ['download', '--name', 'Vault', '--id', '34315', '--version', '1.7.3', '--destination', '{tmp}/download'],
+    'install': ['install', '--file', os.path.join(ROOT, 'tests', 'config.json'), '--destination', '{tmp}/server'],
+}
+
+def run(case:list[str], env:dict) -> tuple[int, float, int, int]:
+    """Runs a case in a fresh cache, returning its exit code, wall time, request count and bytes received
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        trace = os.path.join(tmp, 'trace.json')
+        env = dict(env, MIM_CACHE_DIR=os.path.join(tmp, 'cache'), MIM_NO_DAEMON='1')
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-m', 'mim.mim', '--trace-out', trace, *[a.format(tmp=tmp) for a in case]], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode:
+            print(result.stderr, file=sys.stderr)
+        requests = []
+        if os.path.exists(trace):
+            with open(trace) as f:
+                requests = [e for e in json.load(f)['traceEvents'] if e['cat'] == 'http']
+        return result.returncode, elapsed, len(requests), sum(e['args']['bytes'] for e in requests)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=os.path.join(ROOT, 'benchmarks', 'fixtures'), help='Directory of recorded responses (default: benchmarks/fixtures)')
+    parser.add_argument('--record', action='store_true', help='Run every case once against the real APIs, recording the responses')
+    parser.add_argument('--latency', type=float, default=50, help='Milliseconds the stand-in server waits before each response (default: 50)')
+    parser.add_argument('--bandwidth', type=float, default=0, help='KiB/s at which the stand-in server sends each response body, 0 for unlimited (default: 0)')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('cases', nargs='*', help=f'Cases to run, from {", ".join(CASES)} (default: all)')
+    args = parser.parse_args()
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error(f'Unknown cases: {", ".join(sorted(unknown))}')
+    cases = {name: CASES[name] for name in args.cases or CASES}
+
+    env = dict(os.environ, MIM_HTTP_FIXTURES=args.fixtures)
+    env.pop('MIM_HTTP_STANDIN', None)
+    if args.record:
+        env['MIM_HTTP_MODE'] = 'record'
+        for name, case in cases.items():
+            code, elapsed, requests, size = run(case, env)
+            print(f'Recorded {name}: {requests} requests, {size / 1024:.1f} KiB in {elapsed:.1f} s' + (f' (exit code {code})' if code else ''))
+        return
+
+    env['MIM_HTTP_MODE'] = 'live'
+    with StandInServer(args.fixtures, latency=args.latency / 1000, bandwidth=args.bandwidth * 1024 or None) as server:
+        env['MIM_HTTP_STANDIN'] = server.url
+        print(f'{"Case":<10} {"Median ms":>10} {"Min ms":>8} {"Max ms":>8} {"Requests":>9} {"KiB":>9}')
+        for name, case in cases.items():
+            results = [run(case, env) for _ in range(args.runs)]
+            times = [r[1] for r in results]
+            failed = sum(1 for r in results if r[0])
+            print(f'{name:<10} {statistics.median(times) * 1000:>10.1f} {min(times) * 1000:>8.1f} {max(times) * 1000:>8.1f} {results[-1][2]:>9} {results[-1][3] / 1024:>9.1f}' + (f'  {failed} failed' if failed else ''))
+        if server.missing:
+            print(f'{len(set(server.missing))} requests had no recorded response, record again with --record', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Measures plugin resolution and server selection on large synthetic repositories
+
+In-memory repositories stand in for Paper and the plugin repositories: one lists
+thousands of server versions, the other answers for hundreds of plugins with hundreds
+of versions each. Each plugin version is compatible either with a wide window of server
+versions (dense) or with a couple of them (sparse). Every phase of the resolution is
+timed, then repeated under tracemalloc for its peak memory.
+
+Run with ``python benchmarks/bench_scale.py [--scale 0.25 0.5 1]``. The scales multiply
+the number of servers and plugins, so a resolution path that scales linearly keeps the
+time per plugin version constant across scales.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import gc
+import io
+import random
+import time
+import tracemalloc
+from typing import Callable
+
+from mim.mim import find_versions, resolve
+from mim.util.Cache import Cache
+from mim.util.Repository import Plugin, PluginAsset, PluginRepository, PluginVersion, Server, ServerRepository
+
+class SyntheticServerRepository(ServerRepository):
+    def __init__(self, count:int):
+        super().__init__(name='Paper', description='Synthetic Paper servers')
+        self.servers = [Server('Paper', f'1.{i // 50}.{i % 50}', f'1.{i // 50}.{i % 50}', self) for i in range(count)]
+
+    def list(self) -> list[Server]:
+        return self.servers
+
+class SyntheticPluginRepository(PluginRepository):
+    def __init__(self, servers:list[Server], plugins:int, versions:int, window:int, seed:int=0):
+        super().__init__(name='Synthetic', description='Synthetic plugins')
+        rng = random.Random(seed)
+        window = min(window, len(servers))
+        self.versions: dict[str, list[PluginVersion]] = {}
+        for p in range(plugins):
+            plugin = Plugin(f'Plugin{p}')
+            found = []
+            for v in range(versions):
+                # Later versions support later servers, with some jitter. The latest supports the latest servers, so every plugin set resolves
+                start = min(len(servers) - window, max(0, int(v / versions * (len(servers) - window)) + rng.randint(-window, window)))
+                if v == versions - 1:
+                    start = len(servers) - window
+                found.append(PluginVersion(plugin, f'{v // 100}.{v % 100}.0', self, tuple(servers[start:start + window])))
+            self.versions[plugin.name] = found
+
+    def search(self, plugin:Plugin) -> list[PluginVersion]|None:
+        return self.versions.get(plugin.name)
+
+    def listAssets(self, plugin_version:PluginVersion) -> list[PluginAsset]:
+        return [PluginAsset(f'{plugin_version.plugin.name}-{plugin_version.version}.jar', plugin_version)]
+
+def measure(function:Callable[[], object]) -> tuple[float, float]:
+    """Returns the seconds a call takes, and the peak MiB it allocates in a second call
+    """
+    gc.collect()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / 1048576
+
+def run(servers:int, plugins:int, versions:int, window:int) -> list[tuple[str, float, float]]:
+    """Runs every phase on fresh synthetic repositories, returning the time and peak memory of each
+    """
+    ServerRepository._registry = {}
+    PluginRepository._registry = {}
+    PluginRepository._cache = Cache(maxsize=plugins * 2, ttl=3600)
+    PluginRepository.catalog = ServerRepository.catalog = None
+    PluginRepository.offline = ServerRepository.offline = False
+
+    results = []
+    start = time.perf_counter()
+    server_repository = SyntheticServerRepository(servers)
+    SyntheticPluginRepository(server_repository.servers, plugins, versions, window)
+    results.append(('generate', time.perf_counter() - start, 0.0))
+
+    names = [f'Plugin{p}' for p in range(plugins)]
+    majors = servers // 50
+    rng = random.Random(1)
+    ranges = ['1.x.x'] + [f'>=1.{a}.0,<1.{a + rng.randint(1, 5)}' for a in (rng.randrange(majors) for _ in range(999))]
+    data = {'loader': 'paper', 'server': '1.x.x', 'plugins': [{'name': name} for name in names]}
+
+    phases = {
+        'search servers': lambda: [ServerRepository.searchAll(r) for r in ranges],
+        'search plugins': lambda: [PluginRepository.searchAll(Plugin(name)) for name in names],
+        'find_versions': lambda: [find_versions(name, None, 'paper', '1.x.x') for name in names],
+        'resolve': lambda: resolve(data),
+    }
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, phase in phases.items():
+            results.append((name, *measure(phase)))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', type=int, default=3000, help='Server versions at scale 1 (default: 3000)')
+    parser.add_argument('--plugins', type=int, default=200, help='Plugins at scale 1 (default: 200)')
+    parser.add_argument('--versions', type=int, default=500, help='Versions per plugin (default: 500)')
+    parser.add_argument('--dense', type=int, default=50, help='Servers each plugin version supports with dense compatibility (default: 50)')
+    parser.add_argument('--sparse', type=int, default=2, help='Servers each plugin version supports with sparse compatibility (default: 2)')
+    parser.add_argument('--scale', type=float, nargs='+', default=[0.25, 0.5, 1], help='Multipliers of the servers and plugins (default: 0.25 0.5 1)')
+    args = parser.parse_args()
+
+    print(f'{"Compatibility":<14} {"Scale":>5} {"Servers":>8} {"Versions":>9} {"Phase":<15} {"ms":>9} {"Peak MiB":>9} {"us/version":>11}')
+    for density, window in (('dense', args.dense), ('sparse', args.sparse)):
+        for scale in args.scale:
+            servers = max(50, int(args.servers * scale))
+            plugins = max(1, int(args.plugins * scale))
+            total = plugins * args.versions
+            for phase, elapsed, peak in run(servers, plugins, args.versions, window):
+                print(f'{density:<14} {scale:>5g} {servers:>8} {total:>9} {phase:<15} {elapsed * 1000:>9.1f} {peak:>9.1f} {elapsed / total * 1e6:>11.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Measures the startup time of the mim CLI
+
+Each case runs in a fresh interpreter, as automated callers do. Run with
+``python benchmarks/bench_startup.py [--runs N]``.
+"""
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = {
+    'python (baseline)': ['-c', 'pass'],
+    'import mim.mim': ['-c', 'import mim.mim'],
+    'mim --help': ['-m', 'mim.mim', '--help'],
+    'mim rollback (no repositories)': ['-m', 'mim.mim', 'rollback', '-d', '{tmp}'],
+    'mim versions (parse and configure only)': ['-c', 'import sys, mim.mim as m; a = m.build_parser().parse_args(sys.argv[1:]); m.configure(a)', 'versions', '-n', 'Example'],
+}
+
+def measure(args:list[str], runs:int, env:dict) -> list[float]:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, MIM_CACHE_DIR=tmp, MIM_NO_DAEMON='1')
+        print(f'{"Case":<42} {"Median ms":>10} {"Min ms":>8} {"Max ms":>8}')
+        for name, case in CASES.items():
+            times = measure([a.format(tmp=tmp) for a in case], args.runs, env)
+            print(f'{name:<42} {statistics.median(times) * 1000:>10.1f} {min(times) * 1000:>8.1f} {max(times) * 1000:>8.1f}')
+
+if __name__ == '__main__':
+    main()
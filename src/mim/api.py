@@ -0,0 +1,542 @@
+"""In-process API for planning and applying installs
+
+Resolving configurations and changing server directories are separate steps: plan() and
+plan_many() return InstallPlan objects describing every file an install would add,
+remove or keep, without touching the destinations, and apply() or apply_many() carry
+them out. Repository metadata stays cached in the process between calls, so a
+long-running caller pays for each search once per cache lifetime::
+
+    from mim import api
+
+    api.configure(cache_dir='/var/cache/mim')
+    plans = api.plan_many([('lobby.yaml', '/srv/lobby'), ('survival.yaml', '/srv/survival')])
+    for plan in plans:
+        print(plan.to_dict())
+    api.apply_many([plan for plan in plans if plan.changed], atomic=True)
+"""
+from __future__ import annotations
+import argparse
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from mim.mim import config_plugin, configure as configure_cli, fetch_artifacts, filter_versions, load_config, place_artifact, prefetch_metadata, resolve, select_assets
+from mim.util.Artifacts import ArtifactCache
+from mim.util.Pipeline import FetchPipeline
+from mim.util.Repository import OfflineError, Plugin, PluginAsset, PluginRepository, PluginVersion, Server, ServerRepository
+from mim.util.Staging import StagedDirectory
+from mim.util.Trace import tracer
+
+if TYPE_CHECKING:
+    from mim.util.Verify import Manifest
+
+class FileAction:
+    """A file an install adds to, removes from or keeps in a directory
+    """
+    __slots__ = ('action', 'directory', 'filename', 'artifact', 'checksum')
+
+    def __init__(self, action:str, directory:Path, filename:str, artifact:Server|PluginAsset|None=None, checksum:str|None=None):
+        self.action = action
+        self.directory = directory
+        self.filename = filename
+        self.artifact = artifact
+        # The published checksum of an added file, or the hash the manifest recorded for an installed one
+        self.checksum = checksum
+
+    @property
+    def path(self) -> Path:
+        return self.directory / self.filename
+
+    @property
+    def url(self) -> str|None:
+        return self.artifact.url if self.action == 'add' else None
+
+    def to_dict(self) -> dict:
+        return {'action': self.action, 'path': str(self.path), 'url': self.url, 'checksum': self.checksum}
+
+class Change:
+    """The server or one plugin of an install plan, with the files that install it
+    """
+    __slots__ = ('kind', 'target', 'installed', 'files')
+
+    def __init__(self, kind:str, target:Server|PluginVersion, installed:list, files:list[FileAction]):
+        self.kind = kind
+        self.target = target
+        self.installed = installed
+        self.files = files
+
+    @property
+    def name(self) -> str:
+        return self.target.name if self.kind == 'server' else self.target.plugin.name
+
+    @property
+    def version(self) -> str:
+        return self.target.server_version if self.kind == 'server' else self.target.version
+
+    @property
+    def installedVersion(self) -> str|None:
+        if not self.installed:
+            return None
+        return self.installed[0].server_version if self.kind == 'server' else self.installed[0].version
+
+    @property
+    def action(self) -> str:
+        """keep, install, update, or reinstall when a forced install replaces the same version
+        """
+        if not self.adds:
+            return 'keep'
+        if not self.installed:
+            return 'install'
+        return 'reinstall' if self.installed[0] == self.target else 'update'
+
+    @property
+    def adds(self) -> list[FileAction]:
+        return [f for f in self.files if f.action == 'add']
+
+    @property
+    def removes(self) -> list[FileAction]:
+        return [f for f in self.files if f.action == 'remove']
+
+    def to_dict(self) -> dict:
+        return {
+            'kind': self.kind,
+            'name': self.name,
+            'version': self.version,
+            'repository': self.target.repository.name,
+            'installed': self.installedVersion,
+            'action': self.action,
+            'files': [f.to_dict() for f in self.files],
+        }
+
+def _recorded(manifest:Manifest, filename:str) -> str|None:
+    entry = manifest.get(filename)
+    return f'sha256:{entry["sha256"]}' if entry and entry.get('sha256') else None
+
+class InstallPlan:
+    """The server and plugin versions resolved for a configuration, and the files installing them changes
+    """
+    __slots__ = ('config', 'destination', 'data', 'server', 'plugins', 'warnings')
+
+    def __init__(self, config:str|None, destination:Path, data:dict, server:Server, plugin_versions:list[PluginVersion], force:bool=False, warnings:list[str]|None=None):
+        """Compares a resolved configuration with the files installed in a destination
+
+        Parameters
+        ----------
+        config : str, optional
+            The configuration file, or None if the configuration was given as a dict
+        destination : Path
+            The server directory
+        data : dict
+            The configuration
+        server : Server
+            The resolved server
+        plugin_versions : list[PluginVersion]
+            The resolved plugin versions
+        force : bool, optional
+            Whether to reinstall files which are up to date, by default False
+        warnings : list[str], optional
+            Warnings of the resolution, such as servers selected at risk, by default None
+        """
+        self.config = config
+        self.destination = destination = Path(destination)
+        self.data = data
+        self.warnings = warnings or []
+
+        from mim.util.Verify import Manifest
+        manifest = Manifest(str(destination))
+        current = server.installedVersions(destination)
+        if force or not current or current[0] != server:
+            files = [FileAction('add', destination, server.asset, server)]
+            files += [FileAction('remove', destination, s.asset, s, _recorded(manifest, s.asset)) for s in current if s.asset != server.asset]
+        else:
+            files = [FileAction('keep', destination, server.asset, server, _recorded(manifest, server.asset))]
+        self.server = Change('server', server, current, files)
+
+        plugin_dest = destination / 'plugins'
+        manifest = Manifest(str(plugin_dest))
+        self.plugins: list[Change] = []
+        for version in plugin_versions:
+            current = version.plugin.installedVersions(plugin_dest)
+            if force or not current or current[0] != version:
+                assets = select_assets(data, version)
+                files = [FileAction('add', plugin_dest, a.filename, a, ':'.join(a.checksum) if a.checksum else None) for a in assets]
+                added = {a.filename for a in assets}
+                files += [
+                    FileAction('remove', plugin_dest, a.filename, a, _recorded(manifest, a.filename))
+                    for v in current for a in v.assets if a.filename not in added and (plugin_dest / a.filename).is_file()
+                ]
+            else:
+                files = [FileAction('keep', plugin_dest, a.filename, a, _recorded(manifest, a.filename)) for a in current[0].assets if (plugin_dest / a.filename).is_file()]
+            self.plugins.append(Change('plugin', version, current, files))
+
+    @property
+    def changes(self) -> list[Change]:
+        """The server and plugins the plan installs or updates
+        """
+        return [change for change in [self.server, *self.plugins] if change.action != 'keep']
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.changes)
+
+    @property
+    def artifacts(self) -> list[Server|PluginAsset]:
+        """The server and plugin files the plan adds
+        """
+        return [f.artifact for change in [self.server, *self.plugins] for f in change.adds]
+
+    def to_dict(self) -> dict:
+        return {
+            'config': self.config,
+            'destination': str(self.destination),
+            'changed': self.changed,
+            'server': {**self.server.to_dict(), 'minecraft_version': self.server.target.minecraft_version},
+            'plugins': [change.to_dict() for change in self.plugins],
+            'warnings': self.warnings,
+        }
+
+def configure(cache_dir:str|None=None, mirror:str|None=None, offline:bool=False, bandwidth:str|float|None=None, max_downloads:int|None=None):
+    """Registers the repositories, as the global options of the command line do
+
+    Planning configures the default repositories on first use, so this is only needed for
+    other options. Calling it again drops the metadata cached so far.
+
+    Parameters
+    ----------
+    cache_dir : str, optional
+        The directory of the catalog and caches, by default $MIM_CACHE_DIR or ~/.cache/mim
+    mirror : str, optional
+        A mirror directory or URL created by mim mirror to install from, by default None
+    offline : bool, optional
+        Whether to use only the catalog and the artifact cache, by default False
+    bandwidth : str | float, optional
+        The download rate shared by every process using the cache directory, by default None
+    max_downloads : int, optional
+        The concurrent downloads of every process using the cache directory, by default None
+    """
+    if cache_dir:
+        os.environ['MIM_CACHE_DIR'] = cache_dir
+    configure_cli(argparse.Namespace(mirror=mirror, offline=offline, bandwidth=bandwidth, max_downloads=max_downloads))
+
+def refresh():
+    """Drops the cached repository metadata, so the next plan searches again
+    """
+    PluginRepository._cache.invalidate()
+
+def _ensure_configured():
+    if not PluginRepository._registry and not ServerRepository._registry:
+        configure()
+
+class _Speculation:
+    """Submits the files a configuration will probably add to a pipeline while its plugins are searched
+
+    An exact server version, and plugin versions pinned in the configuration, are known
+    before the resolution. Otherwise the highest server version is guessed, with the
+    newest plugin versions compatible with it; fetch() cancels the guesses the plans reject.
+    """
+
+    def __init__(self, pipeline:FetchPipeline, targets:list[tuple[dict, Path]], force:bool):
+        self.pipeline = pipeline
+        self.force = force
+        self.entries: dict[tuple, list[tuple[dict, dict, Path, set[Server], Server]]] = {}
+        for data, destination in targets:
+            loader = str(data.get('loader') or '')
+            try:
+                servers = [s for s in ServerRepository.searchAll(str(data.get('server', data.get('version', '1.x.x')))) if s.name.lower() == loader.lower()]
+            except Exception:
+                continue
+            if not servers:
+                continue
+            server = max(servers, key=lambda s: s.sort_key)
+            try:
+                current = server.installedVersions(destination)
+                if force or not current or current[0] != server:
+                    pipeline.submit(server)
+            except Exception:
+                pass
+            for entry in data.get('plugins', []):
+                if isinstance(entry, dict) and entry.get('name'):
+                    plugin = config_plugin(entry)
+                    self.entries.setdefault((plugin.name, plugin.id, plugin.repository), []).append((data, entry, destination, set(servers), server))
+
+    def found(self, plugin:Plugin, versions:list[PluginVersion]):
+        """Submits the assets of the version of a plugin each configuration will probably select
+        """
+        for data, entry, destination, servers, server in self.entries.get((plugin.name, plugin.id, plugin.repository), []):
+            candidates = filter_versions(versions, data.get('loader'), servers)
+            if entry.get('version'):
+                candidates = [v for v in candidates if v.version == entry['version']][:1]
+            else:
+                candidates = [v for v in candidates if not v.compatibility or server in v.compatibility]
+            if not candidates:
+                continue
+            version = max(candidates, key=lambda v: v.sort_key)
+            current = version.plugin.installedVersions(destination / 'plugins')
+            if self.force or not current or current[0] != version:
+                for asset in select_assets(data, version):
+                    self.pipeline.submit(asset)
+
+def plan(config:str|Path|dict, destination:str|Path='.', force:bool=False) -> InstallPlan:
+    """Resolves a configuration for a server directory, without changing it
+
+    Parameters
+    ----------
+    config : str | Path | dict
+        A JSON or YAML configuration file, or the configuration itself
+    destination : str | Path, optional
+        The server directory, by default the current directory
+    force : bool, optional
+        Whether to reinstall files which are up to date, by default False
+    """
+    return plan_many([(config, destination)], force=force)[0]
+
+def plan_many(targets:Iterable[tuple[str|Path|dict, str|Path]], jobs:int=4, force:bool=False, return_exceptions:bool=False, pipeline:FetchPipeline|None=None) -> list[InstallPlan|Exception]:
+    """Resolves several configurations, searching the union of their plugins once
+
+    Parameters
+    ----------
+    targets : Iterable[tuple[str | Path | dict, str | Path]]
+        Pairs of a configuration file or dict and its server directory
+    jobs : int, optional
+        The number of concurrent plugin searches, by default 4
+    force : bool, optional
+        Whether to reinstall files which are up to date, by default False
+    return_exceptions : bool, optional
+        Whether a configuration which fails to resolve returns its exception in place of
+        its plan, rather than raising it, by default False
+    pipeline : FetchPipeline, optional
+        If given, the files the plans will probably add are fetched into it while the
+        plugins are searched. Pass it to fetch() to wait for them, by default None
+
+    Returns
+    -------
+    list[InstallPlan | Exception]
+        The plan of each target, in order
+    """
+    _ensure_configured()
+    loaded = []
+    for config, destination in targets:
+        try:
+            data = config if isinstance(config, dict) else load_config(Path(config))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            data = e
+        loaded.append((None if isinstance(config, dict) else str(config), Path(destination), data))
+
+    plugins: dict[tuple, Plugin] = {}
+    for _, _, data in loaded:
+        for entry in data.get('plugins', []) if isinstance(data, dict) else []:
+            if isinstance(entry, dict) and entry.get('name'):
+                plugin = config_plugin(entry)
+                plugins.setdefault((plugin.name, plugin.id, plugin.repository), plugin)
+    found = None
+    if pipeline is not None:
+        with tracer.span('speculate'):
+            found = _Speculation(pipeline, [(data, destination) for _, destination, data in loaded if isinstance(data, dict)], force).found
+    with tracer.span('search plugins', plugins=len(plugins)):
+        prefetch_metadata(list(plugins.values()), jobs, found)
+
+    plans: list[InstallPlan|Exception] = []
+    for config, destination, data in loaded:
+        if isinstance(data, Exception):
+            plans.append(data)
+            continue
+        warnings = io.StringIO()
+        try:
+            with tracer.span('resolve', config=config or str(destination)):
+                server, plugin_versions = resolve(data, warnings)
+            plans.append(InstallPlan(config, destination, data, server, plugin_versions, force, warnings.getvalue().splitlines()))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            plans.append(e)
+    return plans
+
+def missing(plans:Iterable[InstallPlan]) -> list[str]:
+    """Lists the files the plans add which are neither in the artifact cache nor in a local repository
+    """
+    cache = ArtifactCache()
+    missing = []
+    for plan in plans:
+        for artifact in plan.artifacts:
+            name = artifact.asset if isinstance(artifact, Server) else artifact.filename
+            if not artifact.repository.local and not cache.get(artifact.repository.name, name):
+                missing.append(f'artifact {name} from {artifact.repository.name}')
+    return list(dict.fromkeys(missing))
+
+def fetch(plans:Iterable[InstallPlan], jobs:int=4, pipeline:FetchPipeline|None=None) -> dict:
+    """Fetches every file the plans add once, concurrently
+
+    Parameters
+    ----------
+    plans : Iterable[InstallPlan]
+        The plans to fetch the files of
+    jobs : int, optional
+        The number of concurrent downloads, by default 4
+    pipeline : FetchPipeline, optional
+        The pipeline given to plan_many(). Its fetches of files the plans do not add are
+        cancelled, and the others are waited for, by default None
+
+    Returns
+    -------
+    dict
+        The local path of each file, keyed by repository name and file name, to pass to apply()
+    """
+    artifacts = [artifact for plan in plans for artifact in plan.artifacts]
+    with tracer.span('download'):
+        if pipeline is None:
+            return fetch_artifacts(artifacts, jobs)
+        pipeline.keep(artifacts)
+        return pipeline.results(artifacts)
+
+def apply(plan:InstallPlan, fetched:dict|None=None, atomic:bool=False, out=None) -> list[FileAction]:
+    """Carries out a plan
+
+    Parameters
+    ----------
+    plan : InstallPlan
+        The plan to apply. The destination should not have changed since it was planned
+    fetched : dict, optional
+        Files already fetched by fetch(). Others are fetched as they are installed
+    atomic : bool, optional
+        Whether to build the new plugin set in plugins.staging and swap it in with renames, by default False
+    out : optional
+        A text stream for progress messages, by default None for none
+
+    Returns
+    -------
+    list[FileAction]
+        The files added and removed
+    """
+    from mim.util.Verify import Manifest
+
+    fetched = fetched or {}
+    out = out or io.StringIO()
+    def report(*values, **kwargs):
+        print(*values, file=out, **kwargs)
+    dest = plan.destination
+    applied: list[FileAction] = []
+
+    # Install the minecraft server
+    report(f'===== Server =====')
+    change, server = plan.server, plan.server.target
+    installed = plan.server.installed
+    if change.action != 'keep':
+        report(f'{server.name} Version: {server.server_version}' + (f' (Updated from {installed[0].server_version})' if installed else ''))
+        report(f'Minecraft Version: {server.minecraft_version}' + (f' (Updated from {installed[0].minecraft_version})' if installed else ''))
+        dest.mkdir(parents=True, exist_ok=True)
+        file = place_artifact(server, dest, fetched)
+        if not file:
+            raise FileNotFoundError(f'Download failed for server version {server.server_version}')
+        report(f'   Installed {os.path.basename(file)}')
+        applied.extend(change.adds)
+        manifest = Manifest(str(dest))
+        manifest.record(os.path.basename(file), repository=server.repository.name, version=server.server_version)
+
+        # Uninstall existing installations
+        with tracer.span('cleanup'):
+            for action in change.removes:
+                if not action.artifact.uninstall(dest):
+                    raise Exception(f'Failed to uninstall {action.filename}')
+                report(f'   Uninstalled {action.filename}')
+                applied.append(action)
+        manifest.save()
+    else:
+        report(f'{server.name} Version: {server.server_version} (Up to date)')
+        report(f'Minecraft Version: {server.minecraft_version} (Up to date)')
+
+    # Install server plugins
+    report(f'\n===== Plugins =====')
+    plugin_dest = dest / 'plugins'
+    staged = StagedDirectory(str(plugin_dest))
+    staged.recover()
+    plugin_dest.mkdir(parents=True, exist_ok=True)
+
+    # An atomic install builds the complete new plugin set beside the live one
+    target = plugin_dest
+    if atomic:
+        replaced = {action.filename for change in plan.plugins for action in change.removes}
+        target = Path(staged.stage(lambda name: name not in replaced))
+    manifest = Manifest(str(target))
+
+    for change in plan.plugins:
+        version = change.target
+        if change.action == 'keep':
+            report(f'{version.plugin.name} Version: {version.version} (Up to date)')
+            continue
+        report(f'{version.plugin.name} Version: {version.version}' + (f' (Updated from {change.installedVersion})' if change.installed else ''))
+
+        files = []
+        for action in change.adds:
+            file = place_artifact(action.artifact, target, fetched)
+            if not file:
+                raise FileNotFoundError(f'Download failed for {version.plugin.name} version {version.version} asset {action.filename}')
+            files.append(file)
+            manifest.record(os.path.basename(file), action.artifact.checksum, repository=version.repository.name, version=version.version)
+        if not files:
+            raise FileNotFoundError(f'Download failed for {version.plugin.name} version {version.version}')
+        for file in files:
+            report(f'   Installed {os.path.basename(file)}')
+        applied.extend(change.adds)
+
+        # Uninstall existing installations. An atomic install left them out of the staged set
+        with tracer.span('cleanup'):
+            for action in change.removes:
+                if not atomic and not action.artifact.uninstall(plugin_dest):
+                    raise Exception(f'Failed to uninstall {version.plugin.name} {action.filename}')
+                report(f'   Uninstalled {action.filename}')
+                applied.append(action)
+
+    manifest.save()
+    if atomic:
+        with tracer.span('swap'):
+            staged.commit()
+        report(f'Swapped in the new plugin set. The previous set is kept in {os.path.basename(staged.previous)} (undo with mim rollback)')
+    return applied
+
+def apply_many(plans:Iterable[InstallPlan], jobs:int=4, atomic:bool=False, return_exceptions:bool=False) -> list[list[FileAction]|Exception]:
+    """Fetches the files of several plans once, then applies the plans concurrently
+
+    Offline, fails before changing any directory if a file is not available locally.
+
+    Parameters
+    ----------
+    plans : Iterable[InstallPlan]
+        The plans to apply
+    jobs : int, optional
+        The number of concurrent downloads and installs, by default 4
+    atomic : bool, optional
+        Whether to swap each new plugin set in with renames, by default False
+    return_exceptions : bool, optional
+        Whether a plan which fails returns its exception, rather than raising it once
+        every plan has been applied, by default False
+
+    Returns
+    -------
+    list[list[FileAction] | Exception]
+        The files each plan added and removed
+    """
+    plans = list(plans)
+    if PluginRepository.offline:
+        absent = missing(plans)
+        if absent:
+            raise OfflineError(absent)
+    fetched = fetch(plans, jobs)
+
+    def run(plan:InstallPlan) -> list[FileAction]|Exception:
+        try:
+            with tracer.span('apply', destination=str(plan.destination)):
+                return apply(plan, fetched, atomic)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(run, plans))
+    if not return_exceptions:
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+    return results
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler
+from typing import Callable, List
+
+from mim.util.Cache import cache_directory, catalog_path
+from mim.util.Repository import Plugin, PluginRepository, ServerRepository
+
+def socket_path() -> str:
+    """Returns the Unix socket the daemon listens on, inside the cache directory."""
+    return os.path.join(cache_directory(), 'mim.sock')
+
+
+class _ThreadOutput:
+    """A stream which writes to a per-thread buffer while one is set, and to the wrapped stream otherwise."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def capture(self, buffer):
+        self._local.buffer = buffer
+
+    def release(self):
+        self._local.buffer = None
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is not None:
+            buffer.append(text)
+            return len(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        if getattr(self._local, 'buffer', None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float | None = None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Daemon:
+    """Serves mim commands over HTTP on a Unix socket, keeping repository metadata warm.
+
+    The repositories, catalog and plugin search cache of the process are shared by every
+    request. A background thread reloads server lists and re-runs every cached plugin
+    search before it expires, so requests are answered from memory.
+    """
+
+    def __init__(self, handler: Callable[[List[str], str], int], options: dict, path: str | None = None, refresh: float = 300):
+        """Initializes a daemon
+
+        Parameters
+        ----------
+        handler : Callable[[List[str], str], int]
+            Runs a command line in a working directory and returns its exit code
+        options : dict
+            The global options the daemon was configured with. Requests with other options are refused
+        path : str, optional
+            The Unix socket path, by default socket_path()
+        refresh : float, optional
+            Seconds between background refreshes, by default 300
+        """
+        self.handler = handler
+        self.options = options
+        self.path = path or socket_path()
+        self.refresh_interval = refresh
+        self.started = time.time()
+        self.requests = 0
+        self._stop = threading.Event()
+        self._server: _Server | None = None
+        self._catalog_mtime = Daemon._mtime(catalog_path())
+
+    @staticmethod
+    def _mtime(path: str) -> float | None:
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Reloads changed server lists and catalog, then re-runs every cached plugin search."""
+        changed = [repo.refresh() for repo in ServerRepository.repositories()]
+
+        # Pick up a catalog written by mim sync since the daemon started
+        mtime = Daemon._mtime(catalog_path())
+        if mtime != self._catalog_mtime:
+            from mim.util.Catalog import Catalog
+            self._catalog_mtime = mtime
+            catalog = Catalog(catalog_path()) if mtime is not None else None
+            PluginRepository.catalog = ServerRepository.catalog = catalog
+            changed.append(True)
+
+        if any(changed):
+            # Cached versions refer to the previous Server objects
+            PluginRepository._cache.invalidate()
+            return
+
+        for key in PluginRepository._cache.keys():
+            repo = PluginRepository.repository(key[0])
+            if repo is None:
+                continue
+            try:
+                PluginRepository._cache.set(key, PluginRepository._lookup(repo, Plugin(key[1], id=key[2])))
+            except Exception as e:
+                print(f'Failed to refresh {key[1]} from {repo.name}: {e}', file=sys.stderr)
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception:
+                traceback.print_exc()
+
+    def run(self, argv: List[str], cwd: str) -> tuple[int, str, str]:
+        """Runs a command line, returning its exit code and captured output."""
+        stdout, stderr = [], []
+        sys.stdout.capture(stdout)
+        sys.stderr.capture(stderr)
+        try:
+            code = self.handler(argv, cwd)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 2
+        finally:
+            sys.stdout.release()
+            sys.stderr.release()
+        self.requests += 1
+        return code, ''.join(stdout), ''.join(stderr)
+
+    def _handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: dict):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path != '/status':
+                    return self._reply(404, {'error': f'Unknown path {self.path}'})
+                self._reply(200, {'pid': os.getpid(), 'started': daemon.started, 'requests': daemon.requests, 'options': daemon.options})
+
+            def do_POST(self):
+                if self.path != '/run':
+                    return self._reply(404, {'error': f'Unknown path {self.path}'})
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                if request.get('options') != daemon.options:
+                    return self._reply(409, {'error': 'The daemon was started with other options', 'options': daemon.options})
+                code, stdout, stderr = daemon.run(request['argv'], request['cwd'])
+                self._reply(200, {'code': code, 'stdout': stdout, 'stderr': stderr})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self):
+        """Listens until interrupted or terminated, then removes the socket."""
+        if os.path.exists(self.path):
+            if status(self.path) is not None:
+                raise Exception(f'A mim daemon is already listening on {self.path}')
+            os.remove(self.path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        sys.stdout = _ThreadOutput(sys.stdout)
+        sys.stderr = _ThreadOutput(sys.stderr)
+        # Other users must not connect between the bind and the chmod, so bind with a private umask
+        umask = os.umask(0o077)
+        try:
+            self._server = _Server(self.path, self._handler())
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        refresher = threading.Thread(target=self._refresh_loop, name='mim-refresh', daemon=True)
+        refresher.start()
+
+        main = threading.current_thread() is threading.main_thread()
+        if main:
+            previous = signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self.shutdown).start())
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if main:
+                signal.signal(signal.SIGTERM, previous)
+            self._stop.set()
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            sys.stdout = sys.stdout._stream
+            sys.stderr = sys.stderr._stream
+
+    def shutdown(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def status(path: str | None = None) -> dict | None:
+    """Returns the status of a running daemon, or None if none is listening."""
+    connection = _UnixHTTPConnection(path or socket_path(), timeout=2)
+    try:
+        connection.request('GET', '/status')
+        response = connection.getresponse()
+        return json.loads(response.read()) if response.status == 200 else None
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def request(argv: List[str], options: dict, path: str | None = None) -> tuple[int, str, str] | None:
+    """Runs a command line in a running daemon.
+
+    Returns
+    -------
+    tuple[int, str, str] | None
+        The exit code and the captured stdout and stderr, or None if no daemon with the
+        same options is listening
+    """
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    connection = _UnixHTTPConnection(path)
+    try:
+        body = json.dumps({'argv': argv, 'cwd': os.getcwd(), 'options': options})
+        connection.request('POST', '/run', body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        if response.status != 200:
+            return None
+        result = json.loads(response.read())
+    except OSError:
+        return None
+    finally:
+        connection.close()
+    return result['code'], result['stdout'], result['stderr']
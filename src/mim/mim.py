@@ -2,72 +2,286 @@
 from __future__ import annotations
 
 import argparse
+import io
 import sys
 import os
 from pathlib import Path
-from typing import List
-from packaging.version import Version, InvalidVersion
+from typing import TYPE_CHECKING, Callable, List
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-from mim.util.GithubRepository import GithubRepository
-from mim.util.ModrinthRepository import ModrinthRepository
-from mim.util.SpigetRepository import SpigetRepository
-from mim.util.PaperRepository import PaperRepository
-from mim.util.GeyserRepository import GeyserRepository
-from mim.util.Repository import Plugin, PluginRepository, PluginVersion, PluginAsset, Server, ServerRepository
+from mim.util.Repository import OfflineError, Plugin, PluginRepository, PluginVersion, PluginAsset, Server, ServerRepository
+from mim.util.Artifacts import ArtifactCache
+from mim.util.Throttle import DownloadBudget
+from mim.util.Files import place_file
+from mim.util.Pipeline import FetchPipeline
+from mim.util.Staging import StagedDirectory
+from mim.util.Routing import RoutingTable
+from mim.util.Versioning import VersionRange
+from mim.util.Trace import tracer
+from mim.util.Cache import catalog_path
+import importlib
 import re
 import json
-import yaml
 
-def find_versions(name: str | None, id: str | None, loader: str|None, server: str|None) -> List[PluginVersion]:
-    """Find plugin versions by name and/or id using registered repositories."""
-    if not name and not id:
-        raise ValueError('name or id must be provided')
+if TYPE_CHECKING:
+    from mim.util.Catalog import Catalog
 
-    # Build Plugin object and search all repositories
-    plugin = Plugin(name, id=id)
-    versions = plugin.versions
+def filter_versions(versions: List[PluginVersion], loader: str | None, servers: set | None) -> List[PluginVersion]:
+    """Keeps the plugin versions compatible with a loader and with any of a set of servers."""
     # Filter by loaders if specified
     if loader:
         versions = [v for v in versions if not v.compatibility or any(s.name.lower() == loader.lower() for s in v.compatibility)]
     # Filter by server versions if specified
-    if server:
-        servers = ServerRepository.searchAll(server)
+    if servers is not None:
         versions = [v for v in versions if not v.compatibility or any(s in servers for s in v.compatibility)]
     return versions
 
 
+def find_versions(name: str | None, id: str | None, loader: str|None, server: str|None, repository: str | None = None) -> List[PluginVersion]:
+    """Find plugin versions by name and/or id using registered repositories, or only the given repository."""
+    if not name and not id:
+        raise ValueError('name or id must be provided')
+
+    # Build Plugin object and search all repositories
+    plugin = Plugin(name, id=id, repository=repository)
+    servers = set(ServerRepository.searchAll(server)) if server else None
+    return filter_versions(plugin.versions, loader, servers)
+
+
+def query_targets(args) -> tuple[List[tuple[Plugin, str | None]], str | None, str | None]:
+    """Collects the plugins, with an optional version each, and the filters of a versions or assets query.
+
+    Names and ids given on the command line are paired in order. A config file adds its
+    plugins, and its loader and server unless given on the command line.
+    """
+    names = getattr(args, 'name', None) or []
+    ids = getattr(args, 'id', None) or []
+    names = [names] if isinstance(names, str) else list(names)
+    ids = [ids] if isinstance(ids, str) else list(ids)
+    version = getattr(args, 'version', None)
+    repository = getattr(args, 'repo', None)
+    loader, server = args.loader, args.server
+
+    if not names:
+        pairs = [(None, i) for i in ids]
+    elif not ids:
+        pairs = [(n, None) for n in names]
+    elif len(names) == len(ids):
+        pairs = list(zip(names, ids))
+    else:
+        raise ValueError(f'Got {len(names)} names and {len(ids)} ids. Give one --id per --name, or none')
+
+    targets: dict[tuple, tuple[Plugin, str | None]] = {}
+    for name, id in pairs:
+        targets.setdefault((name, id, repository), (Plugin(name, id=id, repository=repository), version))
+    for input_file in getattr(args, 'file', None) or []:
+        data = load_config(Path(input_file))
+        loader = loader or data.get('loader')
+        # Configs may name the server range "version", as resolve() accepts
+        spec = data.get('server', data.get('version'))
+        server = server or (str(spec) if spec else None)
+        for entry in data.get('plugins', []):
+            if isinstance(entry, dict) and entry.get('name'):
+                plugin = config_plugin(entry, repository)
+                targets.setdefault((plugin.name, plugin.id, plugin.repository), (plugin, version or entry.get('version')))
+
+    if not targets:
+        raise ValueError('name or id must be provided')
+    return list(targets.values()), loader, server
+
+
+def stream_versions(plugins: List[Plugin], loader: str | None, server: str | None, jobs: int = 8):
+    """Searches every repository for every plugin concurrently.
+
+    Yields
+    ------
+    tuple[Plugin, PluginRepository, List[PluginVersion], Exception | None]
+        The filtered versions each repository returned for a plugin, or the error it
+        raised, in the order the repositories answer
+    """
+    servers = set(ServerRepository.searchAll(server)) if server else None
+    targets = {id(plugin): PluginRepository.repositoriesFor(plugin) for plugin in plugins}
+    # Plugins searched in every repository learn their route from the repositories which have them
+    found = {id(plugin): [] for plugin in plugins if targets[id(plugin)][1]}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(PluginRepository.searchRepository, repo, plugin): (plugin, repo) for plugin in plugins for repo in targets[id(plugin)][0]}
+        for future in as_completed(futures):
+            plugin, repo = futures[future]
+            try:
+                versions = future.result() or []
+            except Exception as e:
+                found.pop(id(plugin), None)
+                yield plugin, repo, [], e
+                continue
+            if versions and id(plugin) in found:
+                found[id(plugin)].append(repo.name)
+            yield plugin, repo, filter_versions(versions, loader, servers), None
+    if PluginRepository.routes is not None:
+        for plugin in plugins:
+            if id(plugin) in found:
+                PluginRepository.routes.record(plugin.name, plugin.id, found[id(plugin)])
+
+
+def emit(args, record: dict, text: str | None):
+    """Prints a result of a query as text or as a JSON line, as soon as it is known."""
+    if getattr(args, 'format', 'text') == 'ndjson':
+        print(json.dumps(record), flush=True)
+    elif text is not None:
+        print(text, flush=True)
+
+
+def query(args, describe: Callable[[PluginVersion, str | None], tuple[dict, str] | None]):
+    """Streams the versions found for the plugins of a versions or assets query.
+
+    describe returns the JSON record and text line of a version, or None to skip it.
+    Plugins without any version are reported, and the query fails after reporting if
+    any search failed.
+    """
+    targets, loader, server = query_targets(args)
+    wanted = dict(targets)
+    batch = len(targets) > 1
+    found = {plugin: 0 for plugin, _ in targets}
+    failed = 0
+
+    for plugin, repo, versions, error in stream_versions([p for p, _ in targets], loader, server, getattr(args, 'jobs', None) or 8):
+        if error is not None:
+            failed += 1
+            emit(args, {'plugin': plugin.name, 'id': plugin.id, 'repository': repo.name, 'error': str(error)}, None)
+            print(f'Searching {plugin.name or plugin.id} in {repo.name} failed: {error}', file=sys.stderr)
+            continue
+        found[plugin] += len(versions)
+        for v in versions:
+            described = describe(v, wanted[plugin])
+            if described is not None:
+                emit(args, *described)
+
+    for plugin, _ in targets:
+        if not found[plugin]:
+            emit(args, {'plugin': plugin.name, 'id': plugin.id, 'versions': 0}, f'No versions found for {plugin.name or plugin.id}' if batch else 'No versions found')
+    if failed:
+        raise Exception(f'{failed} repository searches failed')
+
+
 def list_versions(args):
-    versions = find_versions(args.name, args.id, args.loader, args.server)
-    if not versions:
-        print('No versions found')
-        return
-    for v in versions:
+    def describe(v: PluginVersion, version: str | None):
+        if version and v.version != version:
+            return None
         repo = v.repository.name if v.repository else 'unknown'
-        compat = ','.join([s.minecraft_version for s in v.compatibility]) if v.compatibility else 'any'
-        print(f'{v.plugin.name} {v.version} (repo={repo}, compatibility={compat})')
+        compat = [s.minecraft_version for s in v.compatibility] if v.compatibility else None
+        record = {'plugin': v.plugin.name, 'id': v.plugin.id, 'repository': repo, 'version': v.version, 'compatibility': compat}
+        return record, f'{v.plugin.name} {v.version} (repo={repo}, compatibility={",".join(compat) if compat else "any"})'
+    query(args, describe)
 
 
 def list_assets(args):
-    # Need plugin name/id and version
-    versions = find_versions(args.name, args.id, args.loader, args.server)
-    if not versions:
-        print('No versions found')
+    def describe(v: PluginVersion, version: str | None):
+        # Assets may need a request per version, so only requested versions are listed
+        if not version or v.version != version:
+            return None
+        assets = [a.filename for a in v.assets]
+        record = {'plugin': v.plugin.name, 'id': v.plugin.id, 'repository': v.repository.name, 'version': v.version, 'assets': assets}
+        return record, '\n'.join([f'Assets for {v.plugin.name} {v.version}:', *[f' - {a}' for a in assets]])
+    query(args, describe)
+
+
+def compatibility_matrix(plugins: List[tuple[Plugin, str | None]], servers: List[Server]) -> tuple[List[List[PluginVersion | None]], int]:
+    """Finds the newest version of each plugin compatible with each server.
+
+    Each version's compatibility is turned into a bitset over the servers once. Walking
+    the versions from newest to oldest, a version fills the cells of the servers it
+    supports that no newer version filled.
+
+    Returns
+    -------
+    tuple[List[List[PluginVersion | None]], int]
+        A row per plugin with a cell per server, and the bitset of the servers supported
+        by every plugin
+    """
+    index = {server: i for i, server in enumerate(servers)}
+    everything = (1 << len(servers)) - 1
+    common = everything
+    rows = []
+    for plugin, pinned in plugins:
+        versions = PluginRepository.searchAll(plugin)
+        if pinned:
+            versions = [v for v in versions if v.version == pinned]
+        row: List[PluginVersion | None] = [None] * len(servers)
+        remaining = everything
+        for v in sorted(versions, key=lambda v: v.sort_key, reverse=True):
+            if not remaining:
+                break
+            mask = everything
+            if v.compatibility:
+                mask = 0
+                for s in v.compatibility:
+                    if s in index:
+                        mask |= 1 << index[s]
+            new = mask & remaining
+            remaining &= ~mask
+            while new:
+                low = new & -new
+                row[low.bit_length() - 1] = v
+                new ^= low
+        common &= everything & ~remaining
+        rows.append(row)
+    return rows, common
+
+
+def matrix(args):
+    targets, loader, server = query_targets(args)
+    servers = ServerRepository.searchAll(server or '1.x.x')
+    if loader:
+        servers = [s for s in servers if s.name.lower() == loader.lower()]
+    if not servers:
+        raise ValueError(f'No server version {server or "1.x.x"} found' + (f' with loader {loader}' if loader else ''))
+    servers = sorted(set(servers), key=lambda s: s.sort_key)
+
+    prefetch_metadata([plugin for plugin, _ in targets], max(1, args.jobs or 8))
+    rows, common = compatibility_matrix(targets, servers)
+
+    several_loaders = len({s.name for s in servers}) > 1
+    columns = [f'{s.name} {s.minecraft_version}' if several_loaders else s.minecraft_version for s in servers]
+    names = [plugin.name or plugin.id for plugin, _ in targets]
+    highest = common.bit_length() - 1 if common else None
+
+    if args.format == 'json':
+        print(json.dumps({
+            'servers': columns,
+            'plugins': {name: {column: v.version if v else None for column, v in zip(columns, row)} for name, row in zip(names, rows)},
+            'supported_by_all': [column for i, column in enumerate(columns) if common >> i & 1],
+            'highest_supported_by_all': columns[highest] if highest is not None else None,
+        }, indent=2))
+        return
+
+    if args.format == 'csv':
+        import csv
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['plugin', *columns])
+        for name, row in zip(names, rows):
+            writer.writerow([name, *[v.version if v else '' for v in row]])
+        writer.writerow(['supported by all', *['yes' if common >> i & 1 else '' for i in range(len(columns))]])
         return
-    
-    for v in versions:
-        if args.version and v.version == args.version:
-            print(f'Assets for {v.plugin.name} {v.version}:')
-            for a in v.assets:
-                print(f' - {a.filename}')
+
+    # Newest server versions first, so the upgrade targets are on the left
+    order = list(reversed(range(len(servers))))
+    header = [f'*{columns[i]}*' if i == highest else columns[i] for i in order]
+    table = [[name, *[row[i].version if row[i] else '-' for i in order]] for name, row in zip(names, rows)]
+    widths = [max(len(cell) for cell in column) for column in zip(['Plugin', *header], *table)]
+    for line in [['Plugin', *header], *table]:
+        print('  '.join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip())
+    if highest is None:
+        print('No server version is supported by every plugin')
+    else:
+        print(f'Highest server version supported by every plugin: {columns[highest]} (marked *)')
 
 
 def download(args):
     dest = Path(args.destination) if args.destination else Path.cwd()
     dest.mkdir(parents=True, exist_ok=True)
 
-    versions = find_versions(args.name, args.id, args.loader, args.server)
+    versions = find_versions(args.name, args.id, args.loader, args.server, args.repo)
     if not versions:
         print('No versions found')
         return
@@ -99,52 +313,136 @@ def download(args):
             except Exception as e:
                 print(f'  - failed to download {a.filename}: {e}')
 
-def install(args):
-
-    # locate input json attribute
-    input_file = None
-    for attr in ('file', 'json', 'input', 'yaml'):
-        if hasattr(args, attr) and getattr(args, attr):
-            input_file = getattr(args, attr)
-            break
-    if not input_file:
-        raise ValueError('No input file specified (expected config.file / config.json / config.yaml / config.input)')
-
-    in_path = Path(input_file)
+def load_config(in_path: Path) -> dict:
+    """Reads a JSON or YAML server specification file."""
     if not in_path.exists():
         raise FileNotFoundError(f'Input file not found: {in_path}')
 
-    dest = None
-    for dattr in ('destination', 'dest', 'directory'):
-        if hasattr(args, dattr) and getattr(args, dattr):
-            dest = Path(getattr(args, dattr))
-            break
-    dest = dest or Path.cwd()
-    dest.mkdir(parents=True, exist_ok=True)
-
     try:
         data = json.loads(in_path.read_text(encoding='utf-8'))
     except json.JSONDecodeError as e:
         try:
+            import yaml
             data = yaml.safe_load(in_path.read_text(encoding='utf-8'))
         except:
             raise Exception(f'Unable to read from {in_path}')
     except:
         raise Exception(f'Unable to read from {in_path}')
 
-
     if not isinstance(data, dict):
         raise TypeError('Input json must be a dict defining server and plugin specifications')
-    
-    server = data.get('version','1.x.x')
+    return data
+
+
+def config_plugin(entry: dict, repository: str | None = None) -> Plugin:
+    """Creates the plugin of a config entry, pinned to its "repository" or else to the given repository."""
+    return Plugin(entry['name'], id=entry.get('id'), repository=entry.get('repository') or repository)
+
+
+def config_plugins(files: List[str] | None, name: str | None = None, id: str | None = None, repository: str | None = None) -> List[Plugin]:
+    """Collects the unique plugins named by config files and/or a --name/--id pair."""
+    plugins: dict[tuple, Plugin] = {}
+    for input_file in files or []:
+        for entry in load_config(Path(input_file)).get('plugins', []):
+            if isinstance(entry, dict) and entry.get('name'):
+                plugin = config_plugin(entry, repository)
+                plugins.setdefault((plugin.name, plugin.id, plugin.repository), plugin)
+    if name or id:
+        plugins.setdefault((name, id, repository), Plugin(name, id=id, repository=repository))
+    return list(plugins.values())
+
+
+def sync_catalog(plugins: List[Plugin], max_age: float | None = None, jobs: int = 1, out=None, full: bool = False) -> Catalog:
+    """Synchronizes the server lists and the given plugins into the local catalog.
+
+    Repositories and plugins synced less than max_age seconds ago are skipped. full syncs
+    every version of the plugins rather than only the changes. Progress is printed to out.
+    """
+    from mim.util.Catalog import Catalog
+
+    out = out or sys.stdout
+    # Sync against the live server lists rather than a previously opened catalog
+    PluginRepository.catalog = ServerRepository.catalog = None
+    catalog = Catalog()
+    for repo in ServerRepository.repositories():
+        added = catalog.syncServers(repo, max_age)
+        print(f'{repo.name}: {added} new servers', file=out)
+
+    def sync_plugin(target: tuple[Plugin, PluginRepository]) -> str | None:
+        plugin, repo = target
+        try:
+            count = catalog.syncPlugin(repo, plugin, max_age, full)
+        except Exception as e:
+            return f'{plugin.name}: failed to sync from {repo.name}: {e}'
+        return f'{plugin.name}: {count} new, updated or removed versions from {repo.name}' if count else None
+
+    targets = [(plugin, repo) for plugin in plugins for repo in PluginRepository.repositoriesFor(plugin)[0]]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for message in pool.map(sync_plugin, targets):
+            if message:
+                print(message, file=out)
+    PluginRepository._cache.invalidate()
+    return catalog
+
+
+def sync(args):
+    if PluginRepository.offline:
+        raise ValueError('sync cannot run in offline mode')
+    plugins = config_plugins(args.file, args.name, args.id, args.repo)
+    if not plugins:
+        raise ValueError('No plugins specified (expected --file or --name/--id)')
+
+    catalog = sync_catalog(plugins, full=getattr(args, 'full', False))
+    print(f'Catalog updated: {catalog.path}')
+
+
+def select_assets(data: dict, version: PluginVersion) -> List[PluginAsset]:
+    """Returns the assets of a plugin version selected by its entry in a server specification."""
+    entry = next((e for e in data.get('plugins', []) if isinstance(e, dict) and e.get('name') == version.plugin.name), {})
+    assets_spec = entry.get('assets')
+    if not assets_spec:
+        return version.assets
+    try:
+        patterns = [re.compile(p) for p in assets_spec]
+    except re.error as e:
+        raise ValueError(f'Invalid regex in assets for {version.plugin.name}: {e}')
+    return [a for a in version.assets if any(p.search(a.filename) for p in patterns)]
+
+
+def compatible_servers(versions: List[PluginVersion], servers: List[Server]) -> List[Server]:
+    """Returns the servers, in order, that at least one of the plugin versions is compatible with."""
+    if any(not v.compatibility for v in versions):
+        return list(servers)
+    # One pass over the compatibility lists, rather than one per server
+    supported = set()
+    for v in versions:
+        supported.update(v.compatibility)
+    return [s for s in servers if s in supported]
+
+
+def resolve(data: dict, out=None) -> tuple[Server, List[PluginVersion]]:
+    """Selects the server and plugin versions satisfying a server specification, printing warnings to out.
+
+    In offline mode every missing piece of metadata is collected before failing, so the
+    raised OfflineError lists all of them at once.
+    """
+    out = out or sys.stdout
+    server = str(data.get('server', data.get('version', '1.x.x')))
     loader = data.get('loader')
     
     if not loader:
         raise ValueError('Input json must define a "loader" field for the server loader (e.g., paper, spigot, vanilla)')
-    
-    servers = [server for server in ServerRepository.searchAll(server) if server.name.lower() == loader.lower()]
 
-    if not servers:
+    VersionRange.parse(server)
+
+    missing = []
+    try:
+        servers = [server for server in ServerRepository.searchAll(server) if server.name.lower() == loader.lower()]
+    except OfflineError as e:
+        missing.extend(e.missing)
+        servers = []
+
+    if not servers and not missing:
         raise ValueError(f'No matching server found for version {server} and loader {loader}')
 
     unspecified_servers = servers.copy()
@@ -155,7 +453,7 @@ def install(args):
     specified_plugins = []
     for entry in data.get('plugins', []):
         if not isinstance(entry, dict):
-            print('Skipping non-dict entry in json')
+            print('Skipping non-dict entry in json', file=out)
             continue
         name = entry.get('name')
         version = entry.get('version')
@@ -165,7 +463,11 @@ def install(args):
         if not name:
             raise ValueError('Plugin entry missing "name"')
 
-        versions = find_versions(name, pid, loader, server)
+        try:
+            versions = find_versions(name, pid, loader, server, entry.get('repository'))
+        except OfflineError as e:
+            missing.extend(e.missing)
+            continue
 
         if version:
             versions = [v for v in versions if v.version == version]
@@ -186,155 +488,598 @@ def install(args):
         
         if version:
             specified_plugins.append(versions)
-            specified_servers = [s for s in specified_servers if any(not v.compatibility or s in v.compatibility for v in versions)]
+            specified_servers = compatible_servers(versions, specified_servers)
         else:
             unspecified_plugins.append(versions)
-            unspecified_servers = [s for s in unspecified_servers if any(not v.compatibility or s in v.compatibility for v in versions)]
+            unspecified_servers = compatible_servers(versions, unspecified_servers)
+
+    if missing:
+        raise OfflineError(list(dict.fromkeys(missing)))
 
     if not servers:
         raise ValueError(f'No server version {server} with loader {loader} found compatible with all plugins. Specify plugin versions manually to override.')
     
 
     # Select a server version
-    if not specified_servers:
-        print(f'No server version {server} with loader {loader} compatible with all plugins with unspecified versions. Continuing at risk')
-        servers = unspecified_servers
-    else:
-        servers = [s for s in specified_servers if s in unspecified_servers]
-
-    if not servers:
-        print(f'No server version {server} with loader {loader} compatible with all plugins. Continuing at risk')
-        servers = unspecified_servers
+    with tracer.span('select server'):
+        if not specified_servers:
+            print(f'No server version {server} with loader {loader} compatible with all plugins with unspecified versions. Continuing at risk', file=out)
+            servers = unspecified_servers
+        else:
+            unspecified = set(unspecified_servers)
+            servers = [s for s in specified_servers if s in unspecified]
 
-    servers.sort(key=lambda x: Version(x.server_version), reverse=True)
+        if not servers:
+            print(f'No server version {server} with loader {loader} compatible with all plugins. Continuing at risk', file=out)
+            servers = unspecified_servers
 
-    server = servers[0]
+        server = max(servers, key=lambda x: x.sort_key)
 
     # Select versions for unspecified plugins
     plugin_versions: list[PluginVersion] = []
 
-    for versions in unspecified_plugins:
-        versions = [v for v in versions if not v.compatibility or server in v.compatibility]
-        try:
-            versions.sort(key=lambda x: Version(x.version), reverse=True)
-        except InvalidVersion:
-            versions.sort(key=lambda x: x.version, reverse=True)
+    for candidates in unspecified_plugins:
+        versions = [v for v in candidates if not v.compatibility or server in v.compatibility]
+        if not versions:
+            raise ValueError(f'No versions of {candidates[0].plugin.name} compatible with {server.name} {server.server_version}')
 
-        plugin_versions.append(versions[0])
+        plugin_versions.append(max(versions, key=lambda x: x.sort_key))
 
     # Check for specified plugin updates
     plugin_versions.extend([v[0] for v in specified_plugins])
+    return server, plugin_versions
 
-    # Install the minecraft server
-    print(f'===== Server =====')
-    current_servers = server.installedVersions(dest)
-    if not current_servers or current_servers[0] != server or args.force:
-        print(f'{server.name} Version: {server.server_version}' + (f' (Updated from {current_servers[0].server_version})' if current_servers else ''))
-        print(f'Minecraft Version: {server.minecraft_version}' + (f' (Updated from {current_servers[0].minecraft_version})' if current_servers else ''))
-        if not args.dryrun:
-            file=server.install(dest)
-            if not file:
-                raise FileNotFoundError(f'Download failed for server version {server.server_version}')
-            
-            print(f'   Installed {os.path.basename(file)}')
 
-            # Uninstall existing installations
-            for s in current_servers:
-                file=s.uninstall(dest)
-                if not file:
-                    raise Exception(f'Failed to uninstall {server.asset}')
-                else:
-                    print(f'   Uninstalled {os.path.basename(file)}')
+def artifact_name(artifact: Server | PluginAsset) -> str:
+    return artifact.asset if isinstance(artifact, Server) else artifact.filename
+
+
+def mirror(args):
+    from mim.util.MirrorRepository import MirrorBuilder
+    builder = MirrorBuilder(args.output)
+    for repo in ServerRepository.repositories():
+        builder.addServers(repo)
+
+    for input_file in args.file:
+        data = load_config(Path(input_file))
+        server, plugin_versions = resolve(data)
+        print(f'===== {input_file} =====')
 
+        for entry in data.get('plugins', []):
+            if isinstance(entry, dict) and entry.get('name'):
+                plugin = config_plugin(entry)
+                builder.addPlugin(plugin, plugin.versions)
+
+        file = builder.addServerFile(server)
+        print(f'{server.name} {server.server_version}: {os.path.basename(file)}')
+        for version in plugin_versions:
+            for a in select_assets(data, version):
+                file = builder.addPluginFile(a)
+                print(f'{version.plugin.name} {version.version}: {os.path.basename(file)}')
+
+    builder.finish()
+    print(f'Mirror written to {args.output}')
+
+
+def install_targets(args) -> List[tuple[Path, Path]]:
+    """Pairs the specification files of an install with their destination directories.
+
+    Files and destinations given on the command line are paired in order. A fleet file
+    lists further pairs under "servers", relative to the fleet file.
+    """
+    files = getattr(args, 'file', None) or []
+    destinations = getattr(args, 'destination', None) or []
+    files = [files] if isinstance(files, (str, Path)) else list(files)
+    destinations = [destinations] if isinstance(destinations, (str, Path)) else list(destinations)
+
+    if len(files) <= 1 and len(destinations) <= 1:
+        targets = [(Path(f), Path(destinations[0]) if destinations else Path.cwd()) for f in files]
+    elif len(files) == len(destinations):
+        targets = [(Path(f), Path(d)) for f, d in zip(files, destinations)]
     else:
-        print(f'{server.name} Version: {server.server_version} (Up to date)')
-        print(f'Minecraft Version: {server.minecraft_version} (Up to date)')
-    
-    # Install server plugins
-    print(f'\n===== Plugins =====')
-    plugin_dest = dest / 'plugins'
-    if not args.dryrun:
-        plugin_dest.mkdir(exist_ok=True)
-
-    for version in plugin_versions:
-        current_versions = version.plugin.installedVersions(plugin_dest)
-        if not current_versions or current_versions[0] != version or args.force:
-            print(f'{version.plugin.name} Version: {version.version}' + (f' (Updated from {current_versions[0].version})' if current_versions else ''))
-            
-            if not args.dryrun:
-                index = [n['name'] for n in data['plugins']].index(version.plugin.name)
-                assets = data['plugins'][index].get('assets')
-                if assets:
-                    try:
-                        patterns = [re.compile(p) for p in assets]
-                    except re.error as e:
-                        raise ValueError(f'Invalid regex in assets for {name}: {e}')
-                    
-                    assets = [a for a in version.assets if any( p.search(a.filename) for p in patterns )]
-                    files = []
-                    for a in assets:
-                        file = a.install(plugin_dest)
-                        if not file:
-                            raise FileNotFoundError(f'Download failed for {version.plugin.name} version {version.version} asset {a.filename}')
-                        files.append(file)
-                else:
-                    files=version.install(plugin_dest)
-                    if not files:
-                        raise FileNotFoundError(f'Download failed for {version.plugin.name} version {version.version}')
-                
-                for file in files:
-                    print(f'   Installed {os.path.basename(file)}')
-
-                # Uninstall existing installations
-                for v in current_versions:
-                    files=v.uninstall(dest)
-                    if not files:
-                        raise Exception(f'Failed to uninstall {v.plugin.name} {v.version}')
-                    else:
-                        for file in files:
-                            print(f'   Uninstalled {os.path.basename(file)}')
+        raise ValueError(f'Got {len(files)} files and {len(destinations)} destinations. Give one --destination per --file')
+
+    fleet = getattr(args, 'fleet', None)
+    if fleet:
+        fleet_path = Path(fleet)
+        entries = load_config(fleet_path).get('servers')
+        if not isinstance(entries, list):
+            raise TypeError(f'Fleet file {fleet_path} must define a "servers" list')
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get('file') or not entry.get('destination'):
+                raise ValueError(f'Fleet entries must define "file" and "destination": {entry}')
+            targets.append((fleet_path.parent / entry['file'], fleet_path.parent / entry['destination']))
+
+    if not targets:
+        raise ValueError('No input file specified (expected --file or --fleet)')
+    return targets
+
+
+def prefetch_metadata(plugins: List[Plugin], jobs: int, found: Callable[[Plugin, List[PluginVersion]], None] | None = None):
+    """Searches every plugin concurrently so the resolution of each config hits the cache.
+
+    Errors are left for the resolution to report. found, if given, is called with the
+    versions of each plugin as soon as its search completes.
+    """
+    def search(plugin: Plugin):
+        try:
+            versions = PluginRepository.searchAll(plugin)
+            if found is not None:
+                found(plugin, versions)
+        except Exception:
+            pass
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        list(pool.map(search, plugins))
+
+
+def fetch_artifacts(artifacts: List[Server | PluginAsset], jobs: int) -> dict:
+    """Fetches each unique artifact once, concurrently.
+
+    Returns
+    -------
+    dict
+        The local path of each artifact, keyed by repository name and file name
+    """
+    unique = {}
+    for artifact in artifacts:
+        unique.setdefault((artifact.repository.name, artifact_name(artifact)), artifact)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        paths = list(pool.map(lambda artifact: artifact.fetch(), unique.values()))
+    return dict(zip(unique.keys(), paths))
+
+
+def place_artifact(artifact: Server | PluginAsset, dest: Path, fetched: dict) -> str | None:
+    """Installs an artifact, reusing its fetched copy if there is one."""
+    path = fetched.get((artifact.repository.name, artifact_name(artifact)))
+    if path is None:
+        return artifact.install(dest)
+    return place_file(path, str(dest), artifact_name(artifact))
+
+
+def rollback(args):
+    dest = Path(args.destination) if args.destination else Path.cwd()
+    staged = StagedDirectory(str(dest / 'plugins'))
+    staged.rollback()
+    print(f'Restored the previous plugin set of {dest}. Run mim rollback again to undo')
+
+
+def verify_targets(args) -> List[Path]:
+    """Lists the server directories to verify, from --destination and --fleet."""
+    destinations = [Path(d) for d in getattr(args, 'destination', None) or []]
+    fleet = getattr(args, 'fleet', None)
+    if fleet:
+        fleet_path = Path(fleet)
+        entries = load_config(fleet_path).get('servers')
+        if not isinstance(entries, list):
+            raise TypeError(f'Fleet file {fleet_path} must define a "servers" list')
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get('destination'):
+                raise ValueError(f'Fleet entries must define "destination": {entry}')
+            destinations.append(fleet_path.parent / entry['destination'])
+    return destinations or [Path.cwd()]
+
+
+def verify(args):
+    from concurrent.futures import ProcessPoolExecutor
+    from mim.util.Verify import Manifest, verify_file
+
+    # Every jar in a server directory and its plugins directory, and every file its manifest lists
+    checks: list[tuple[Path, dict | None]] = []
+    directories = verify_targets(args)
+    for dest in directories:
+        for directory in (dest, dest / 'plugins'):
+            if not directory.is_dir():
+                continue
+            manifest = Manifest(str(directory))
+            names = {entry.name for entry in os.scandir(directory) if entry.is_file() and entry.name.endswith('.jar')}
+            for name in sorted(names | set(manifest.files)):
+                checks.append((directory / name, manifest.get(name)))
+
+    def algorithms(entry: dict | None) -> tuple[str, ...]:
+        if entry is None:
+            return ()
+        published = entry.get('checksum', '').partition(':')[0]
+        return ('sha256', published) if published and published != 'sha256' else ('sha256',)
+
+    present = [(path, entry) for path, entry in checks if path.is_file()]
+    paths = [str(path) for path, _ in present]
+    hashes = [algorithms(entry) for _, entry in present]
+    jobs = max(1, args.jobs or os.cpu_count() or 1)
+    if jobs > 1 and len(present) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(present))) as pool:
+            results = dict(zip(paths, pool.map(verify_file, paths, hashes, chunksize=max(1, len(paths) // (jobs * 4)))))
+    else:
+        results = dict(zip(paths, map(verify_file, paths, hashes)))
+
+    counts = dict.fromkeys(['ok', 'untracked', 'corrupt', 'modified', 'missing'], 0)
+    for path, entry in checks:
+        result = results.get(str(path))
+        if result is None:
+            status, detail = 'missing', 'listed in the manifest but not present'
+        elif result['error']:
+            status, detail = 'corrupt', result['error']
+        elif entry is None:
+            status, detail = 'untracked', 'not installed by mim'
+        elif result['digests']['sha256'] != entry.get('sha256'):
+            status, detail = 'modified', 'sha256 differs from the manifest'
+        elif entry.get('checksum') and not entry['checksum'].endswith(':' + result['digests'][algorithms(entry)[-1]]):
+            status, detail = 'modified', f'differs from the {entry["checksum"].partition(":")[0]} published by {entry.get("repository", "the repository")}'
         else:
-            print(f'{version.plugin.name} Version: {version.version} (Up to date)')
+            status, detail = 'ok', None
+        counts[status] += 1
+        if args.verbose or status not in ('ok', 'untracked'):
+            print(f'{status.upper():<10} {path}' + (f': {detail}' if detail else ''))
+
+    print(f'Verified {len(checks)} files in {len(directories)} servers: ' + ', '.join(f'{count} {status}' for status, count in counts.items()))
+    failed = counts['corrupt'] + counts['modified'] + counts['missing']
+    if failed:
+        raise Exception(f'{failed} files failed verification')
+
+
+def prefetch(args):
+    from mim import api
+
+    if PluginRepository.offline:
+        raise ValueError('prefetch cannot run in offline mode')
+    targets = install_targets(args)
+    jobs = max(1, args.jobs or 4)
+
+    # Store the metadata so the later install resolves from the catalog
+    catalog = sync_catalog(config_plugins([str(in_path) for in_path, _ in targets]))
+    PluginRepository.catalog = ServerRepository.catalog = catalog
+
+    with FetchPipeline(jobs) as pipeline:
+        plans = api.plan_many(targets, jobs, args.force, pipeline=pipeline)
+        if not any(plan.artifacts for plan in plans):
+            print('Nothing to prefetch, every destination is up to date')
+            return
+        fetched = api.fetch(plans, jobs, pipeline)
+    size = 0
+    for (repository, name), path in fetched.items():
+        size += os.path.getsize(path)
+        print(f'{repository}: {name}')
+    print(f'Prefetched {len(fetched)} files ({size / 1048576:.1f} MiB). Install with mim --offline install to avoid any network access')
+
+
+def install(args):
+    from mim import api
+
+    targets = install_targets(args)
+    force = getattr(args, 'force', False)
+    dryrun = getattr(args, 'dryrun', False)
+    atomic = getattr(args, 'atomic', False)
+    jobs = max(1, getattr(args, 'jobs', None) or 4)
+
+    # Files are downloaded while the plugins are still searched, as soon as they are known
+    # or likely to be needed. Offline, there is nothing to overlap
+    pipeline = None if dryrun or PluginRepository.offline else FetchPipeline(jobs)
+    try:
+        plans = api.plan_many(targets, jobs, force, pipeline=pipeline)
+        for plan in plans:
+            plan.destination.mkdir(parents=True, exist_ok=True)
+            for warning in plan.warnings:
+                print(warning)
+
+        if dryrun:
+            for plan in plans:
+                if len(plans) > 1:
+                    print(f'########## {plan.config} -> {plan.destination} ##########')
+                describe_plan(plan)
+            return
+
+        # Fail before touching any files if an offline install cannot complete
+        if PluginRepository.offline:
+            missing = api.missing(plans)
+            if missing:
+                raise OfflineError(missing)
+
+        # Download each artifact needed by any destination once
+        fetched = api.fetch(plans, jobs, pipeline)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+    if len(plans) == 1:
+        with tracer.span('apply', destination=str(plans[0].destination)):
+            api.apply(plans[0], fetched, atomic, sys.stdout)
+        return
+
+    def apply(plan):
+        out = io.StringIO()
+        try:
+            with tracer.span('apply', destination=str(plan.destination)):
+                api.apply(plan, fetched, atomic, out)
+        except Exception as e:
+            print(f'Error: {e}', file=out)
+            return out.getvalue(), e
+        return out.getvalue(), None
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for plan, (output, error) in zip(plans, pool.map(apply, plans)):
+            print(f'########## {plan.config} -> {plan.destination} ##########')
+            print(output)
+            failed += error is not None
+    if failed:
+        raise Exception(f'{failed} of {len(plans)} installs failed')
+
+
+def describe_plan(plan):
+    """Prints the versions a plan installs and keeps, as an install reports them."""
+    server = plan.server
+    print(f'===== Server =====')
+    suffix = ' (Up to date)' if server.action == 'keep' else (f' (Updated from {server.installedVersion})' if server.installed else '')
+    print(f'{server.name} Version: {server.version}{suffix}')
+    minecraft = ' (Up to date)' if server.action == 'keep' else (f' (Updated from {server.installed[0].minecraft_version})' if server.installed else '')
+    print(f'Minecraft Version: {server.target.minecraft_version}{minecraft}')
+    print(f'\n===== Plugins =====')
+    for change in plan.plugins:
+        suffix = ' (Up to date)' if change.action == 'keep' else (f' (Updated from {change.installedVersion})' if change.installed else '')
+        print(f'{change.name} Version: {change.version}{suffix}')
+
+
+def outdated(args):
+    from mim import api
+    from mim.util.Cache import cache_directory
+    from mim.util.Lock import LockManager
+
+    targets = install_targets(args)
+    jobs = max(1, args.jobs or 8)
+
+    # Only metadata older than --max-age is fetched, with conditional requests where the repository supports them
+    if not PluginRepository.offline:
+        with tracer.span('sync'):
+            catalog = sync_catalog(config_plugins([str(in_path) for in_path, _ in targets]), args.max_age, jobs, io.StringIO())
+        PluginRepository.catalog = ServerRepository.catalog = catalog
+
+    found: dict[str, dict[str, tuple[str | None, str]]] = {}
+    failed = 0
+    for (_, dest), plan in zip(targets, api.plan_many(targets, jobs, return_exceptions=True)):
+        if isinstance(plan, Exception):
+            print(f'{dest}: {plan}', file=sys.stderr)
+            failed += 1
+            continue
+        # Warnings of the server selection go to stderr with the errors
+        for warning in plan.warnings:
+            print(f'{dest}: {warning}', file=sys.stderr)
+        found[str(dest.resolve())] = {change.name: (change.installedVersion, change.version) for change in plan.changes}
+
+    # Updates already reported by the previous poll are not repeated
+    path = os.path.join(cache_directory(), 'outdated.json')
+    with LockManager().lock('outdated'):
+        try:
+            with open(path, encoding='utf-8') as f:
+                reported = json.load(f)
+        except (FileNotFoundError, ValueError):
+            reported = {}
+        for _, dest in targets:
+            key = str(dest.resolve())
+            if key not in found:
+                continue
+            previous = reported.get(key, {})
+            for name, (installed, available) in found[key].items():
+                if args.all or previous.get(name) != [installed, available]:
+                    print(f'{dest}: {name} {installed or "(not installed)"} -> {available}')
+            for name in previous.keys() - found[key].keys():
+                print(f'{dest}: {name} up to date')
+            reported[key] = {name: list(update) for name, update in found[key].items()}
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.part', 'w', encoding='utf-8') as f:
+            json.dump(reported, f, indent=2, sort_keys=True)
+        os.replace(f'{path}.part', path)
+
+    if failed:
+        raise Exception(f'{failed} of {len(targets)} configurations could not be checked')
+    return 1 if any(found.values()) else 0
+
 
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(prog='mim', description='Minecraft Install Manager CLI')
+    p.add_argument('--cache-dir', help='Directory for the local catalog and caches (default: $MIM_CACHE_DIR or ~/.cache/mim)')
+    p.add_argument('--mirror', help='Install from a mirror created by mim mirror (a directory or an http(s) URL) instead of the upstream repositories')
+    p.add_argument('--profile', action='store_true', help='Print a summary of the time spent per phase, the HTTP requests per host and URL template, and cache hit rates to stderr')
+    p.add_argument('--trace-out', help='Write a Chrome trace (JSON) of the command to this file, viewable in chrome://tracing or Perfetto')
+    p.add_argument('--bandwidth', help='Total download rate of every mim process sharing the cache directory, e.g. 500K or 10M bytes per second (default: from limits.json in the cache directory, otherwise unlimited)')
+    p.add_argument('--max-downloads', type=int, help='Number of concurrent downloads of every mim process sharing the cache directory (default: from limits.json in the cache directory, otherwise unlimited)')
+    p.add_argument('--offline', action='store_true', help='Use only the local catalog and artifact cache. Fails listing anything missing instead of making network requests')
     sub = p.add_subparsers(dest='command')
 
     p_versions = sub.add_parser('versions', help='List plugin versions')
-    p_versions.add_argument('--name', '-n', help='Plugin name')
-    p_versions.add_argument('--id', '-i', help='Plugin id')
+    p_versions.add_argument('--name', '-n', action='append', help='Plugin name. May be repeated')
+    p_versions.add_argument('--id', '-i', action='append', help='Plugin id. May be repeated, paired in order with --name')
+    p_versions.add_argument('--file', '-f', action='append', help='JSON or YAML specification file whose plugins are listed, filtered by its loader and server unless given. May be repeated')
+    p_versions.add_argument('--version', '-v', help='Only list this plugin version')
+    p_versions.add_argument('--repo', '-r', help='Only search this repository (e.g., modrinth, spiget, github) for plugins without a "repository" in their config entry')
     p_versions.add_argument('--loader', '-l', help='Filter by loader (e.g., paper, spigot)')
-    p_versions.add_argument('--server', '-s', help='Filter by Minecraft server version (e.g., 1.16, 1.17.x)')
+    p_versions.add_argument('--server', '-s', help='Filter by Minecraft server version or range (e.g., 1.16, 1.17.x, ">=1.20.4,<1.21", ~1.20)')
+    p_versions.add_argument('--format', choices=['text', 'ndjson'], default='text', help='Print text, or one JSON object per line as each repository answers (default: text)')
+    p_versions.add_argument('--jobs', '-j', type=int, default=8, help='Number of concurrent repository searches (default: 8)')
     p_versions.set_defaults(func=list_versions)
 
     p_assets = sub.add_parser('assets', help='List assets for plugin version')
-    p_assets.add_argument('--name', '-n', help='Plugin name')
-    p_assets.add_argument('--id', '-i', help='Plugin id')
+    p_assets.add_argument('--name', '-n', action='append', help='Plugin name. May be repeated')
+    p_assets.add_argument('--id', '-i', action='append', help='Plugin id. May be repeated, paired in order with --name')
+    p_assets.add_argument('--file', '-f', action='append', help='JSON or YAML specification file whose plugins are listed, at the versions it pins unless --version is given. May be repeated')
     p_assets.add_argument('--version', '-v', help='Plugin version to inspect')
+    p_assets.add_argument('--repo', '-r', help='Only search this repository (e.g., modrinth, spiget, github) for plugins without a "repository" in their config entry')
     p_assets.add_argument('--loader', '-l', help='Filter by loader (e.g., paper, spigot)')
-    p_assets.add_argument('--server', '-s', help='Filter by Minecraft server version (e.g., 1.16, 1.17.x)')
+    p_assets.add_argument('--server', '-s', help='Filter by Minecraft server version or range (e.g., 1.16, 1.17.x, ">=1.20.4,<1.21", ~1.20)')
+    p_assets.add_argument('--format', choices=['text', 'ndjson'], default='text', help='Print text, or one JSON object per line as each repository answers (default: text)')
+    p_assets.add_argument('--jobs', '-j', type=int, default=8, help='Number of concurrent repository searches (default: 8)')
     p_assets.set_defaults(func=list_assets)
 
+    p_matrix = sub.add_parser('matrix', help='Show the newest version of each plugin compatible with each server version')
+    p_matrix.add_argument('--name', '-n', action='append', help='Plugin name. May be repeated')
+    p_matrix.add_argument('--id', '-i', action='append', help='Plugin id. May be repeated, paired in order with --name')
+    p_matrix.add_argument('--file', '-f', action='append', help='JSON or YAML specification file whose plugins are included, using its loader and server unless given. May be repeated')
+    p_matrix.add_argument('--repo', '-r', help='Only search this repository (e.g., modrinth, spiget, github) for plugins without a "repository" in their config entry')
+    p_matrix.add_argument('--loader', '-l', help='Only include servers of this loader (e.g., paper)')
+    p_matrix.add_argument('--server', '-s', help='Server versions to include, as a version or range (default: 1.x.x)')
+    p_matrix.add_argument('--format', choices=['table', 'csv', 'json'], default='table', help='Output format (default: table)')
+    p_matrix.add_argument('--jobs', '-j', type=int, default=8, help='Number of concurrent plugin searches (default: 8)')
+    p_matrix.set_defaults(func=matrix)
+
     p_download = sub.add_parser('download', help='Download plugin versions or specific assets')
     p_download.add_argument('--name', '-n', help='Plugin name')
     p_download.add_argument('--id', '-i', help='Plugin id')
     p_download.add_argument('--version', '-v', help='Specific plugin version to download')
+    p_download.add_argument('--repo', '-r', help='Only search this repository (e.g., modrinth, spiget, github)')
     p_download.add_argument('--loader', '-l', help='Filter by loader (e.g., paper, spigot)')
-    p_download.add_argument('--server', '-s', help='Filter by Minecraft server version (e.g., 1.16, 1.17.x)')
+    p_download.add_argument('--server', '-s', help='Filter by Minecraft server version or range (e.g., 1.16, 1.17.x, ">=1.20.4,<1.21", ~1.20)')
     p_download.add_argument('--asset', '-a', nargs='+', help='Specific asset filename(s) to download (one or more). Supports regex')
     p_download.add_argument('--destination', '-d', help='Directory to save downloads')
     p_download.set_defaults(func=download)
 
     p_install = sub.add_parser('install', help='Install plugins from a JSON or YAML specification file')
-    p_install.add_argument('--file', '-f', required=True, help='Path to input JSON or YAML file specifying plugins to install')
-    p_install.add_argument('--destination', '-d', help='Directory to install plugins to')
+    p_install.add_argument('--file', '-f', action='append', help='Path to input JSON or YAML file specifying plugins to install. May be repeated, paired in order with --destination')
+    p_install.add_argument('--destination', '-d', action='append', help='Directory to install plugins to. Give one per --file when installing several')
+    p_install.add_argument('--fleet', help='JSON or YAML file listing "servers" entries with a "file" and a "destination", installed together')
+    p_install.add_argument('--jobs', '-j', type=int, default=4, help='Number of concurrent downloads and installs (default: 4)')
+    p_install.add_argument('--atomic', action='store_true', help='Build the new plugin set in plugins.staging and swap it in with renames, keeping the old set in plugins.previous')
     p_install.add_argument('--force', action='store_true', help='Force redownload of existing installations')
     p_install.add_argument('--dryrun', action='store_true', help='Perform a dry run without actual downloads or installations')
     p_install.set_defaults(func=install)
 
+    p_outdated = sub.add_parser('outdated', help='Report servers and plugins with newer compatible versions than installed. Exits with 1 if there are any')
+    p_outdated.add_argument('--file', '-f', action='append', help='Path to input JSON or YAML file. May be repeated, paired in order with --destination')
+    p_outdated.add_argument('--destination', '-d', action='append', help='Directory the configuration is installed to. Give one per --file when checking several')
+    p_outdated.add_argument('--fleet', help='JSON or YAML file listing "servers" entries with a "file" and a "destination", all checked')
+    p_outdated.add_argument('--max-age', type=float, default=300, help='Seconds for which synced metadata is used without asking the repositories again (default: 300)')
+    p_outdated.add_argument('--all', action='store_true', help='Print every available update, not only those which changed since the last run')
+    p_outdated.add_argument('--jobs', '-j', type=int, default=8, help='Number of concurrent repository requests (default: 8)')
+    p_outdated.set_defaults(func=outdated)
+
+    p_verify = sub.add_parser('verify', help='Check the jars of server directories for corruption and changes since mim installed them')
+    p_verify.add_argument('--destination', '-d', action='append', help='Server directory to verify. May be repeated (default: the current directory)')
+    p_verify.add_argument('--fleet', help='JSON or YAML file listing "servers" entries with a "destination", all verified')
+    p_verify.add_argument('--jobs', '-j', type=int, help='Number of worker processes (default: the number of CPUs)')
+    p_verify.add_argument('--verbose', action='store_true', help='Also list files which passed and files mim did not install')
+    p_verify.set_defaults(func=verify)
+
+    p_rollback = sub.add_parser('rollback', help='Swap the plugin set replaced by the last install --atomic back in')
+    p_rollback.add_argument('--destination', '-d', help='Server directory (default: the current directory)')
+    p_rollback.set_defaults(func=rollback)
+
+    p_mirror = sub.add_parser('mirror', help='Resolve specification files and copy their metadata and files into a mirror directory')
+    p_mirror.add_argument('--file', '-f', action='append', required=True, help='JSON or YAML specification file to mirror. May be repeated')
+    p_mirror.add_argument('--output', '-o', required=True, help='Mirror directory. Serve it with any static HTTP server or use it as a local path')
+    p_mirror.set_defaults(func=mirror)
+
+    p_sync = sub.add_parser('sync', help='Synchronize plugin and server metadata into the local catalog')
+    p_sync.add_argument('--file', '-f', action='append', help='JSON or YAML specification file whose plugins are synchronized. May be repeated')
+    p_sync.add_argument('--name', '-n', help='Plugin name')
+    p_sync.add_argument('--id', '-i', help='Plugin id')
+    p_sync.add_argument('--repo', '-r', help='Only search this repository (e.g., modrinth, spiget, github) for plugins without a "repository" in their config entry')
+    p_sync.add_argument('--full', action='store_true', help='Fetch every version again, dropping versions removed upstream and refreshing compatibility')
+    p_sync.set_defaults(func=sync)
+
+    p_prefetch = sub.add_parser('prefetch', help='Resolve specification files and download everything an install needs into the local caches, without changing the destinations')
+    p_prefetch.add_argument('--file', '-f', action='append', help='Path to input JSON or YAML file. May be repeated, paired in order with --destination')
+    p_prefetch.add_argument('--destination', '-d', action='append', help='Directory the configuration will be installed to, used to skip files already installed')
+    p_prefetch.add_argument('--fleet', help='JSON or YAML file listing "servers" entries with a "file" and a "destination"')
+    p_prefetch.add_argument('--force', action='store_true', help='Prefetch every file, including those already installed')
+    p_prefetch.add_argument('--jobs', '-j', type=int, default=4, help='Number of concurrent downloads (default: 4)')
+    p_prefetch.set_defaults(func=prefetch)
+
+    p_serve = sub.add_parser('serve', help='Run a daemon which keeps metadata warm and answers versions, assets, download and install for other mim invocations')
+    p_serve.add_argument('--socket', help='Unix socket to listen on (default: mim.sock in the cache directory)')
+    p_serve.add_argument('--refresh', type=float, default=300, help='Seconds between background metadata refreshes (default: 300)')
+    p_serve.set_defaults(func=serve)
+
     return p
 
 
+# Commands the CLI forwards to a running daemon
+DAEMON_COMMANDS = ('versions', 'assets', 'matrix', 'download', 'install')
+
+# Repository modules by name. Their modules are imported and the repositories created on first use
+PLUGIN_REPOSITORIES = ('Geyser', 'Github', 'Modrinth', 'Spiget')
+SERVER_REPOSITORIES = ('Paper',)
+
+
+def repository_factory(module: str, name: str, *args) -> Callable:
+    """Returns a function importing a repository module and creating the repository class of the same name."""
+    return lambda: getattr(importlib.import_module(f'mim.util.{module}'), name)(*args)
+
+
+def configure(args):
+    """Registers the repositories and opens the catalog for the global options."""
+    PluginRepository._registry.clear()
+    ServerRepository._registry.clear()
+    # Cached versions refer to the servers of the repositories being replaced
+    PluginRepository._cache.invalidate()
+    if args.mirror:
+        ServerRepository.register('Mirror', repository_factory('MirrorRepository', 'MirrorServerRepository', args.mirror))
+        def mirror_plugins():
+            return repository_factory('MirrorRepository', 'MirrorRepository', args.mirror, ServerRepository.repository('Mirror'))()
+        PluginRepository.register('Mirror', mirror_plugins)
+    else:
+        for name in PLUGIN_REPOSITORIES:
+            PluginRepository.register(name, repository_factory(f'{name}Repository', f'{name}Repository'))
+        for name in SERVER_REPOSITORIES:
+            ServerRepository.register(name, repository_factory(f'{name}Repository', f'{name}Repository'))
+    # The catalog module loads sqlite3, so it is only imported once a catalog exists
+    catalog = None
+    if os.path.isfile(catalog_path()):
+        from mim.util.Catalog import Catalog
+        catalog = Catalog(catalog_path())
+    PluginRepository.catalog = ServerRepository.catalog = catalog
+    PluginRepository.offline = ServerRepository.offline = args.offline
+    # Routes name upstream repositories, which a mirror replaces
+    PluginRepository.routes = RoutingTable() if not args.mirror else None
+    ArtifactCache.budget = DownloadBudget.load(bandwidth=args.bandwidth, downloads=args.max_downloads)
+
+
+def global_options(args) -> dict:
+    """The global options a daemon must share to run a command for this process."""
+    return {'mirror': args.mirror, 'offline': args.offline, 'bandwidth': args.bandwidth, 'max_downloads': args.max_downloads}
+
+
+def absolute_paths(args, cwd: str):
+    """Resolves the path arguments of a command against the working directory of its caller."""
+    for name in ('file', 'destination', 'fleet', 'output'):
+        value = getattr(args, name, None)
+        if isinstance(value, list):
+            setattr(args, name, [os.path.join(cwd, v) for v in value])
+        elif value:
+            setattr(args, name, os.path.join(cwd, value))
+    if hasattr(args, 'destination') and not args.destination:
+        args.destination = cwd
+
+
+def run_command(args) -> int:
+    try:
+        # Commands may return an exit code, such as outdated when there are updates
+        return args.func(args) or 0
+    except Exception as e:
+        print(f'Error: {e}', file=sys.stderr)
+        traceback.print_exc()
+        return 2
+    finally:
+        if PluginRepository.routes is not None:
+            try:
+                PluginRepository.routes.save()
+            except OSError as e:
+                print(f'Unable to save plugin routes: {e}', file=sys.stderr)
+
+
+def serve(args):
+    from mim import daemon
+
+    def handle(argv: List[str], cwd: str) -> int:
+        request = build_parser().parse_args(argv)
+        if request.command not in DAEMON_COMMANDS:
+            raise ValueError(f'{request.command} is not served by the daemon')
+        absolute_paths(request, cwd)
+        return run_command(request)
+
+    server = daemon.Daemon(handle, global_options(args), path=args.socket, refresh=args.refresh)
+    print(f'Serving on {server.path}')
+    sys.stdout.flush()
+    server.serve()
+
+
 def main(argv: List[str] | None = None) -> int:
     argv = argv if argv is not None else sys.argv[1:]
     parser = build_parser()
@@ -342,18 +1087,36 @@ def main(argv: List[str] | None = None) -> int:
     if not hasattr(args, 'func'):
         parser.print_help()
         return 1
+    if args.cache_dir:
+        os.environ['MIM_CACHE_DIR'] = args.cache_dir
+
+    if args.profile or args.trace_out:
+        tracer.enable()
+
+    # Let a running daemon answer from its warm state
+    if args.command in DAEMON_COMMANDS and not tracer.enabled and not os.environ.get('MIM_NO_DAEMON'):
+        from mim import daemon
+        result = daemon.request(argv, global_options(args))
+        if result is not None:
+            code, stdout, stderr = result
+            sys.stdout.write(stdout)
+            sys.stderr.write(stderr)
+            return code
+
     try:
-        GeyserRepository()
-        GithubRepository()
-        ModrinthRepository()
-        SpigetRepository()
-        PaperRepository()
-        args.func(args)
-        return 0
+        with tracer.span('startup'):
+            configure(args)
     except Exception as e:
         print(f'Error: {e}', file=sys.stderr)
         traceback.print_exc()
         return 2
+    with tracer.span(args.command, 'command'):
+        code = run_command(args)
+    if args.profile:
+        print(tracer.summary(), file=sys.stderr)
+    if args.trace_out:
+        tracer.write(args.trace_out)
+    return code
 
 
 if __name__ == '__main__':
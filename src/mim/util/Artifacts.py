@@ -0,0 +1,181 @@
+from __future__ import annotations
+import os
+import tempfile
+import threading
+from contextvars import ContextVar
+from typing import Callable, Iterable
+from mim.util import Http
+from mim.util.Cache import cache_directory
+from mim.util.Files import place_file, write_chunks
+from mim.util.Lock import LockManager
+from mim.util.Throttle import DownloadBudget
+from mim.util.Trace import tracer
+from mim.util.Repository import OfflineError, PluginRepository
+
+# Set while fetching an artifact which may turn out not to be needed; downloads stop once it is set
+cancellation: ContextVar[threading.Event|None] = ContextVar('cancellation', default=None)
+
+class DownloadCancelled(Exception):
+    """Raised by a download whose cancellation event was set"""
+
+def _cancellable(chunks:Iterable[memoryview], event:threading.Event) -> Iterable[memoryview]:
+    for chunk in chunks:
+        if event.is_set():
+            raise DownloadCancelled('Download cancelled')
+        yield chunk
+
+class ArtifactCache:
+    """A local store of downloaded server and plugin files
+
+    Artifacts are stored per repository under their install filename, next to a
+    ``.url`` file recording where they were downloaded from. Online, a cached file is
+    reused when its recorded URL matches; offline, any cached file is used.
+    """
+    # Limits the bandwidth and concurrency of downloads across processes, if set
+    budget: DownloadBudget|None = None
+    # Bytes read from the connection and written to disk at a time
+    buffer_size = 1 << 20
+
+    def __init__(self, directory:str|None=None):
+        """Initializes an artifact cache
+
+        Parameters
+        ----------
+        directory : str, optional
+            The cache directory, by default the artifacts directory of cache_directory()
+        """
+        self.directory = directory or os.path.join(cache_directory(), 'artifacts')
+        self.locks = LockManager(os.path.join(os.path.dirname(os.path.abspath(self.directory)), 'locks'))
+
+    def path(self, repository:str, filename:str) -> str:
+        return os.path.join(self.directory, repository.lower(), filename)
+
+    def get(self, repository:str, filename:str, url:str|None=None) -> str|None:
+        """Returns the cached path of an artifact, or None if it is not cached
+
+        Parameters
+        ----------
+        repository : str
+            The name of the repository providing the artifact
+        filename : str
+            The artifact filename
+        url : str, optional
+            If given, the cached file is only returned when it was downloaded from this URL
+
+        Returns
+        -------
+        str | None
+            The path of the cached file
+        """
+        path = self.path(repository, filename)
+        if not os.path.isfile(path):
+            return None
+        if url is not None:
+            try:
+                with open(path + '.url', encoding='utf-8') as f:
+                    if f.read().strip() != url:
+                        return None
+            except OSError:
+                return None
+        return path
+
+    def download(self, repository:str, filename:str, url:str, headers:dict|None=None) -> str:
+        """Downloads an artifact into the cache
+
+        The file is written to a temporary name and renamed into place, so readers never
+        observe a partial download. The body is read into one reusable buffer and written
+        to a file preallocated from its Content-Length. The download waits for a slot of
+        the budget and is read at its bandwidth. It stops with DownloadCancelled when the
+        cancellation event of the calling context is set.
+
+        Returns
+        -------
+        str
+            The path of the cached file
+        """
+        event = cancellation.get()
+        if event is not None and event.is_set():
+            raise DownloadCancelled('Download cancelled')
+        path = self.path(repository, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'.{filename}.', suffix='.part')
+        try:
+            budget = ArtifactCache.budget or DownloadBudget()
+            with budget.slot(), Http.get(url, headers=headers, stream=True) as r:
+                r.raise_for_status()
+                # An encoded body's Content-Length is not the size of the file
+                length = r.headers.get('Content-Length') if r.headers.get('Content-Encoding', 'identity') == 'identity' else None
+                # Reads no larger than the budget books at a time keep a throttled download smooth
+                buffer = memoryview(bytearray(min(ArtifactCache.buffer_size, budget.quantum or ArtifactCache.buffer_size)))
+                chunks = budget.throttle(Http.iter_into(r, buffer))
+                if event is not None:
+                    chunks = _cancellable(chunks, event)
+                write_chunks(fd, chunks, int(length) if length and length.isdigit() else None)
+            os.close(fd)
+            fd = None
+            os.replace(tmp, path)
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with open(path + '.url', 'w', encoding='utf-8') as f:
+            f.write(url)
+        return path
+
+    def fetch(self, repository:str, filename:str, url:str|Callable[[], str], headers:dict|None=None) -> str:
+        """Returns the cached path of an artifact, downloading it if needed
+
+        Concurrent fetches of the same artifact are serialized with a lock per artifact,
+        shared by every process using the cache directory. Waiters reuse the file
+        downloaded by the holder, so an artifact is downloaded once.
+
+        Parameters
+        ----------
+        repository : str
+            The name of the repository providing the artifact
+        filename : str
+            The artifact filename
+        url : str | Callable[[], str]
+            The download URL, or a callable resolving it. Callables are not called offline
+        headers : dict, optional
+            Extra request headers for the download
+
+        Returns
+        -------
+        str
+            The path of the cached file
+
+        Raises
+        ------
+        OfflineError
+            If offline and the artifact is not cached
+        """
+        if PluginRepository.offline:
+            cached = self.get(repository, filename)
+            tracer.cache('artifacts', cached is not None)
+            if cached is None:
+                raise OfflineError([f'artifact {filename} from {repository}'])
+            return cached
+
+        with self.locks.lock(f'artifact {repository.lower()}/{filename}'):
+            url = url() if callable(url) else url
+            cached = self.get(repository, filename, url)
+            tracer.cache('artifacts', cached is not None)
+            if cached is not None:
+                return cached
+            with tracer.span(f'{repository} download', 'download', file=filename):
+                return self.download(repository, filename, url, headers)
+
+    def install(self, repository:str, filename:str, destination:str, url:str|Callable[[], str], headers:dict|None=None) -> str:
+        """Copies an artifact into a directory, downloading it into the cache if needed
+
+        Takes the same arguments as fetch, plus the directory to install the artifact to.
+
+        Returns
+        -------
+        str
+            The installed file path
+        """
+        return place_file(self.fetch(repository, filename, url, headers), destination, filename)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+def cache_directory() -> str:
+    """Returns the directory used for persistent caches
+
+    The MIM_CACHE_DIR environment variable takes precedence, followed by
+    $XDG_CACHE_HOME/mim and ~/.cache/mim.
+    """
+    if os.environ.get('MIM_CACHE_DIR'):
+        return os.environ['MIM_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'mim')
+
+def catalog_path() -> str:
+    """Returns the path of the local catalog in the cache directory
+    """
+    return os.path.join(cache_directory(), 'catalog.sqlite3')
+
+class _Flight:
+    """A pending load shared by every caller waiting on the same key
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: BaseException|None = None
+
+    def wait(self) -> Any:
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class Cache:
+    """A thread-safe LRU cache with an optional time-to-live and single-flight loading
+    """
+
+    def __init__(self, maxsize:int=256, ttl:float|None=None):
+        """Initializes a cache
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            The maximum number of entries kept before the least recently used entry is evicted, by default 256
+        ttl : float, optional
+            The number of seconds an entry stays valid. If None, entries never expire, by default None
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key:Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def _lookup(self, key:Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires, value = entry
+        if expires and expires <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key:Hashable, value:Any):
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def keys(self) -> list[Hashable]:
+        """Returns the keys of every unexpired entry, least recently used first
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [key for key, (expires, _) in self._entries.items() if not expires or expires > now]
+
+    def get(self, key:Hashable, default:Any=None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def set(self, key:Hashable, value:Any):
+        with self._lock:
+            self._store(key, value)
+
+    def invalidate(self, key:Hashable|None=None):
+        """Removes a single entry, or every entry when no key is given
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def getOrLoad(self, key:Hashable, loader:Callable[[], Any]) -> Any:
+        """Returns the cached value for a key, calling the loader on a miss
+
+        Concurrent misses for the same key are coalesced: the first caller runs the
+        loader and every other caller waits for and shares its result. Exceptions are
+        propagated to all waiting callers and are not cached.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key
+        loader : Callable[[], Any]
+            Called without arguments to produce the value on a miss
+
+        Returns
+        -------
+        Any
+            The cached or freshly loaded value
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            return flight.wait()
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._store(key, flight.value)
+            return flight.value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
@@ -0,0 +1,291 @@
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+from mim.util.Cache import catalog_path
+from mim.util.Lock import LockManager
+from mim.util.Repository import Plugin, PluginRepository, PluginVersion, Server, ServerRepository
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    repository TEXT NOT NULL,
+    name TEXT NOT NULL,
+    server_version TEXT NOT NULL,
+    minecraft_version TEXT NOT NULL,
+    PRIMARY KEY (repository, server_version)
+);
+CREATE TABLE IF NOT EXISTS repositories (
+    name TEXT PRIMARY KEY,
+    synced REAL
+);
+CREATE TABLE IF NOT EXISTS plugins (
+    id INTEGER PRIMARY KEY,
+    repository TEXT NOT NULL,
+    name TEXT NOT NULL,
+    plugin_id TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT '{}',
+    synced REAL,
+    resynced REAL,
+    UNIQUE (repository, name, plugin_id)
+);
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    plugin INTEGER NOT NULL REFERENCES plugins(id) ON DELETE CASCADE,
+    version TEXT NOT NULL,
+    has_compatibility INTEGER NOT NULL,
+    metadata TEXT NOT NULL,
+    UNIQUE (plugin, version, metadata)
+);
+CREATE TABLE IF NOT EXISTS compatibility (
+    version INTEGER NOT NULL REFERENCES versions(id) ON DELETE CASCADE,
+    server_repository TEXT NOT NULL,
+    server_version TEXT NOT NULL,
+    PRIMARY KEY (version, server_repository, server_version)
+);
+CREATE INDEX IF NOT EXISTS versions_plugin ON versions (plugin);
+CREATE INDEX IF NOT EXISTS compatibility_server ON compatibility (server_repository, server_version);
+"""
+
+class Catalog:
+    """A local SQLite index of plugin and server metadata
+
+    The catalog is filled by ``mim sync`` and answers plugin searches for every
+    plugin synced in the last max_age seconds, so repeated commands do not re-fetch from
+    the repositories. Older syncs only answer offline searches. Syncs are incremental, but every resync_age seconds a plugin is synced in full, which
+    drops versions removed upstream and refreshes the compatibility of the others.
+    """
+    # Seconds after which the next sync of a plugin fetches every version again
+    resync_age: float = 86400
+    # Seconds after which a synced plugin is searched in its repository again, unless offline
+    max_age: float = 3600
+
+    def __init__(self, path:str|None=None):
+        """Opens or creates a catalog
+
+        Parameters
+        ----------
+        path : str, optional
+            The database file, by default Catalog.defaultPath()
+        """
+        self.path = path or Catalog.defaultPath()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Serializes syncs of the same repository or plugin across processes sharing the catalog
+        self.locks = LockManager(os.path.join(os.path.dirname(os.path.abspath(self.path)), 'locks'))
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA foreign_keys = ON')
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.executescript(_SCHEMA)
+        # Catalogs created before full resyncs were recorded lack the column
+        if 'resynced' not in [row[1] for row in self._db.execute('PRAGMA table_info(plugins)')]:
+            self._db.execute('ALTER TABLE plugins ADD COLUMN resynced REAL')
+
+    @staticmethod
+    def defaultPath() -> str:
+        return catalog_path()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _plugin_row(self, repository:PluginRepository, plugin:Plugin, create:bool=False) -> tuple[int, dict]|None:
+        key = (repository.name.lower(), plugin.name, plugin.id or '')
+        row = self._db.execute('SELECT id, state FROM plugins WHERE repository=? AND name=? AND plugin_id=?', key).fetchone()
+        if row is None and create:
+            cursor = self._db.execute('INSERT INTO plugins (repository, name, plugin_id) VALUES (?, ?, ?)', key)
+            return cursor.lastrowid, {}
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _fresh(self, query:str, key:tuple, max_age:float|None) -> bool:
+        if max_age is None:
+            return False
+        with self._lock:
+            row = self._db.execute(query, key).fetchone()
+        return row is not None and row[0] is not None and time.time() - row[0] < max_age
+
+    def syncServers(self, repository:ServerRepository, max_age:float|None=None) -> int:
+        """Stores the full server list of a repository, dropping the servers no longer listed
+
+        Parameters
+        ----------
+        repository : ServerRepository
+            The repository to synchronize
+        max_age : float, optional
+            Skip the sync if the repository was synced less than this many seconds ago, by default None
+
+        Returns
+        -------
+        int
+            The number of servers that were not previously in the catalog
+        """
+        with self.locks.lock(f'sync {repository.name.lower()}'):
+            # Checked under the lock, so processes polling together sync once
+            if self._fresh('SELECT synced FROM repositories WHERE name=?', (repository.name.lower(),), max_age):
+                return 0
+            return self._syncServers(repository)
+
+    def _syncServers(self, repository:ServerRepository) -> int:
+        servers = repository.list()
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO repositories (name, synced) VALUES (?, ?)', (repository.name.lower(), time.time()))
+            known = {row[0] for row in self._db.execute('SELECT server_version FROM servers WHERE repository=?', (repository.name.lower(),))}
+            listed = {s.server_version for s in servers}
+            # The list is complete, so servers missing from it were withdrawn upstream
+            if listed:
+                self._db.executemany('DELETE FROM servers WHERE repository=? AND server_version=?',
+                                     [(repository.name.lower(), version) for version in known - listed])
+            self._db.executemany(
+                'INSERT OR REPLACE INTO servers (repository, name, server_version, minecraft_version) VALUES (?, ?, ?, ?)',
+                [(repository.name.lower(), s.name, s.server_version, s.minecraft_version) for s in servers]
+            )
+        return len(listed - known)
+
+    def listServers(self, repository:ServerRepository) -> list[Server]|None:
+        """Returns the catalogued servers of a repository, or None if it was never synced
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT name, server_version, minecraft_version FROM servers WHERE repository=? ORDER BY rowid',
+                (repository.name.lower(),)
+            ).fetchall()
+        if not rows:
+            return None
+        return [Server(name=name, server_version=sv, minecraft_version=mv, repository=repository) for name, sv, mv in rows]
+
+    def syncPlugin(self, repository:PluginRepository, plugin:Plugin, max_age:float|None=None, full:bool=False) -> int:
+        """Incrementally synchronizes the versions of a plugin from a repository
+
+        The repository's sync state (e.g. the newest known id or an ETag) is stored with
+        the plugin so the next sync only transfers what changed. An incremental sync never
+        sees versions removed upstream or corrections to the compatibility of known versions,
+        so the plugin is synced in full when its last full sync is older than resync_age.
+
+        Parameters
+        ----------
+        repository : PluginRepository
+            The repository to synchronize from
+        plugin : Plugin
+            The plugin to synchronize
+        max_age : float, optional
+            Skip the sync if the plugin was synced less than this many seconds ago, by default None
+        full : bool, optional
+            Whether to sync every version regardless of resync_age, by default False
+
+        Returns
+        -------
+        int
+            The number of versions that were added, updated or removed
+        """
+        with self.locks.lock(f'sync {repository.name.lower()}/{plugin.name}/{plugin.id or ""}'):
+            key = (repository.name.lower(), plugin.name, plugin.id or '')
+            if self._fresh('SELECT synced FROM plugins WHERE repository=? AND name=? AND plugin_id=?', key, max_age):
+                return 0
+            return self._syncPlugin(repository, plugin, full)
+
+    def _syncPlugin(self, repository:PluginRepository, plugin:Plugin, full:bool=False) -> int:
+        # The state is read under the lock, so a sync which waited on another only fetches newer changes
+        with self._lock:
+            row_id, state = self._plugin_row(repository, plugin, create=True)
+            resynced = self._db.execute('SELECT resynced FROM plugins WHERE id=?', (row_id,)).fetchone()[0]
+            self._db.commit()
+        full = full or resynced is None or time.time() - resynced >= Catalog.resync_age
+        if full:
+            # Without a state, the repository returns every version it has
+            state = {}
+        versions = repository.sync(plugin, state)
+        changed = 0
+        with self._lock, self._db:
+            row_id, _ = self._plugin_row(repository, plugin, create=True)
+            synced_ids = set()
+            for version in versions or []:
+                key = (row_id, version.version, json.dumps(version.metadata, sort_keys=True))
+                inserted = self._db.execute(
+                    'INSERT OR IGNORE INTO versions (plugin, version, metadata, has_compatibility) VALUES (?, ?, ?, ?)',
+                    (*key, version.compatibility is not None)
+                ).rowcount
+                version_id, has_compatibility = self._db.execute('SELECT id, has_compatibility FROM versions WHERE plugin=? AND version=? AND metadata=?', key).fetchone()
+                synced_ids.add(version_id)
+                compatibility = {(s.repository.name.lower(), s.server_version) for s in version.compatibility or ()}
+                stored = set(self._db.execute('SELECT server_repository, server_version FROM compatibility WHERE version=?', (version_id,)))
+                if not inserted and bool(has_compatibility) == (version.compatibility is not None) and stored == compatibility:
+                    continue
+                changed += 1
+                self._db.execute('UPDATE versions SET has_compatibility=? WHERE id=?', (version.compatibility is not None, version_id))
+                self._db.execute('DELETE FROM compatibility WHERE version=?', (version_id,))
+                self._db.executemany(
+                    'INSERT OR IGNORE INTO compatibility (version, server_repository, server_version) VALUES (?, ?, ?)',
+                    [(version_id, *server) for server in compatibility]
+                )
+            # A full sync lists every version, so the others were removed upstream. A repository
+            # answering None did not find the plugin at all, which may be temporary
+            if full and versions is not None:
+                removed = [row[0] for row in self._db.execute('SELECT id FROM versions WHERE plugin=?', (row_id,)) if row[0] not in synced_ids]
+                self._db.executemany('DELETE FROM versions WHERE id=?', [(version_id,) for version_id in removed])
+                changed += len(removed)
+            now = time.time()
+            self._db.execute('UPDATE plugins SET state=?, synced=?, resynced=? WHERE id=?', (json.dumps(state), now, now if full else resynced, row_id))
+        return changed
+
+    def search(self, repository:PluginRepository, plugin:Plugin, max_age:float|None=None) -> list[PluginVersion]|None:
+        """Answers a plugin search from the catalog
+
+        Parameters
+        ----------
+        repository : PluginRepository
+            The repository the versions belong to
+        plugin : Plugin
+            The plugin to look up
+        max_age : float, optional
+            Ignore the catalogued versions if the plugin was synced this many seconds ago or more, by default None
+
+        Returns
+        -------
+        list[PluginVersion] | None
+            The catalogued versions, or None if the plugin was never synced from the repository or its sync is too old
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT id, synced FROM plugins WHERE repository=? AND name=? AND plugin_id=? AND synced IS NOT NULL',
+                (repository.name.lower(), plugin.name, plugin.id or '')
+            ).fetchone()
+            if row is None or (max_age is not None and time.time() - row[1] >= max_age):
+                return None
+            rows = self._db.execute(
+                'SELECT v.id, v.version, v.has_compatibility, v.metadata, c.server_repository, c.server_version '
+                'FROM versions v LEFT JOIN compatibility c ON c.version = v.id '
+                'WHERE v.plugin=? ORDER BY v.id',
+                (row[0],)
+            ).fetchall()
+
+        servers = Catalog._servers() if any(r[4] for r in rows) else {}
+        entries = []
+        current = None
+        for version_id, version, has_compatibility, metadata, server_repository, server_version in rows:
+            if current is None or current[0] != version_id:
+                current = (version_id, version, has_compatibility, metadata, [])
+                entries.append(current)
+            if server_repository:
+                server = servers.get((server_repository, server_version))
+                if server is not None:
+                    current[4].append(server)
+
+        # Versions with identical compatibility share one tuple, as they do when searched live
+        compatibilities: dict[tuple, tuple[Server, ...]] = {}
+        results = []
+        for _, version, has_compatibility, metadata, compatibility in entries:
+            if has_compatibility:
+                compatibility = compatibilities.setdefault(tuple(id(s) for s in compatibility), tuple(compatibility))
+            else:
+                compatibility = None
+            results.append(PluginVersion(plugin=plugin, version=version, repository=repository, compatibility=compatibility, metadata=json.loads(metadata)))
+        return results
+
+    @staticmethod
+    def _servers() -> dict[tuple[str, str], Server]:
+        servers = {}
+        for repository in ServerRepository.repositories():
+            for server in repository.listAvailable():
+                servers[(repository.name.lower(), server.server_version)] = server
+        return servers
@@ -0,0 +1,117 @@
+from __future__ import annotations
+import errno
+import os
+import shutil
+import sys
+import threading
+from typing import Iterable
+
+# Errors of a kernel copy which mean the next method should be tried
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+# Copies within the kernel, best first. copy_file_range may share the blocks on filesystems with reflinks
+_KERNEL_COPIES = []
+if hasattr(os, 'copy_file_range'):
+    _KERNEL_COPIES.append(lambda source, target, count: os.copy_file_range(source, target, count))
+if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+    # Elsewhere, sendfile only writes to sockets
+    _KERNEL_COPIES.append(lambda source, target, count: os.sendfile(target, source, None, count))
+
+def copy_file(source:str, target:str) -> str:
+    """Copies a file without passing its contents through Python
+
+    Uses copy_file_range or sendfile where the platform and filesystems support them,
+    and continues with an ordinary copy from wherever they stopped otherwise.
+
+    Returns
+    -------
+    str
+        The target path
+    """
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        for copy in _KERNEL_COPIES:
+            try:
+                while remaining > 0:
+                    copied = copy(src.fileno(), dst.fileno(), min(remaining, 1 << 30))
+                    if not copied:
+                        break
+                    remaining -= copied
+                break
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+        # Both kernel copies advance the file offsets, so this resumes where they stopped
+        shutil.copyfileobj(src, dst, 1 << 20)
+    return target
+
+def write_chunks(fd:int, chunks:Iterable[bytes|memoryview], size:int|None=None) -> int:
+    """Writes chunks to a file descriptor, preallocating the expected size
+
+    Reserving the size up front keeps the file contiguous and makes a full disk fail
+    before the download rather than part way through. Chunks may be views of a buffer
+    reused for the next chunk, since each is written before the next is read.
+
+    Parameters
+    ----------
+    fd : int
+        The file descriptor to write to, positioned at the start of an empty file
+    chunks : Iterable[bytes | memoryview]
+        The data to write
+    size : int, optional
+        The expected total size, e.g. from Content-Length, by default None
+
+    Returns
+    -------
+    int
+        The number of bytes written
+    """
+    preallocated = False
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            preallocated = True
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    written = 0
+    for chunk in chunks:
+        view = memoryview(chunk)
+        while view:
+            count = os.write(fd, view)
+            view = view[count:]
+            written += count
+    # A body shorter than announced must not leave preallocated zeros behind
+    if preallocated and written != size:
+        os.ftruncate(fd, written)
+    return written
+
+def place_file(source:str, destination:str, filename:str|None=None) -> str:
+    """Hard links a file into a directory, copying it when a link is not possible
+
+    An existing file at the target is replaced.
+
+    Parameters
+    ----------
+    source : str
+        The file to place
+    destination : str
+        The directory to place the file into
+    filename : str, optional
+        The name of the placed file, by default the name of the source file
+
+    Returns
+    -------
+    str
+        The path of the placed file
+    """
+    target = os.path.join(destination, filename or os.path.basename(source))
+    if os.path.exists(target) and os.path.samefile(source, target):
+        return target
+    tmp = f'{target}.{os.getpid()}.{threading.get_ident()}.part'
+    try:
+        os.link(source, tmp)
+    except OSError:
+        copy_file(source, tmp)
+    os.replace(tmp, target)
+    return target
@@ -1,6 +1,7 @@
 from mim.util.Repository import *
+from mim.util.Artifacts import ArtifactCache
 import requests
-import os
+from mim.util import Http
 
 class GeyserRepository(PluginRepository):
     """A default repository implementation for Geyser plugins
@@ -15,14 +16,17 @@ class GeyserRepository(PluginRepository):
         )
     
     def search(self, plugin:Plugin) -> list[PluginVersion]|None:
-        project_response = requests.get(f'{self.api}projects/{plugin.name.lower()}').json()
+        project_response = Http.get(f'{self.api}projects/{plugin.name.lower()}', template='/v2/projects/{project}').json()
         if not 'versions' in project_response:
             return []
         project_versions = project_response['versions']
 
         versions: list[PluginVersion] = []
+        servers = ServerRepository.searchAll('1.x.x')
+        # Builds for the same loader share one compatibility tuple
+        compatibilities: dict[str, tuple[Server, ...]] = {}
         for pv in project_versions:
-            build_response = requests.get(f'{self.api}projects/{plugin.name.lower()}/versions/{pv}/builds').json()
+            build_response = Http.get(f'{self.api}projects/{plugin.name.lower()}/versions/{pv}/builds', template='/v2/projects/{project}/versions/{version}/builds').json()
             version_builds=build_response['builds']
             for vb in version_builds:
                 build = vb['build']
@@ -30,10 +34,11 @@ class GeyserRepository(PluginRepository):
                 downloads = vb['downloads']
 
                 if channel.lower() == 'default':
-                    servers = ServerRepository.searchAll('1.x.x')
                     for loader,download in downloads.items():
                         file = download['name']
-                        compatibility = [server for server in servers if server.name.lower() == loader or server.name.lower() == 'paper' and loader == 'spigot']
+                        compatibility = compatibilities.get(loader)
+                        if compatibility is None:
+                            compatibility = compatibilities[loader] = tuple(server for server in servers if server.name.lower() == loader or server.name.lower() == 'paper' and loader == 'spigot')
                         metadata = {
                             'project': plugin.name.lower(),
                             'version': pv,
@@ -50,27 +55,24 @@ class GeyserRepository(PluginRepository):
         filename = plugin_version.metadata['file']
         if plugin_version.version not in filename:
             filename = filename.replace('.jar', f'-{plugin_version.version}.jar')
-        asset = PluginAsset(filename=filename, plugin_version=plugin_version, metadata=plugin_version.metadata.copy())
+        asset = PluginAsset(filename=filename, plugin_version=plugin_version, metadata=plugin_version.metadata)
         assets.append(asset)
         return assets
     
-    def install(self, plugin_asset:PluginAsset, destination:str) -> list[str]|None:
-        if plugin_asset.repository != self:
-            raise ValueError(f'Plugin version {plugin_asset.plugin.name} does not belong to Geyser repository')
-        
+    def downloadUrl(self, plugin_asset:PluginAsset) -> str:
         project = plugin_asset.metadata['project']
         version = plugin_asset.metadata['version']
         build = plugin_asset.metadata['build']
         loader = plugin_asset.metadata['loader']
-        install_url = f'{self.api}projects/{project}/versions/{version}/builds/{build}/downloads/{loader}'
-        destination = os.path.join(destination, plugin_asset.filename)
+        return f'{self.api}projects/{project}/versions/{version}/builds/{build}/downloads/{loader}'
+
+    def fetch(self, plugin_asset:PluginAsset) -> str:
+        if plugin_asset.repository != self:
+            raise ValueError(f'Plugin version {plugin_asset.plugin.name} does not belong to Geyser repository')
+        
+        install_url = self.downloadUrl(plugin_asset)
 
         try:
-            with requests.get(install_url, stream=True) as r:
-                r.raise_for_status()
-                with open(destination, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            return destination
+            return ArtifactCache().fetch(self.name, plugin_asset.filename, install_url)
         except requests.exceptions.RequestException as e:
             raise Exception(f'Error installing Geyser plugin {plugin_asset.plugin.name} version {plugin_asset.version}: {e}')
\ No newline at end of file
@@ -1,6 +1,7 @@
 from mim.util.Repository import *
+from mim.util.Artifacts import ArtifactCache
 import requests
-import os
+from mim.util import Http
 
 class GithubRepository(PluginRepository):
     """A default repository implementation for GitHub-hosted plugins
@@ -15,15 +16,27 @@ class GithubRepository(PluginRepository):
         )
 
     def search(self, plugin:Plugin) -> list[PluginVersion]|None:
+        return self.sync(plugin, {})
+
+    def sync(self, plugin:Plugin, state:dict) -> list[PluginVersion]|None:
         if not plugin.id:
-            return None
-        response = requests.get(f'{self.api}{plugin.id}/releases')
+            return []
+        # A conditional request answers 304 when the releases are unchanged
+        headers = {'If-None-Match': state['etag']} if state.get('etag') else {}
+        response = Http.get(f'{self.api}{plugin.id}/releases', template='/repos/{owner}/{repo}/releases', headers=headers)
+        if response.status_code == 404:
+            return []
         if response.status_code != 200:
             return None
+        if response.headers.get('ETag'):
+            state['etag'] = response.headers['ETag']
         
         versions: list[PluginVersion] = []
         for release in response.json():
-            versions.append(PluginVersion(plugin=plugin, version=release['tag_name'], repository=self, metadata=release))
+            metadata = {
+                'assets': [{'name': asset['name'], 'browser_download_url': asset['browser_download_url']} for asset in release['assets']]
+            }
+            versions.append(PluginVersion(plugin=plugin, version=release['tag_name'], repository=self, metadata=metadata))
         return versions
     
     def listAssets(self, plugin_version:PluginVersion) -> list[PluginAsset]:
@@ -36,20 +49,17 @@ class GithubRepository(PluginRepository):
             assets.append(plugin_asset)
         return assets
     
-    def install(self, plugin_asset:PluginAsset, destination:str) -> list[str]|None:
+    def downloadUrl(self, plugin_asset:PluginAsset) -> str:
+        return plugin_asset.metadata['browser_download_url']
+
+    def fetch(self, plugin_asset:PluginAsset) -> str:
         if plugin_asset.repository != self:
             raise ValueError(f'Plugin version {plugin_asset.plugin.name} does not belong to GitHub repository')
         
-        install_url = plugin_asset.metadata['browser_download_url']
-        destination = os.path.join(destination, plugin_asset.filename)
+        install_url = self.downloadUrl(plugin_asset)
 
         try:
-            with requests.get(install_url, stream=True) as r:
-                r.raise_for_status()
-                with open(destination, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            return destination
+            return ArtifactCache().fetch(self.name, plugin_asset.filename, install_url)
         except requests.exceptions.RequestException as e:
             raise Exception(f'Error installing GitHub plugin {plugin_asset.plugin.name} version {plugin_asset.version}: {e}')
         
\ No newline at end of file
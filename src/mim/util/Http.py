@@ -0,0 +1,196 @@
+from __future__ import annotations
+import io
+import json
+import os
+import re
+from typing import Iterator
+from urllib.parse import urlsplit
+from mim.util.Cache import cache_directory
+from mim.util.Trace import tracer
+
+# Response headers which describe the transfer rather than the body that was recorded
+_TRANSFER_HEADERS = {'connection', 'content-encoding', 'content-length', 'keep-alive', 'transfer-encoding'}
+
+def __getattr__(name:str):
+    # requests is imported on first use, keeping it off the startup path of the CLI
+    if name == 'requests':
+        return _requests()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def _requests():
+    global requests
+    import requests
+    return requests
+
+def url_template(url:str) -> str:
+    """Returns the path and query keys of a URL with identifiers and versions replaced by {}
+    """
+    parts = urlsplit(url)
+    # API versions such as v2 are kept
+    path = re.sub(r'(?<=/)(?!v\d+(?:/|$))[^/]*\d[^/]*', '{}', parts.path)
+    query = '&'.join(f'{pair.split("=")[0]}={{}}' for pair in parts.query.split('&') if pair)
+    return path + (f'?{query}' if query else '')
+
+def fixture_path(directory:str, url:str) -> str:
+    """Returns the file recording the response to a URL, without its .body suffix
+    """
+    import hashlib
+    parts = urlsplit(url)
+    return os.path.join(directory, parts.netloc or 'local', hashlib.sha1(url.encode('utf-8')).hexdigest()[:20])
+
+def save_fixture(directory:str, url:str, response:requests.Response):
+    """Records a response to a URL in a fixture directory
+    """
+    path = fixture_path(directory, url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    headers = {key: value for key, value in response.headers.items() if key.lower() not in _TRANSFER_HEADERS}
+    with open(path + '.body', 'wb') as f:
+        f.write(response.content or b'')
+    with open(path + '.json', 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'status': response.status_code, 'reason': response.reason, 'headers': headers}, f, indent=2)
+
+def read_fixture(directory:str, url:str) -> tuple[dict, bytes]|None:
+    """Returns the recorded status, headers and body of a URL, or None if none was recorded
+    """
+    path = fixture_path(directory, url)
+    try:
+        with open(path + '.json', encoding='utf-8') as f:
+            data = json.load(f)
+        with open(path + '.body', 'rb') as f:
+            return data, f.read()
+    except FileNotFoundError:
+        return None
+
+def load_fixture(directory:str, url:str) -> requests.Response:
+    """Returns the recorded response to a URL
+
+    Raises
+    ------
+    requests.exceptions.ConnectionError
+        If no response was recorded for the URL
+    """
+    requests = _requests()
+    fixture = read_fixture(directory, url)
+    if fixture is None:
+        raise requests.exceptions.ConnectionError(f'No recorded response for {url} in {directory}')
+    data, body = fixture
+    response = requests.models.Response()
+    response.status_code = data['status']
+    response.reason = data['reason']
+    response.url = url
+    response.headers = requests.structures.CaseInsensitiveDict(data['headers'])
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.raw = io.BytesIO(body)
+    return response
+
+def standin_url(url:str, standin:str) -> str:
+    """Returns the URL under which a stand-in server serves the response to a URL
+    """
+    parts = urlsplit(url)
+    return f'{standin.rstrip("/")}/{parts.scheme}/{parts.netloc}{parts.path}' + (f'?{parts.query}' if parts.query else '')
+
+def _send(url:str, **kwargs) -> requests.Response:
+    requests = _requests()
+    standin = os.environ.get('MIM_HTTP_STANDIN')
+    mode = os.environ.get('MIM_HTTP_MODE') or 'live'
+    if mode == 'live':
+        return requests.get(standin_url(url, standin) if standin else url, **kwargs)
+    if mode not in ('record', 'replay'):
+        raise ValueError(f'Invalid MIM_HTTP_MODE {mode}, expected live, record or replay')
+
+    fixtures = os.environ.get('MIM_HTTP_FIXTURES') or os.path.join(cache_directory(), 'fixtures')
+    # Fixtures are keyed by the URL actually requested, query parameters included
+    url = requests.Request('GET', url, params=kwargs.pop('params', None)).prepare().url
+    if mode == 'record':
+        kwargs.pop('stream', None)
+        save_fixture(fixtures, url, requests.get(url, **kwargs))
+    return load_fixture(fixtures, url)
+
+def get(url:str, template:str|None=None, **kwargs) -> requests.Response:
+    """Sends a GET request, recording it with the tracer when tracing is enabled
+
+    The MIM_HTTP_MODE environment variable selects where responses come from: live (the
+    default) sends requests, record sends them and saves the responses in the MIM_HTTP_FIXTURES
+    directory (by default the fixtures directory of cache_directory()), and replay answers from
+    the saved responses without any network access. In live mode, MIM_HTTP_STANDIN sends every
+    request to a StandInServer at that URL instead of the real host.
+
+    Parameters
+    ----------
+    url : str
+        The URL to request
+    template : str, optional
+        The URL path with its variable parts replaced, used to group requests in traces. By default derived with url_template()
+    **kwargs
+        Passed to requests.get
+
+    Returns
+    -------
+    requests.Response
+        The response
+    """
+    requests = _requests()
+    if not tracer.enabled:
+        return _send(url, **kwargs)
+
+    template = template or url_template(url)
+    start = tracer.now()
+    try:
+        response = _send(url, **kwargs)
+    except requests.exceptions.RequestException:
+        elapsed = tracer.now() - start
+        tracer.request('GET', url, template, None, start, elapsed, elapsed, 0)
+        raise
+    latency = tracer.now() - start
+
+    if not kwargs.get('stream'):
+        tracer.request('GET', url, template, response.status_code, start, latency, latency, len(response.content or b''))
+        return response
+
+    # Streamed bodies are recorded once they have been read, through either iter_content or iter_into
+    def counting(chunks):
+        size = 0
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+        finally:
+            tracer.request('GET', url, template, response.status_code, start, latency, tracer.now() - start, size)
+    iter_content = response.iter_content
+    response.iter_content = lambda *args, **kwargs: counting(iter_content(*args, **kwargs))
+    response.iter_into = lambda buffer: counting(_iter_into(response, buffer))
+    return response
+
+def _iter_into(response:requests.Response, buffer:memoryview) -> Iterator[bytes|memoryview]:
+    # Responses built without a connection, such as in tests, may have no raw stream
+    raw = getattr(response, 'raw', None)
+    # Encoded bodies are decoded by iter_content, which may buffer across reads
+    if not isinstance(raw, io.IOBase) or response.headers.get('Content-Encoding', 'identity') != 'identity':
+        yield from response.iter_content(chunk_size=len(buffer))
+        return
+    while True:
+        count = raw.readinto(buffer)
+        if not count:
+            return
+        yield buffer[:count]
+
+def iter_into(response:requests.Response, buffer:memoryview) -> Iterator[bytes|memoryview]:
+    """Reads a streamed response body into a reusable buffer
+
+    Each read fills the buffer directly where the body is a readable stream without a
+    Content-Encoding, rather than allocating a new chunk for each read as iter_content does.
+
+    Parameters
+    ----------
+    response : requests.Response
+        A response requested with stream=True
+    buffer : memoryview
+        The buffer to read into. Its size sets the size of each read
+
+    Returns
+    -------
+    Iterator[bytes | memoryview]
+        The filled part of the buffer after each read, valid until the next is requested
+    """
+    reader = getattr(response, 'iter_into', None)
+    return reader(buffer) if reader is not None else _iter_into(response, buffer)
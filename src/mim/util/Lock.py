@@ -0,0 +1,207 @@
+from __future__ import annotations
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+from mim.util.Cache import cache_directory
+
+def _alive(pid:int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class FileLock:
+    """An exclusive lock shared by threads, processes and hosts using the same lock file
+
+    Threads of one process are serialized with an in-process lock, since fcntl locks are
+    held per process. Between processes, the lock is a POSIX record lock, which also works
+    on NFS. The lock file records the holder's host and pid, refreshed while the lock is
+    held, so a lock whose holder died without the lock being released can be broken.
+    """
+
+    _threads: dict[str, threading.Lock] = {}
+    _threads_guard = threading.Lock()
+
+    def __init__(self, path:str, stale:float=300, poll:float=0.1):
+        """Initializes a lock
+
+        Parameters
+        ----------
+        path : str
+            The lock file
+        stale : float, optional
+            Seconds without a heartbeat after which a lock held from another host is broken, by default 300
+        poll : float, optional
+            Seconds between attempts while waiting, by default 0.1
+        """
+        self.path = path
+        self.stale = stale
+        self.poll = poll
+        self._fd: int|None = None
+        self._heartbeat: threading.Event|None = None
+        with FileLock._threads_guard:
+            self._thread = FileLock._threads.setdefault(os.path.abspath(path), threading.Lock())
+
+    def owner(self) -> dict|None:
+        """Returns the host, pid and heartbeat time recorded by the holder, if any
+        """
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.loads(f.read() or 'null')
+        except (OSError, ValueError):
+            return None
+
+    def _read(self) -> tuple[int, dict|None]|None:
+        # The inode and owner of the lock file, read through one descriptor so they belong together
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                try:
+                    return inode, json.loads(f.read() or 'null')
+                except ValueError:
+                    return inode, None
+        except OSError:
+            return None
+
+    def _stale(self) -> tuple[int, dict]|None:
+        """Returns the inode and owner of the lock file if its holder is gone, or None
+        """
+        current = self._read()
+        if current is None or not current[1]:
+            return None
+        owner = current[1]
+        if owner.get('host') == os.uname().nodename:
+            stale = not _alive(owner.get('pid', 0))
+        else:
+            stale = time.time() - owner.get('time', 0) > self.stale
+        return current if stale else None
+
+    def _break(self, judged:tuple[int, dict]):
+        """Unlinks the lock file if it is still the one judged stale
+
+        Waiters breaking the same stale lock are serialized by a guard lock on a file which
+        is never removed. Under it, the file is only unlinked while its inode and owner are
+        those judged stale, so a slower breaker cannot unlink the file a faster one has since
+        created and locked. A new file is empty or has a live owner until it is abandoned.
+        The abandoned file's holder keeps a lock on an inode nobody else opens.
+        """
+        fd = os.open(self.path + '.break', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            if self._read() == judged:
+                os.remove(self.path)
+        finally:
+            # Closing the descriptor releases the guard
+            os.close(fd)
+
+    def _try(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        try:
+            same = os.fstat(fd).st_ino == os.stat(self.path).st_ino
+        except FileNotFoundError:
+            same = False
+        if not same:
+            # The file was broken as stale after we opened it
+            os.close(fd)
+            return False
+        self._fd = fd
+        self._write()
+        return True
+
+    def _write(self):
+        data = json.dumps({'host': os.uname().nodename, 'pid': os.getpid(), 'time': time.time()}).encode('utf-8')
+        os.ftruncate(self._fd, 0)
+        os.pwrite(self._fd, data, 0)
+
+    def _beat(self, stop:threading.Event):
+        while not stop.wait(self.stale / 3):
+            try:
+                self._write()
+            except OSError:
+                pass
+
+    def acquire(self, timeout:float|None=None) -> bool:
+        """Waits for the lock
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum number of seconds to wait. If None, waits indefinitely, by default None
+
+        Returns
+        -------
+        bool
+            True if the lock was acquired
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._thread.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        while not self._try():
+            stale = self._stale()
+            if stale is not None:
+                self._break(stale)
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                self._thread.release()
+                return False
+            time.sleep(self.poll)
+
+        self._heartbeat = threading.Event()
+        threading.Thread(target=self._beat, args=(self._heartbeat,), daemon=True).start()
+        return True
+
+    def release(self):
+        if self._fd is None:
+            raise RuntimeError(f'{self.path} is not locked')
+        self._heartbeat.set()
+        os.ftruncate(self._fd, 0)
+        fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+        self._thread.release()
+
+    def __enter__(self) -> FileLock:
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+class LockManager:
+    """Hands out a FileLock per cache key, with lock files in a shared directory
+    """
+
+    def __init__(self, directory:str|None=None, stale:float=300):
+        """Initializes a lock manager
+
+        Parameters
+        ----------
+        directory : str, optional
+            The directory holding lock files, by default the locks directory of cache_directory()
+        stale : float, optional
+            Seconds without a heartbeat after which a lock held from another host is broken, by default 300
+        """
+        self.directory = directory or os.path.join(cache_directory(), 'locks')
+        self.stale = stale
+
+    def path(self, key:str) -> str:
+        import hashlib
+        readable = re.sub(r'[^A-Za-z0-9._-]+', '_', key)[:64]
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, f'{readable}.{digest}.lock')
+
+    def lock(self, key:str) -> FileLock:
+        return FileLock(self.path(key), stale=self.stale)
@@ -0,0 +1,243 @@
+from mim.util.Repository import *
+from mim.util.Artifacts import ArtifactCache
+from urllib.parse import quote
+import requests
+from mim.util import Http
+import json
+import os
+import re
+import tempfile
+
+def mirror_key(plugin:Plugin) -> str:
+    """Returns the file name stem used for a plugin in a mirror
+    """
+    key = re.sub(r'[^a-z0-9._-]+', '_', plugin.name.lower())
+    if plugin.id:
+        key += '__' + re.sub(r'[^a-z0-9._-]+', '_', str(plugin.id).lower())
+    return key
+
+class _MirrorSource:
+    """Reads files from a mirror directory or from a mirror served over HTTP
+    """
+
+    def __init__(self, source:str):
+        self.source = source.rstrip('/')
+        self.remote = self.source.startswith(('http://', 'https://'))
+
+    def url(self, *parts:str) -> str:
+        if self.remote:
+            return '/'.join([self.source] + [quote(part) for part in parts])
+        return os.path.join(self.source, *parts)
+
+    def read(self, *parts:str) -> dict|list|None:
+        if self.remote:
+            response = Http.get(self.url(*parts))
+            if response.status_code == 404:
+                return None
+            response.raise_for_status()
+            return response.json()
+        try:
+            with open(self.url(*parts), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def fetch(self, repository:str, parts:tuple[str, ...], filename:str) -> str:
+        if self.remote:
+            return ArtifactCache().fetch(repository, filename, self.url(*parts))
+        source = self.url(*parts)
+        if not os.path.isfile(source):
+            raise FileNotFoundError(f'{filename} is not mirrored in {self.source}')
+        return source
+
+class MirrorServerRepository(ServerRepository):
+    """A server repository reading from a mirror created by mim mirror
+    """
+
+    def __init__(self, source:str):
+        super().__init__(
+            name='Mirror',
+            description=f'A mirror of Minecraft servers at {source}',
+            api_url=source
+        )
+        self.mirror = _MirrorSource(source)
+        self.local = not self.mirror.remote
+        self.servers: list[Server]|None = None
+        self._upstream: dict[tuple[str, str], str] = {}
+        self._by_upstream: dict[tuple[str, str], Server] = {}
+
+    def list(self) -> list[Server]:
+        if self.servers is not None:
+            return self.servers
+
+        servers: list[Server] = []
+        index = self.mirror.read('index.json') or {}
+        for upstream in index.get('servers', []):
+            for entry in self.mirror.read('servers', f'{upstream}.json') or []:
+                server = Server(name=entry['name'], server_version=entry['server_version'], minecraft_version=entry['minecraft_version'], repository=self)
+                self._upstream[(server.name, server.server_version)] = upstream
+                self._by_upstream[(upstream, server.server_version)] = server
+                servers.append(server)
+        self.servers = servers
+        return servers
+
+    def refresh(self) -> bool:
+        previous, upstream, by_upstream = self.servers, self._upstream, self._by_upstream
+        self.servers, self._upstream, self._by_upstream = None, {}, {}
+        try:
+            servers = self.list()
+        except Exception:
+            self.servers, self._upstream, self._by_upstream = previous, upstream, by_upstream
+            raise
+        if previous is not None and [(s.name, s.server_version) for s in previous] == [(s.name, s.server_version) for s in servers]:
+            self.servers, self._upstream, self._by_upstream = previous, upstream, by_upstream
+            return False
+        return previous is not None
+
+    def lookup(self, upstream:str, server_version:str) -> Server|None:
+        """Returns the mirrored server of an upstream repository
+        """
+        self.list()
+        return self._by_upstream.get((upstream, server_version))
+
+    def downloadUrl(self, server:Server) -> str:
+        self.list()
+        return self.mirror.url('servers', self._upstream[(server.name, server.server_version)], server.asset)
+
+    def fetch(self, server:Server) -> str:
+        if server.repository != self:
+            raise ValueError(f'Server {server.name} does not belong to Mirror repository')
+        self.list()
+        upstream = self._upstream[(server.name, server.server_version)]
+        return self.mirror.fetch(self.name, ('servers', upstream, server.asset), server.asset)
+
+class MirrorRepository(PluginRepository):
+    """A plugin repository reading from a mirror created by mim mirror
+
+    The mirror may be a local directory or a plain HTTP file server. Versions keep the
+    name of the repository they were mirrored from in their metadata.
+    """
+
+    def __init__(self, source:str, servers:MirrorServerRepository):
+        super().__init__(
+            name='Mirror',
+            description=f'A mirror of Minecraft plugins at {source}',
+            api_url=source
+        )
+        self.mirror = _MirrorSource(source)
+        self.local = not self.mirror.remote
+        self.servers = servers
+
+    def serves(self, repository:str) -> bool:
+        # Every mirrored repository is answered here, limited to its versions
+        return True
+
+    def pinned(self, versions:list[PluginVersion], repository:str) -> list[PluginVersion]:
+        if repository.lower() == self.name.lower():
+            return versions
+        return [version for version in versions if version.metadata['repository'] == repository.lower()]
+
+    def search(self, plugin:Plugin) -> list[PluginVersion]|None:
+        entries = self.mirror.read('plugins', f'{mirror_key(plugin)}.json')
+        if entries is None:
+            return None
+        versions: list[PluginVersion] = []
+        compatibilities: dict[tuple, tuple[Server, ...]] = {}
+        for entry in entries:
+            compatibility = None
+            if entry['compatibility'] is not None:
+                key = tuple(tuple(c) for c in entry['compatibility'])
+                compatibility = compatibilities.get(key)
+                if compatibility is None:
+                    servers = (self.servers.lookup(upstream, server_version) for upstream, server_version in key)
+                    compatibility = compatibilities[key] = tuple(s for s in servers if s is not None)
+            metadata = {'repository': entry['repository'], 'assets': entry['assets']}
+            versions.append(PluginVersion(plugin=plugin, version=entry['version'], repository=self, compatibility=compatibility, metadata=metadata))
+        return versions
+
+    def listAssets(self, plugin_version:PluginVersion) -> list[PluginAsset]:
+        upstream = plugin_version.metadata['repository']
+        return [PluginAsset(filename=filename, plugin_version=plugin_version, metadata={'repository': upstream}) for filename in plugin_version.metadata['assets']]
+
+    def downloadUrl(self, plugin_asset:PluginAsset) -> str:
+        return self.mirror.url('plugins', plugin_asset.metadata['repository'], plugin_asset.filename)
+
+    def fetch(self, plugin_asset:PluginAsset) -> str:
+        if plugin_asset.repository != self:
+            raise ValueError(f'Plugin version {plugin_asset.plugin.name} does not belong to Mirror repository')
+        upstream = plugin_asset.metadata['repository']
+        try:
+            return self.mirror.fetch(self.name, ('plugins', upstream, plugin_asset.filename), plugin_asset.filename)
+        except requests.exceptions.RequestException as e:
+            raise Exception(f'Error installing mirrored plugin {plugin_asset.plugin.name} version {plugin_asset.version}: {e}')
+
+class MirrorBuilder:
+    """Materializes server and plugin metadata and files into a mirror directory
+    """
+
+    def __init__(self, directory:str):
+        self.directory = directory
+        # Extend an existing mirror rather than replacing its index
+        try:
+            with open(os.path.join(directory, 'index.json'), encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {}
+        self.servers: list[str] = index.get('servers', [])
+        self.plugins: dict[str, dict] = index.get('plugins', {})
+        os.makedirs(directory, exist_ok=True)
+
+    def _write(self, data, *parts:str):
+        path = os.path.join(self.directory, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+
+    def addServers(self, repository:ServerRepository):
+        """Writes the server list of a repository
+        """
+        upstream = repository.name.lower()
+        entries = [{'name': s.name, 'server_version': s.server_version, 'minecraft_version': s.minecraft_version} for s in repository.listAvailable()]
+        self._write(entries, 'servers', f'{upstream}.json')
+        if upstream not in self.servers:
+            self.servers.append(upstream)
+
+    def addPlugin(self, plugin:Plugin, versions:list[PluginVersion]):
+        """Writes the metadata of every version of a plugin
+        """
+        entries = []
+        for version in versions:
+            entries.append({
+                'repository': version.repository.name.lower(),
+                'version': version.version,
+                'compatibility': None if version.compatibility is None else [[s.repository.name.lower(), s.server_version] for s in version.compatibility],
+                'assets': [a.filename for a in version.assets],
+            })
+        key = mirror_key(plugin)
+        self._write(entries, 'plugins', f'{key}.json')
+        self.plugins[key] = {'name': plugin.name, 'id': plugin.id}
+
+    def addServerFile(self, server:Server) -> str:
+        """Downloads a server into the mirror
+        """
+        directory = os.path.join(self.directory, 'servers', server.repository.name.lower())
+        os.makedirs(directory, exist_ok=True)
+        return server.install(directory)
+
+    def addPluginFile(self, asset:PluginAsset) -> str:
+        """Downloads a plugin file into the mirror, unless it is already mirrored
+        """
+        directory = os.path.join(self.directory, 'plugins', asset.repository.name.lower())
+        path = os.path.join(directory, asset.filename)
+        if os.path.isfile(path):
+            return path
+        os.makedirs(directory, exist_ok=True)
+        return asset.install(directory)
+
+    def finish(self):
+        """Writes the mirror index. Call after everything has been added
+        """
+        self._write({'servers': self.servers, 'plugins': self.plugins}, 'index.json')
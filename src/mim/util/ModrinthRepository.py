@@ -1,6 +1,7 @@
 from mim.util.Repository import *
+from mim.util.Artifacts import ArtifactCache
 import requests
-import os
+from mim.util import Http
 
 class ModrinthRepository(PluginRepository):
     """A default repository implementation for Modrinth plugins
@@ -15,22 +16,56 @@ class ModrinthRepository(PluginRepository):
         )
     
     def search(self, plugin:Plugin) -> list[PluginVersion]|None:
-        response = requests.get(f'{self.api}search?query={plugin.name}').json()
+        return self.sync(plugin, {})
+
+    def sync(self, plugin:Plugin, state:dict) -> list[PluginVersion]|None:
+        since = state.get('date_published')
+        newest = since
+        # The matching projects are remembered, so later syncs skip the search
+        projects = state.get('projects')
+        if projects is None:
+            response = Http.get(f'{self.api}search?query={plugin.name}', template='/v2/search?query={name}').json()
+            projects = [project['project_id'] for project in response['hits']
+                        if project['title'].lower() == plugin.name.lower() or project['slug'].lower() == plugin.name.lower()]
+        etags = state.get('etags', {})
         versions: list[PluginVersion] = []
-        for project in response['hits']:
-            if project['title'].lower() == plugin.name.lower() or project['slug'].lower() == plugin.name.lower():
-                project_id = project['project_id']
-                version_response = requests.get(f'{self.api}project/{project_id}/version').json()
-                for version in version_response:
-                    if version.get('version_type') == 'release':
-                        game_versions = version['game_versions']
-                        loaders = version['loaders']
-                        compatibility: list[Server] = []
+        # Versions with the same game versions and loaders share one compatibility tuple
+        compatibilities: dict[tuple, tuple[Server, ...]] = {}
+        for project_id in projects:
+            # A conditional request answers 304 when the project has no new versions
+            headers = {'If-None-Match': etags[project_id]} if since and etags.get(project_id) else {}
+            version_request = Http.get(f'{self.api}project/{project_id}/version', template='/v2/project/{id}/version', headers=headers)
+            if version_request.status_code == 304:
+                continue
+            if version_request.headers.get('ETag'):
+                etags[project_id] = version_request.headers['ETag']
+            version_response = version_request.json()
+            for version in version_response:
+                published = version.get('date_published')
+                if since and published and published <= since:
+                    continue
+                if published and (newest is None or published > newest):
+                    newest = published
+                if version.get('version_type') == 'release':
+                    game_versions = version['game_versions']
+                    loaders = version['loaders']
+                    compatibility_key = (tuple(game_versions), tuple(loaders))
+                    compatibility = compatibilities.get(compatibility_key)
+                    if compatibility is None:
+                        servers: list[Server] = []
                         for gv in game_versions:
-                            servers = ServerRepository.searchAll(gv)
-                            compatibility.extend([server for server in servers if server.name.lower() in loaders])
-                        if compatibility:
-                            versions.append(PluginVersion(plugin=plugin, version=version['version_number'], repository=self,compatibility=compatibility,metadata=version))
+                            servers.extend([server for server in ServerRepository.searchAll(gv) if server.name.lower() in loaders])
+                        compatibility = compatibilities[compatibility_key] = tuple(servers)
+                    if compatibility:
+                        metadata = {
+                            'files': [{'filename': file['filename'], 'url': file['url'], 'hashes': file.get('hashes', {})} for file in version['files']]
+                        }
+                        versions.append(PluginVersion(plugin=plugin, version=version['version_number'], repository=self,compatibility=compatibility,metadata=metadata))
+        if newest:
+            state['date_published'] = newest
+        state['projects'] = projects
+        if etags:
+            state['etags'] = etags
         return versions
     
     def listAssets(self, plugin_version:PluginVersion) -> list[PluginAsset]:
@@ -43,19 +78,23 @@ class ModrinthRepository(PluginRepository):
             assets.append(asset)
         return assets
     
-    def install(self, plugin_asset:PluginAsset, destination:str) -> list[str]|None:
+    def checksum(self, plugin_asset:PluginAsset) -> tuple[str, str]|None:
+        hashes = plugin_asset.metadata.get('hashes') or {}
+        for algorithm in ('sha512', 'sha1'):
+            if hashes.get(algorithm):
+                return algorithm, hashes[algorithm]
+        return None
+
+    def downloadUrl(self, plugin_asset:PluginAsset) -> str:
+        return plugin_asset.metadata['url']
+
+    def fetch(self, plugin_asset:PluginAsset) -> str:
         if plugin_asset.repository != self:
             raise ValueError(f'Plugin version {plugin_asset.plugin.name} does not belong to Modrinth repository')
         
-        install_url = plugin_asset.metadata['url']
-        destination = os.path.join(destination, plugin_asset.filename)
+        install_url = self.downloadUrl(plugin_asset)
 
         try:
-            with requests.get(install_url, stream=True) as r:
-                r.raise_for_status()
-                with open(destination, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            return destination
+            return ArtifactCache().fetch(self.name, plugin_asset.filename, install_url)
         except requests.exceptions.RequestException as e:
             raise Exception(f'Error installing Modrinth plugin {plugin_asset.plugin.name} version {plugin_asset.version}: {e}')
\ No newline at end of file
@@ -1,7 +1,7 @@
 from mim.util.Repository import *
+from mim.util.Artifacts import ArtifactCache
 import requests
-import os
-import re
+from mim.util import Http
 
 class PaperRepository(ServerRepository):
     """A default repository implementation for PaperMC servers
@@ -17,17 +17,12 @@ class PaperRepository(ServerRepository):
         self.servers: list[Server]|None = None
         self.user_agent = {'User-Agent': 'MinecraftPluginManager (https://github.com/thehappykraken/MinecraftPluginManager)'}
 
-    def search(self, minecraft_version:str) -> list[Server]|None:
-        servers = self.list()
-        minecraft_version = minecraft_version.replace('.x','.?\d*')
-        return [server for server in servers if re.fullmatch(minecraft_version, server.minecraft_version)]
-
     def list(self) -> list[Server]:
         if self.servers is not None:
             return self.servers
         
         servers: list[Server] = []
-        response = requests.get(self.api + 'projects/paper', headers=self.user_agent).json()
+        response = Http.get(self.api + 'projects/paper', template='/v3/projects/paper', headers=self.user_agent).json()
         for major_version in response['versions']:
             for minor_version in response['versions'][major_version]:
                 minecraft_version = minor_version
@@ -35,26 +30,32 @@ class PaperRepository(ServerRepository):
         self.servers = servers
         return servers
     
-    def install(self, server, destination) -> str|None:
+    def refresh(self) -> bool:
+        previous, self.servers = self.servers, None
+        try:
+            servers = self.list()
+        except Exception:
+            self.servers = previous
+            raise
+        if previous is not None and [s.server_version for s in previous] == [s.server_version for s in servers]:
+            self.servers = previous
+            return False
+        return previous is not None
+
+    def fetch(self, server:Server) -> str:
         if server.repository != self:
             raise ValueError(f'Server {server.name} does not belong to Modrinth repository')
         
         minecraft_version = server.minecraft_version
-        response = requests.get(f'{self.api}projects/paper/versions/{minecraft_version}/builds', headers=self.user_agent).json()
-        # latest_build = [build for build in response if build['channel'] == 'STABLE'][0]
-        sort_priority = {'STABLE': 'C', 'BETA': 'B', 'ALPHA': 'A'}
-        response.sort(key=lambda b: sort_priority[b['channel']]+str(b['id']), reverse=True)
-        latest_build = response[0]
-        server_version = minecraft_version + '-' + str(latest_build['id'])
-        download_url = latest_build['downloads']['server:default']['url']
-        destination = os.path.join(destination, server.asset)
+
+        def download_url() -> str:
+            response = Http.get(f'{self.api}projects/paper/versions/{minecraft_version}/builds', template='/v3/projects/paper/versions/{version}/builds', headers=self.user_agent).json()
+            # latest_build = [build for build in response if build['channel'] == 'STABLE'][0]
+            sort_priority = {'STABLE': 2, 'BETA': 1, 'ALPHA': 0}
+            latest_build = max(response, key=lambda b: (sort_priority.get(b['channel'], -1), b['id']))
+            return latest_build['downloads']['server:default']['url']
 
         try:
-            with requests.get(download_url, headers=self.user_agent, stream=True) as r:
-                r.raise_for_status()
-                with open(destination, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            return destination
+            return ArtifactCache().fetch(self.name, server.asset, download_url, headers=self.user_agent)
         except requests.exceptions.RequestException as e:
-            raise Exception(f'Error downloading Paper server version {server_version}: {e}')
+            raise Exception(f'Error downloading Paper server version {server.server_version}: {e}')
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable
+from mim.util.Artifacts import cancellation
+from mim.util.Repository import PluginAsset, Server
+
+class FetchPipeline:
+    """Fetches artifacts in the background while an install is still being resolved
+
+    Artifacts are submitted as soon as the resolution can name them, either because they
+    are certain (an exact server version, a pinned plugin version) or as a guess at what
+    the resolution will select. Once the plans are final, keep() cancels the fetches of
+    every artifact they do not use, stopping downloads part way through. Downloads that
+    completed stay in the artifact cache.
+    """
+
+    def __init__(self, jobs:int=4):
+        """Starts a pipeline
+
+        Parameters
+        ----------
+        jobs : int, optional
+            The number of concurrent fetches, by default 4
+        """
+        self._pool = ThreadPoolExecutor(max_workers=jobs)
+        self._lock = threading.Lock()
+        self._fetches: dict[tuple[str, str], tuple[Future, threading.Event]] = {}
+        self.cancelled = 0
+
+    @staticmethod
+    def key(artifact:Server|PluginAsset) -> tuple[str, str]:
+        return artifact.repository.name, artifact.asset if isinstance(artifact, Server) else artifact.filename
+
+    @staticmethod
+    def _fetch(artifact:Server|PluginAsset, event:threading.Event) -> str:
+        token = cancellation.set(event)
+        try:
+            return artifact.fetch()
+        finally:
+            cancellation.reset(token)
+
+    def submit(self, artifact:Server|PluginAsset):
+        """Starts fetching an artifact, unless it is already being fetched
+        """
+        key = FetchPipeline.key(artifact)
+        with self._lock:
+            if key not in self._fetches:
+                event = threading.Event()
+                self._fetches[key] = (self._pool.submit(FetchPipeline._fetch, artifact, event), event)
+
+    def keep(self, artifacts:Iterable[Server|PluginAsset]) -> int:
+        """Cancels the fetches of every artifact not in a list
+
+        Returns
+        -------
+        int
+            The number of fetches cancelled
+        """
+        keys = {FetchPipeline.key(artifact) for artifact in artifacts}
+        with self._lock:
+            rejected = [key for key in self._fetches if key not in keys]
+            for key in rejected:
+                future, event = self._fetches.pop(key)
+                event.set()
+                future.cancel()
+        self.cancelled += len(rejected)
+        return len(rejected)
+
+    def results(self, artifacts:Iterable[Server|PluginAsset]) -> dict:
+        """Fetches artifacts, waiting for those already submitted
+
+        Returns
+        -------
+        dict
+            The local path of each artifact, keyed by repository name and file name
+        """
+        keys = []
+        for artifact in artifacts:
+            self.submit(artifact)
+            keys.append(FetchPipeline.key(artifact))
+        with self._lock:
+            futures = {key: self._fetches[key][0] for key in keys}
+        return {key: future.result() for key, future in futures.items()}
+
+    def close(self):
+        """Cancels the fetches still running and waits for them to stop
+        """
+        with self._lock:
+            for future, event in self._fetches.values():
+                event.set()
+                future.cancel()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> FetchPipeline:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,17 +1,58 @@
 from __future__ import annotations
 import os
+import threading
+from functools import partial
+from typing import Callable
+from mim.util.Cache import Cache
+from mim.util.Files import place_file
+from mim.util.Trace import tracer
+from mim.util.Versioning import VersionIndex, VersionKey, VersionRange, version_key
+
+class OfflineError(Exception):
+    """Raised in offline mode when metadata or artifacts are not cached locally
+    """
+
+    def __init__(self, missing:list[str]):
+        self.missing = missing
+        super().__init__(
+            'Not available offline:\n' + '\n'.join(f' - {m}' for m in missing) +
+            '\nRun mim sync and an online install or download to populate the local caches'
+        )
+
+# Guards the creation of lazily registered repositories
+_registry_lock = threading.RLock()
+
+def _create(registry:dict, names:list[str]):
+    with _registry_lock:
+        for name in names:
+            entry = registry.get(name)
+            if entry is not None and not isinstance(entry, (ServerRepository, PluginRepository)):
+                repository = entry()
+                # The constructor registers the repository under its own name
+                if registry.get(name) is entry:
+                    registry[name] = repository
 
 class Server:
+    __slots__ = ('name', 'server_version', 'minecraft_version', 'repository', 'sort_key')
+
     def __init__(self, name:str, server_version:str, minecraft_version:str, repository:ServerRepository):
         self.name = name
         self.server_version = server_version
         self.minecraft_version = minecraft_version
         self.repository = repository
+        self.sort_key: VersionKey = version_key(server_version)
 
     @property
     def asset(self):
         return f'{self.name}-{self.server_version}.jar'
 
+    @property
+    def url(self) -> str|None:
+        return self.repository.downloadUrl(self)
+
+    def fetch(self) -> str:
+        return self.repository.fetch(self)
+
     def install(self, destination:str) -> str:
         return self.repository.install(self,destination)
 
@@ -32,7 +73,7 @@ class Server:
             A list of installed version strings
         """
         installed_versions = []
-        for server in self.repository.list():
+        for server in self.repository.listAvailable():
             filepath = os.path.join(directory, server.asset)
             if os.path.isfile(filepath):
                 installed_versions.append(server)
@@ -42,7 +83,14 @@ class Server:
 class ServerRepository:
     """This class defines an interface for working with repositories
     """
-    _registry: dict[str, ServerRepository] = {}
+    # Maps lowercase names to repositories, or to factories creating them on first use
+    _registry: dict[str, ServerRepository|Callable[[], ServerRepository]] = {}
+    # A mim.util.Catalog.Catalog consulted before listing a repository, if set
+    catalog = None
+    # When True, servers are only listed from the catalog
+    offline: bool = False
+    # True for repositories which read from the local filesystem and remain usable offline
+    local: bool = False
 
     def __init__(self,name:str,description:str|None=None,api_url:str|None=None,homepage_url:str|None=None):
         """Initializes a repository object
@@ -63,29 +111,98 @@ class ServerRepository:
         self.description = description
         self.api = api_url
         self.homepage = homepage_url
+        self._index: VersionIndex|None = None
+        self._indexed: list[Server]|None = None
+        self._catalogued: tuple[object, list[Server]]|None = None
+        # Concurrent searches share one server list, so the Server objects they return compare equal
+        self._list_lock = threading.Lock()
 
         self._registry[name.lower()] = self
 
     def search(self, minecraft_version:str) -> list[Server]|None:
         """Searches for a server in the repository that meets the minecraft version requirement
 
+        The repository's server list is indexed by minecraft version once, so each
+        search is a binary search per interval of the parsed range.
+
         Parameters
         ----------
         version : str
-            The minecraft version to search for
+            The minecraft version range to search for, e.g. 1.20.x or >=1.20.4,<1.21
 
         Returns
         -------
         list[Server]
             If located, returns a list of Server objects
         """
-        raise NotImplementedError('search is not implemented for the default ServerRepository class')
+        servers = self.listAvailable()
+        if self._index is None or self._indexed is not servers:
+            self._index = VersionIndex(servers, key=lambda s: version_key(s.minecraft_version))
+            self._indexed = servers
+        return self._index.query(VersionRange.parse(minecraft_version))
     
     def list(self) -> list[Server]:
         raise NotImplementedError('list is not implemented for the default ServerRepository class')
+
+    def listAvailable(self) -> list[Server]:
+        """Lists the servers of the repository, preferring the local catalog
+
+        Repositories synced into the catalog are listed from it without a network request.
+
+        Returns
+        -------
+        list[Server]
+            The available servers
+
+        Raises
+        ------
+        OfflineError
+            If offline and the repository has not been synced
+        """
+        with self._list_lock:
+            catalog = ServerRepository.catalog
+            if catalog is not None:
+                if self._catalogued is None or self._catalogued[0] is not catalog:
+                    self._catalogued = (catalog, catalog.listServers(self))
+                if self._catalogued[1] is not None:
+                    return self._catalogued[1]
+            if ServerRepository.offline and not self.local:
+                raise OfflineError([f'server list from {self.name}'])
+            with tracer.span(f'{self.name} list', 'repository'):
+                return self.list()
     
+    def refresh(self) -> bool:
+        """Reloads the server list of repositories which keep it in memory
+
+        Returns
+        -------
+        bool
+            True if the list changed, in which case previously returned Server objects are stale
+        """
+        return False
+
+    def fetch(self, server:Server) -> str:
+        """Makes a server file available locally, downloading it if needed
+
+        Parameters
+        ----------
+        server : Server
+            The server to fetch
+
+        Returns
+        -------
+        str
+            The path of the local copy, usually in the artifact cache
+        """
+        raise NotImplementedError('fetch is not implemented for the default ServerRepository class')
+
+    def downloadUrl(self, server:Server) -> str|None:
+        """Returns the URL a server file is downloaded from, if it is known without a request
+        """
+        return None
+
     def install(self, server:Server, destination:str) -> str:
-        raise NotImplementedError('install is not implemented for the default ServerRepository class')
+        return place_file(self.fetch(server), destination, server.asset)
         
     def uninstall(self, server:Server, destination:str) -> str|None:
         
@@ -98,16 +215,52 @@ class ServerRepository:
         else:
             return destination
     
+    @staticmethod
+    def register(name:str, factory:Callable[[], ServerRepository]):
+        """Registers a repository which is created the first time it is used
+
+        Parameters
+        ----------
+        name : str
+            The repository name
+        factory : Callable[[], ServerRepository]
+            Called without arguments to create the repository
+        """
+        ServerRepository._registry[name.lower()] = factory
+
+    @staticmethod
+    def repositories() -> list[ServerRepository]:
+        """Returns every registered repository, creating those registered lazily
+        """
+        _create(ServerRepository._registry, list(ServerRepository._registry))
+        return list(ServerRepository._registry.values())
+
+    @staticmethod
+    def repository(name:str) -> ServerRepository|None:
+        """Returns a registered repository by name, creating it if it was registered lazily
+        """
+        _create(ServerRepository._registry, [name.lower()])
+        return ServerRepository._registry.get(name.lower())
+
     @staticmethod
     def searchAll(minecraft_version:str) -> list[Server]:
         results = []
-        for repo in ServerRepository._registry.values():
-            server = repo.search(minecraft_version)
+        missing = []
+        for repo in ServerRepository.repositories():
+            try:
+                server = repo.search(minecraft_version)
+            except OfflineError as e:
+                missing.extend(e.missing)
+                continue
             if server:
                 results.extend(server)
+        if missing:
+            raise OfflineError(missing)
         return results
 
 class PluginAsset:
+    __slots__ = ('filename', 'plugin_version', 'metadata')
+
     def __init__(self, filename:str, plugin_version:PluginVersion, metadata:dict|None=None):
         self.filename = filename
         self.plugin_version = plugin_version
@@ -122,13 +275,24 @@ class PluginAsset:
         return self.plugin_version.repository
     
     @property
-    def compatibility(self) -> list[Server]|None:
+    def compatibility(self) -> tuple[Server, ...]|None:
         return self.plugin_version.compatibility
     
     @property
     def version(self) -> str:
         return self.plugin_version.version
 
+    @property
+    def checksum(self) -> tuple[str, str]|None:
+        return self.repository.checksum(self)
+
+    @property
+    def url(self) -> str|None:
+        return self.repository.downloadUrl(self)
+
+    def fetch(self) -> str:
+        return self.repository.fetch(self)
+
     def install(self, destination:str) -> str|None:
         return self.repository.install(self, destination)
     
@@ -136,12 +300,15 @@ class PluginAsset:
         return self.repository.uninstall(self, destination)
 
 class PluginVersion:
-    def __init__(self, plugin:Plugin, version:str, repository:PluginRepository, compatibility:list[Server]|None=None, metadata:dict|None=None):
+    __slots__ = ('plugin', 'version', 'repository', 'compatibility', 'metadata', 'sort_key', '_assets')
+
+    def __init__(self, plugin:Plugin, version:str, repository:PluginRepository, compatibility:tuple[Server, ...]|None=None, metadata:dict|None=None):
         self.plugin = plugin
         self.version = version
         self.repository = repository
         self.compatibility = compatibility
         self.metadata = metadata
+        self.sort_key: VersionKey = version_key(version)
         self._assets: list[PluginAsset]|None = None
 
     @property
@@ -157,9 +324,13 @@ class PluginVersion:
         return [asset.uninstall(destination) for asset in self.assets]
 
 class Plugin:
-    def __init__(self, name:str, id:str|None=None):
+    __slots__ = ('name', 'id', 'repository', '_versions')
+
+    def __init__(self, name:str, id:str|None=None, repository:str|None=None):
         self.name = name
         self.id = id
+        # The name of the only repository to search, if the plugin is pinned to one
+        self.repository = repository
         self._versions: list[PluginVersion]|None = None
 
     @property
@@ -195,7 +366,17 @@ class Plugin:
 class PluginRepository:
     """This class defines an interface for working with repositories
     """
-    _registry: dict[str, PluginRepository] = {}
+    # Maps lowercase names to repositories, or to factories creating them on first use
+    _registry: dict[str, PluginRepository|Callable[[], PluginRepository]] = {}
+    _cache: Cache = Cache(maxsize=1024, ttl=600)
+    # A mim.util.Catalog.Catalog consulted before searching a repository, if set
+    catalog = None
+    # A mim.util.Routing.RoutingTable limiting searches to the repositories known to have a plugin, if set
+    routes = None
+    # When True, plugins are only searched in the catalog and artifacts are only installed from the local cache
+    offline: bool = False
+    # True for repositories which read from the local filesystem and remain usable offline
+    local: bool = False
 
     def __init__(self,name:str,description:str|None=None,api_url:str|None=None,homepage_url:str|None=None):
         """Initializes a repository object
@@ -229,15 +410,79 @@ class PluginRepository:
         Returns
         -------
         list[PluginVersion]
-            If located, returns a list of PluginVersion objects
+            If located, returns a list of PluginVersion objects. An empty list if the repository
+            does not have the plugin, or None if the search failed
         """
         raise NotImplementedError('search is not implemented for the default Repository class')
     
+    def sync(self, plugin:Plugin, state:dict) -> list[PluginVersion]|None:
+        """Fetches the versions of a plugin that changed since the last sync
+
+        Repositories which support incremental queries override this method. The default
+        implementation performs a full search.
+
+        Parameters
+        ----------
+        plugin : Plugin
+            The plugin to synchronize
+        state : dict
+            Repository specific sync state from the previous sync. Updated in place
+
+        Returns
+        -------
+        list[PluginVersion]
+            The new or changed versions, or None if nothing changed
+        """
+        return self.search(plugin)
+
+    def serves(self, repository:str) -> bool:
+        """Returns whether the repository answers for plugins pinned to a repository name
+        """
+        return repository.lower() == self.name.lower()
+
+    def pinned(self, versions:list[PluginVersion], repository:str) -> list[PluginVersion]:
+        """Limits cached search results to a plugin pinned to a repository name
+
+        Search results are cached without the pin, so repositories serving several pinned
+        names filter them here
+        """
+        return versions
+
     def listAssets(self, plugin_version:PluginVersion) -> list[PluginAsset]:
         raise NotImplementedError('listAssets is not implemented for the default Repository class')
     
+    def checksum(self, plugin_asset:PluginAsset) -> tuple[str, str]|None:
+        """Returns the hash the repository publishes for a plugin file
+
+        Returns
+        -------
+        tuple[str, str] | None
+            The hashlib algorithm name and the hex digest, or None if the repository publishes none
+        """
+        return None
+
+    def downloadUrl(self, plugin_asset:PluginAsset) -> str|None:
+        """Returns the URL a plugin file is downloaded from, if it is known without a request
+        """
+        return None
+
+    def fetch(self, plugin_asset:PluginAsset) -> str:
+        """Makes a plugin file available locally, downloading it if needed
+
+        Parameters
+        ----------
+        plugin_asset : PluginAsset
+            The asset to fetch
+
+        Returns
+        -------
+        str
+            The path of the local copy, usually in the artifact cache
+        """
+        raise NotImplementedError('fetch is not implemented for the default Repository class')
+
     def install(self, plugin_asset:PluginAsset, destination:str) -> str|None:
-        raise NotImplementedError('install is not implemented for the default Repository class')
+        return place_file(self.fetch(plugin_asset), destination, plugin_asset.filename)
     
     def uninstall(self, plugin_asset:PluginAsset, destination:str) -> list[str]|None:
         
@@ -250,11 +495,144 @@ class PluginRepository:
         else:
             return destination
     
+    @staticmethod
+    def register(name:str, factory:Callable[[], PluginRepository]):
+        """Registers a repository which is created the first time it is used
+
+        Parameters
+        ----------
+        name : str
+            The repository name
+        factory : Callable[[], PluginRepository]
+            Called without arguments to create the repository
+        """
+        PluginRepository._registry[name.lower()] = factory
+
+    @staticmethod
+    def repositories() -> list[PluginRepository]:
+        """Returns every registered repository, creating those registered lazily
+        """
+        _create(PluginRepository._registry, list(PluginRepository._registry))
+        return list(PluginRepository._registry.values())
+
+    @staticmethod
+    def repository(name:str) -> PluginRepository|None:
+        """Returns a registered repository by name, creating it if it was registered lazily
+        """
+        _create(PluginRepository._registry, [name.lower()])
+        return PluginRepository._registry.get(name.lower())
+
+    @staticmethod
+    def repositoriesFor(plugin:Plugin) -> tuple[list[PluginRepository], bool]:
+        """Returns the repositories to search for a plugin
+
+        A plugin pinned to a repository is only searched there. Otherwise, when the routing
+        table knows which repositories have the plugin, only those are searched.
+
+        Returns
+        -------
+        tuple[list[PluginRepository], bool]
+            The repositories, and whether they are every registered repository
+
+        Raises
+        ------
+        ValueError
+            If the plugin is pinned to a repository which is not registered
+        """
+        repositories = PluginRepository.repositories()
+        if plugin.repository:
+            pinned = [repo for repo in repositories if repo.serves(plugin.repository)]
+            if not pinned:
+                raise ValueError(f'Unknown repository {plugin.repository} for {plugin.name}. Expected one of {", ".join(repo.name for repo in repositories)}')
+            return pinned, False
+        route = PluginRepository.routes.get(plugin.name, plugin.id) if PluginRepository.routes is not None else None
+        if route:
+            routed = [repo for repo in repositories if repo.name.lower() in route]
+            if len(routed) == len(route):
+                return routed, False
+        return repositories, True
+
     @staticmethod
     def searchAll(plugin:Plugin) -> list[PluginVersion]:
+        """Searches the registered repositories for a plugin
+
+        Results are memoized per repository and plugin identity in a process-wide LRU
+        cache, and concurrent searches for the same plugin share a single lookup. Plugins
+        synced into the catalog are answered locally. Only the repositories returned by
+        repositoriesFor are searched, unless a route finds nothing. A route is only learned
+        from a search which every repository answered, so a failed search does not move a
+        plugin away from a repository.
+
+        Parameters
+        ----------
+        plugin : Plugin
+            The plugin to search for
+
+        Returns
+        -------
+        list[PluginVersion]
+            The combined list of versions found in all repositories
+        """
+        repositories, everywhere = PluginRepository.repositoriesFor(plugin)
         results = []
-        for repo in PluginRepository._registry.values():
-            pluginVersion = repo.search(plugin)
-            if pluginVersion:
+        missing = []
+        found = []
+        answered = True
+        for repo in repositories:
+            try:
+                pluginVersion = PluginRepository.searchRepository(repo, plugin)
+            except OfflineError as e:
+                missing.extend(e.missing)
+                continue
+            if pluginVersion is None:
+                answered = False
+            elif pluginVersion:
                 results.extend(pluginVersion)
-        return results
\ No newline at end of file
+                found.append(repo.name)
+        if missing:
+            raise OfflineError(missing)
+        if not results and not everywhere and not plugin.repository and answered:
+            # The plugin left the routed repositories, so learn its route again
+            PluginRepository.routes.record(plugin.name, plugin.id, [])
+            return PluginRepository.searchAll(plugin)
+        if everywhere and answered and PluginRepository.routes is not None:
+            PluginRepository.routes.record(plugin.name, plugin.id, found)
+        return results
+
+    @staticmethod
+    def searchRepository(repo:PluginRepository, plugin:Plugin) -> list[PluginVersion]|None:
+        """Searches a single repository for a plugin, sharing the cache of searchAll
+
+        Parameters
+        ----------
+        repo : PluginRepository
+            The repository to search
+        plugin : Plugin
+            The plugin to search for
+
+        Returns
+        -------
+        list[PluginVersion]
+            The versions found in the repository, if any
+        """
+        key = (repo.name.lower(), plugin.name, plugin.id)
+        if tracer.enabled:
+            tracer.cache('metadata', key in PluginRepository._cache)
+        versions = PluginRepository._cache.getOrLoad(key, partial(PluginRepository._lookup, repo, plugin))
+        if versions and plugin.repository:
+            return repo.pinned(versions, plugin.repository)
+        return versions
+
+    @staticmethod
+    def _lookup(repo:PluginRepository, plugin:Plugin) -> list[PluginVersion]|None:
+        catalog = PluginRepository.catalog
+        if catalog is not None:
+            # Old syncs miss versions published since, so they only answer offline
+            versions = catalog.search(repo, plugin, None if PluginRepository.offline else catalog.max_age)
+            tracer.cache('catalog', versions is not None)
+            if versions is not None:
+                return versions
+        if PluginRepository.offline and not repo.local:
+            raise OfflineError([f'metadata for {plugin.name} from {repo.name}'])
+        with tracer.span(f'{repo.name} search', 'repository', plugin=plugin.name):
+            return repo.search(plugin)
\ No newline at end of file
@@ -0,0 +1,88 @@
+from __future__ import annotations
+import json
+import os
+import tempfile
+import threading
+import time
+from mim.util.Cache import cache_directory
+from mim.util.Lock import LockManager
+
+class RoutingTable:
+    """Remembers which repositories returned versions of each plugin
+
+    A plugin found in some repositories is only searched in those until its route is
+    older than the time-to-live, when every repository is searched again. Routes are kept
+    in ``routes.json`` of the cache directory and merged into it by save(), so processes
+    sharing the cache directory learn from each other.
+    """
+
+    def __init__(self, path:str|None=None, ttl:float=7 * 86400):
+        """Opens a routing table
+
+        Parameters
+        ----------
+        path : str, optional
+            The routes file, by default routes.json in cache_directory()
+        ttl : float, optional
+            Seconds after which a route is ignored, by default 7 days
+        """
+        self.path = path or os.path.join(cache_directory(), 'routes.json')
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._routes = self._read()
+        self._changed: dict[str, dict] = {}
+
+    @staticmethod
+    def key(name:str, id:str|None) -> str:
+        return f'{name}\t{id or ""}'
+
+    def _read(self) -> dict[str, dict]:
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f).get('routes', {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def get(self, name:str, id:str|None=None) -> list[str]|None:
+        """Returns the names of the repositories known to have a plugin, or None if there is no current route
+        """
+        with self._lock:
+            entry = self._routes.get(RoutingTable.key(name, id))
+        if not entry or not entry.get('repositories') or time.time() - entry.get('updated', 0) >= self.ttl:
+            return None
+        return entry['repositories']
+
+    def record(self, name:str, id:str|None, repositories:list[str]):
+        """Records the repositories which returned versions of a plugin in a search of every repository
+        """
+        key = RoutingTable.key(name, id)
+        repositories = sorted(r.lower() for r in repositories)
+        with self._lock:
+            current = self._routes.get(key)
+            # Refreshed routes are rewritten, so they expire a ttl after the last full search
+            if current and current.get('repositories') == repositories and time.time() - current.get('updated', 0) < self.ttl / 2:
+                return
+            self._routes[key] = self._changed[key] = {'repositories': repositories, 'updated': time.time()}
+
+    def save(self):
+        """Merges the routes recorded since the last save into the routes file
+        """
+        with self._lock:
+            changed, self._changed = self._changed, {}
+        if not changed:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with LockManager(os.path.join(os.path.dirname(os.path.abspath(self.path)), 'locks')).lock('routes'):
+            routes = self._read()
+            routes.update(changed)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix='.routes.', suffix='.part')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'version': 1, 'routes': routes}, f, indent=1, sort_keys=True)
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        with self._lock:
+            self._routes = {**routes, **self._changed}
@@ -1,6 +1,7 @@
 from mim.util.Repository import *
+from mim.util.Artifacts import ArtifactCache
 import requests
-import os
+from mim.util import Http
 
 class SpigetRepository(PluginRepository):
     """A default repository implementation for Spiget plugins
@@ -15,16 +16,38 @@ class SpigetRepository(PluginRepository):
         )
 
     def search(self, plugin:Plugin) -> list[PluginVersion]|None:
+        return self.sync(plugin, {})
+
+    def sync(self, plugin:Plugin, state:dict) -> list[PluginVersion]|None:
         if not plugin.id:
-            return None
-        response = requests.get(f'{self.api}resources/{plugin.id}')
+            return []
+        response = Http.get(f'{self.api}resources/{plugin.id}', template='/v2/resources/{id}')
+        if response.status_code == 404:
+            return []
         if response.status_code != 200:
             return None
         
-        tested_versions = response.json()['testedVersions']
+        resource = response.json()
+        tested_versions = resource['testedVersions']
         versions: list[PluginVersion] = []
         
-        version_response = requests.get(f'{self.api}resources/{plugin.id}/versions?size=50&sort=-id').json()
+        # Versions are listed newest first, so page until reaching the newest known id
+        last_id = state.get('last_id')
+        version_response = []
+        page = 1
+        # The resource names its latest version, so an unchanged resource needs no version listing
+        latest = (resource.get('version') or {}).get('id')
+        while last_id is None or latest is None or latest > last_id:
+            batch = Http.get(f'{self.api}resources/{plugin.id}/versions?size=50&page={page}&sort=-id', template='/v2/resources/{id}/versions?size={}&page={}&sort={}').json()
+            fresh = [version for version in batch if last_id is None or version['id'] > last_id]
+            version_response.extend(fresh)
+            if last_id is None or len(fresh) < len(batch) or len(batch) < 50:
+                break
+            page += 1
+        if not version_response:
+            # Nothing newer than the last sync, or no versions at all
+            return None if last_id is not None else versions
+        state['last_id'] = max(version['id'] for version in version_response)
         
         compatibility: list[Server] = []
         for tv in tested_versions:
@@ -33,9 +56,11 @@ class SpigetRepository(PluginRepository):
             loaders = ['bukkit', 'spigot', 'paper']
             servers = [server for server in ServerRepository.searchAll(tv) if server.name.lower() in loaders]
             compatibility.extend(servers)
+        # Every version of a Spiget resource shares the resource's tested versions
+        shared_compatibility = tuple(compatibility)
 
         for version in version_response:
-            versions.append(PluginVersion(plugin=plugin, version=version['name'], repository=self, compatibility=compatibility.copy(), metadata=version))
+            versions.append(PluginVersion(plugin=plugin, version=version['name'], repository=self, compatibility=shared_compatibility, metadata={'id': version['id']}))
         return versions
     
     def listAssets(self, plugin_version:PluginVersion) -> list[PluginAsset]:
@@ -43,19 +68,16 @@ class SpigetRepository(PluginRepository):
         asset = PluginAsset(filename=filename, plugin_version=plugin_version, metadata=plugin_version.metadata)
         return [asset]
     
-    def install(self, plugin_asset:PluginAsset, destination:str) -> list[str]|None:
+    def downloadUrl(self, plugin_asset:PluginAsset) -> str:
+        return f'{self.api}resources/{plugin_asset.plugin.id}/download?release={plugin_asset.metadata["id"]}'
+
+    def fetch(self, plugin_asset:PluginAsset) -> str:
         if plugin_asset.repository != self:
             raise ValueError(f'Plugin version {plugin_asset.plugin.name} does not belong to Spiget repository')
         
-        install_url = f'{self.api}resources/{plugin_asset.plugin.id}/download?release={plugin_asset.metadata["id"]}'
-        destination = os.path.join(destination, plugin_asset.filename)
+        install_url = self.downloadUrl(plugin_asset)
 
         try:
-            with requests.get(install_url, stream=True) as r:
-                r.raise_for_status()
-                with open(destination, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-            return destination
+            return ArtifactCache().fetch(self.name, plugin_asset.filename, install_url)
         except requests.exceptions.RequestException as e:
             raise Exception(f'Error installing Spiget plugin {plugin_asset.plugin.name} version {plugin_asset.version}: {e}')
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+from typing import Callable
+
+class StagedDirectory:
+    """Replaces the files of a directory with a complete new set staged beside it
+
+    The new set is built in ``<path>.staging`` from hard links of the files that are kept,
+    plus the new files. Committing moves the subdirectories (plugin data, which belongs to
+    the server rather than to a set of jars) into the staging directory, then swaps the
+    directories with renames, keeping the replaced set as ``<path>.previous``.
+
+    Every step of a swap is recorded in a journal, so a swap interrupted by a crash is
+    completed by recover() before the directory is used again.
+    """
+
+    def __init__(self, path:str):
+        self.path = os.path.abspath(path)
+        self.staging = self.path + '.staging'
+        self.previous = self.path + '.previous'
+        self.outgoing = self.path + '.outgoing'
+        self.journal = self.path + '.swap.json'
+
+    def stage(self, keep:Callable[[str], bool]=lambda name: True) -> str:
+        """Creates the staging directory from the files of the current directory
+
+        Parameters
+        ----------
+        keep : Callable[[str], bool], optional
+            Called with each file name; files for which it returns False are left out, by default every file is kept
+
+        Returns
+        -------
+        str
+            The staging directory, to which new files are added
+        """
+        self.recover()
+        self.discard()
+        os.makedirs(self.staging)
+        if os.path.isdir(self.path):
+            for entry in os.scandir(self.path):
+                if entry.is_dir(follow_symlinks=False) or not keep(entry.name):
+                    continue
+                target = os.path.join(self.staging, entry.name)
+                if entry.is_symlink():
+                    os.symlink(os.readlink(entry.path), target)
+                    continue
+                try:
+                    os.link(entry.path, target)
+                except OSError:
+                    shutil.copy2(entry.path, target)
+        return self.staging
+
+    def discard(self):
+        """Removes an uncommitted staging directory
+        """
+        if os.path.isdir(self.staging) and not os.path.exists(self.journal):
+            shutil.rmtree(self.staging)
+
+    def commit(self):
+        """Swaps the staging directory in, keeping the current directory as the previous one
+        """
+        if not os.path.isdir(self.staging):
+            raise FileNotFoundError(f'Nothing is staged for {self.path}')
+        if os.path.isdir(self.previous):
+            shutil.rmtree(self.previous)
+        self._swap(self.staging)
+
+    def rollback(self):
+        """Swaps the previous directory back in, keeping the current directory as the previous one
+        """
+        self.recover()
+        if not os.path.isdir(self.previous):
+            raise FileNotFoundError(f'No previous directory to roll back to for {self.path}')
+        self._swap(self.previous)
+
+    def _swap(self, incoming:str):
+        with open(self.journal, 'w', encoding='utf-8') as f:
+            json.dump({'incoming': incoming}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        self.recover()
+
+    def recover(self) -> bool:
+        """Completes an interrupted swap
+
+        Returns
+        -------
+        bool
+            True if a swap was completed
+        """
+        try:
+            with open(self.journal, encoding='utf-8') as f:
+                incoming = json.load(f)['incoming']
+        except FileNotFoundError:
+            return False
+
+        # Each step checks its own precondition, so recovery may itself be interrupted and rerun
+        if os.path.isdir(self.path) and not os.path.exists(self.outgoing):
+            for entry in os.scandir(self.path):
+                if entry.is_dir(follow_symlinks=False) and not os.path.exists(os.path.join(incoming, entry.name)):
+                    os.rename(entry.path, os.path.join(incoming, entry.name))
+            os.rename(self.path, self.outgoing)
+        if os.path.isdir(incoming) and not os.path.exists(self.path):
+            os.rename(incoming, self.path)
+        if os.path.isdir(self.outgoing):
+            os.rename(self.outgoing, self.previous)
+        os.remove(self.journal)
+        return True
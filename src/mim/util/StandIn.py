@@ -0,0 +1,110 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from mim.util import Http
+
+class StandInServer:
+    """Serves responses recorded with MIM_HTTP_MODE=record over HTTP on localhost
+
+    The server stands in for every recorded host. A request for
+    ``/<scheme>/<host>/<path>`` is answered with the response recorded for
+    ``<scheme>://<host>/<path>``, after a simulated latency and at a simulated bandwidth,
+    so that mim can be measured offline with realistic network costs. Setting
+    MIM_HTTP_STANDIN to url sends mim's requests here.
+    """
+
+    def __init__(self, fixtures:str, latency:float=0, bandwidth:float|None=None, port:int=0):
+        """Initializes a stand-in server
+
+        Parameters
+        ----------
+        fixtures : str
+            The directory the responses were recorded to
+        latency : float, optional
+            Seconds to wait before answering each request, by default 0
+        bandwidth : float, optional
+            Bytes per second at which each response body is sent. If None, bodies are sent at once, by default None
+        port : int, optional
+            The port to listen on on 127.0.0.1. If 0, a free port is chosen, by default 0
+        """
+        self.fixtures = fixtures
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.port = port
+        self.requests = 0
+        self.bytes = 0
+        self.missing: list[str] = []
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer|None = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                scheme, _, rest = self.path.lstrip('/').partition('/')
+                url = f'{scheme}://{rest}'
+                fixture = Http.read_fixture(standin.fixtures, url)
+                time.sleep(standin.latency)
+                if fixture is None:
+                    with standin._lock:
+                        standin.missing.append(url)
+                    body = json.dumps({'error': f'No recorded response for {url}'}).encode('utf-8')
+                    self.send_response(502)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                data, body = fixture
+                self.send_response(data['status'], data['reason'])
+                for key, value in data['headers'].items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                chunk = max(1, int(standin.bandwidth / 20)) if standin.bandwidth else len(body) or 1
+                for i in range(0, len(body), chunk):
+                    self.wfile.write(body[i:i + chunk])
+                    if standin.bandwidth:
+                        time.sleep(len(body[i:i + chunk]) / standin.bandwidth)
+                with standin._lock:
+                    standin.requests += 1
+                    standin.bytes += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        """Starts serving in a background thread
+
+        Returns
+        -------
+        str
+            The URL of the server, to be set as MIM_HTTP_STANDIN
+        """
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='mim-standin', daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> StandInServer:
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
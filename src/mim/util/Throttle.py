@@ -0,0 +1,167 @@
+from __future__ import annotations
+import fcntl
+import json
+import os
+import re
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+from mim.util.Cache import cache_directory
+from mim.util.Lock import FileLock
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+def parse_rate(value:str|int|float|None) -> float|None:
+    """Parses a bandwidth such as 500K or 10M, in bytes per second
+
+    Returns
+    -------
+    float | None
+        The rate in bytes per second, or None for unlimited (None, 0 or an empty string)
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) or None
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*([KMG]?)(?:i?B)?(?:/s)?\s*', value, re.IGNORECASE)
+    if not match:
+        raise ValueError(f'Invalid rate {value}, expected bytes per second such as 500K or 10M')
+    return float(match.group(1)) * _UNITS[match.group(2).upper()] or None
+
+class DownloadBudget:
+    """Limits the bandwidth and the number of concurrent downloads of every process sharing a cache directory
+
+    Concurrent downloads hold one of a fixed number of slot locks. Bandwidth is shared
+    through a clock file recording when the bytes downloaded so far are paid for: each
+    read books its bytes at the configured rate, and the reader sleeps until its booking
+    is within the burst allowance. Both live in the cache directory, so every process
+    using it, on one host or across hosts sharing it, draws from the same budget.
+    """
+
+    def __init__(self, directory:str|None=None, bandwidth:float|None=None, downloads:int|None=None, burst:float=0.25, poll:float=0.1):
+        """Initializes a budget
+
+        Parameters
+        ----------
+        directory : str, optional
+            The directory holding the shared state, by default the throttle directory of cache_directory()
+        bandwidth : float, optional
+            The total bytes per second. If None, bandwidth is not limited, by default None
+        downloads : int, optional
+            The number of concurrent downloads. If None, downloads are not limited, by default None
+        burst : float, optional
+            Seconds of unused bandwidth which may be spent at once, by default 0.25
+        poll : float, optional
+            Seconds between attempts to take a download slot, by default 0.1
+        """
+        self.directory = directory or os.path.join(cache_directory(), 'throttle')
+        self.bandwidth = bandwidth
+        self.downloads = downloads
+        self.burst = burst
+        self.poll = poll
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def load(directory:str|None=None, bandwidth:str|float|None=None, downloads:int|None=None) -> DownloadBudget:
+        """Creates the budget configured in limits.json of the cache directory
+
+        limits.json holds a default ``bandwidth`` and ``downloads``, and may override them
+        per host name under ``hosts``::
+
+            {"bandwidth": "20M", "downloads": 4, "hosts": {"node-1": {"bandwidth": "5M"}}}
+
+        Parameters
+        ----------
+        directory : str, optional
+            The cache directory, by default cache_directory()
+        bandwidth : str | float, optional
+            Overrides the configured bandwidth, by default None
+        downloads : int, optional
+            Overrides the configured number of concurrent downloads, by default None
+        """
+        directory = directory or cache_directory()
+        limits = {}
+        try:
+            with open(os.path.join(directory, 'limits.json'), encoding='utf-8') as f:
+                config = json.load(f)
+            limits = {key: value for key, value in config.items() if key != 'hosts'}
+            limits.update(config.get('hosts', {}).get(os.uname().nodename, {}))
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            raise ValueError(f'Invalid {os.path.join(directory, "limits.json")}: {e}')
+
+        if bandwidth is not None:
+            limits['bandwidth'] = bandwidth
+        if downloads is not None:
+            limits['downloads'] = downloads
+        return DownloadBudget(os.path.join(directory, 'throttle'), parse_rate(limits.get('bandwidth')), int(limits.get('downloads') or 0) or None)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.bandwidth or self.downloads)
+
+    @property
+    def quantum(self) -> int|None:
+        """The bytes booked at a time, about a twentieth of a second of the bandwidth, or None if unlimited
+        """
+        return max(16384, int(self.bandwidth / 20)) if self.bandwidth else None
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Holds one of the download slots, waiting for one to be free
+        """
+        if not self.downloads:
+            yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            for i in range(self.downloads):
+                lock = FileLock(os.path.join(self.directory, f'download-{i}.lock'))
+                if lock.acquire(timeout=0):
+                    try:
+                        yield
+                    finally:
+                        lock.release()
+                    return
+            time.sleep(self.poll)
+
+    def consume(self, size:int):
+        """Books bytes against the bandwidth, sleeping while the budget is overdrawn
+        """
+        if not self.bandwidth or size <= 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with self._guard:
+            fd = os.open(os.path.join(self.directory, 'bandwidth'), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+                now = time.time()
+                data = os.pread(fd, 8, 0)
+                booked = struct.unpack('d', data)[0] if len(data) == 8 else now
+                booked = max(booked, now - self.burst) + size / self.bandwidth
+                os.pwrite(fd, struct.pack('d', booked), 0)
+            finally:
+                # Closing releases the lock
+                os.close(fd)
+        delay = booked - now - self.burst
+        if delay > 0:
+            time.sleep(delay)
+
+    def throttle(self, chunks:Iterable[bytes]) -> Iterator[bytes]:
+        """Passes chunks through, booking them in batches of about a twentieth of a second
+        """
+        if not self.bandwidth:
+            yield from chunks
+            return
+        quantum = self.quantum
+        pending = 0
+        for chunk in chunks:
+            pending += len(chunk)
+            if pending >= quantum:
+                self.consume(pending)
+                pending = 0
+            yield chunk
+        self.consume(pending)
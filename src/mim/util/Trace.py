@@ -0,0 +1,151 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.parse import urlsplit
+
+class Tracer:
+    """Records timed spans, HTTP requests and cache lookups while enabled
+
+    Disabled tracers record nothing, so instrumentation is left in place permanently.
+    The recording can be summarized as a table or written as a Chrome trace, which
+    chrome://tracing and https://ui.perfetto.dev can open.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: list[dict] = []
+        self.requests: list[dict] = []
+        self.caches: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self._lock:
+            self._origin = time.perf_counter()
+            self.spans.clear()
+            self.requests.clear()
+            self.caches.clear()
+
+    def now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    @contextmanager
+    def span(self, name:str, category:str='phase', **args) -> Iterator[None]:
+        """Times the enclosed block
+
+        Parameters
+        ----------
+        name : str
+            The span name, e.g. resolve or "Modrinth search"
+        category : str, optional
+            The kind of work, by default phase
+        """
+        if not self.enabled:
+            yield
+            return
+        start = self.now()
+        try:
+            yield
+        finally:
+            span = {'name': name, 'category': category, 'start': start, 'duration': self.now() - start, 'thread': threading.get_ident(), 'args': args}
+            with self._lock:
+                self.spans.append(span)
+
+    def request(self, method:str, url:str, template:str, status:int|None, start:float, latency:float, duration:float, size:int):
+        """Records an HTTP request
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method
+        url : str
+            The requested URL
+        template : str
+            The URL with its variable parts replaced, used to group requests
+        status : int | None
+            The response status, or None if the request failed
+        start : float
+            The start time from now()
+        latency : float
+            Seconds until the response headers arrived
+        duration : float
+            Seconds until the response body was read
+        size : int
+            The number of body bytes read
+        """
+        if not self.enabled:
+            return
+        request = {
+            'method': method, 'url': url, 'host': urlsplit(url).hostname or '', 'template': template, 'status': status,
+            'start': start, 'latency': latency, 'duration': duration, 'bytes': size, 'thread': threading.get_ident(),
+        }
+        with self._lock:
+            self.requests.append(request)
+
+    def cache(self, name:str, hit:bool):
+        """Counts a lookup in a cache
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.caches[name][0 if hit else 1] += 1
+
+    def summary(self) -> str:
+        """Returns tables of the phases, the requests per host and URL template, and the cache hit rates
+        """
+        lines = []
+        with self._lock:
+            spans, requests, caches = list(self.spans), list(self.requests), dict(self.caches)
+
+        phases: dict[tuple[str, str], list[float]] = defaultdict(list)
+        for span in spans:
+            phases[(span['category'], span['name'])].append(span['duration'])
+        lines.append(f'{"Category":<12} {"Span":<40} {"Calls":>6} {"Total ms":>10} {"Max ms":>9}')
+        for (category, name), durations in sorted(phases.items(), key=lambda item: -sum(item[1])):
+            lines.append(f'{category:<12} {name[:40]:<40} {len(durations):>6} {sum(durations) * 1000:>10.1f} {max(durations) * 1000:>9.1f}')
+
+        groups: dict[tuple[str, str], list[dict]] = defaultdict(list)
+        for request in requests:
+            groups[(request['host'], request['template'])].append(request)
+        lines.append('')
+        lines.append(f'{"Host":<24} {"URL template":<48} {"Reqs":>5} {"KiB":>9} {"Total ms":>10} {"Mean ms":>8} {"Max ms":>8}')
+        for (host, template), group in sorted(groups.items(), key=lambda item: -sum(r['duration'] for r in item[1])):
+            durations = [r['duration'] for r in group]
+            size = sum(r['bytes'] for r in group) / 1024
+            lines.append(f'{host[:24]:<24} {template[:48]:<48} {len(group):>5} {size:>9.1f} {sum(durations) * 1000:>10.1f} {sum(durations) / len(group) * 1000:>8.1f} {max(durations) * 1000:>8.1f}')
+        lines.append(f'{"Total":<24} {"":<48} {len(requests):>5} {sum(r["bytes"] for r in requests) / 1024:>9.1f}')
+
+        lines.append('')
+        lines.append(f'{"Cache":<24} {"Hits":>6} {"Misses":>7}')
+        for name, (hits, misses) in sorted(caches.items()):
+            lines.append(f'{name:<24} {hits:>6} {misses:>7}')
+        return '\n'.join(lines)
+
+    def chrome(self) -> dict:
+        """Returns the recording in the Chrome trace event format
+        """
+        pid = os.getpid()
+        events = []
+        with self._lock:
+            for span in self.spans:
+                events.append({'name': span['name'], 'cat': span['category'], 'ph': 'X', 'ts': span['start'] * 1e6, 'dur': span['duration'] * 1e6, 'pid': pid, 'tid': span['thread'], 'args': span['args']})
+            for request in self.requests:
+                args = {key: request[key] for key in ('url', 'host', 'status', 'bytes', 'latency')}
+                events.append({'name': f'{request["method"]} {request["template"]}', 'cat': 'http', 'ph': 'X', 'ts': request['start'] * 1e6, 'dur': request['duration'] * 1e6, 'pid': pid, 'tid': request['thread'], 'args': args})
+            caches = {name: {'hits': hits, 'misses': misses} for name, (hits, misses) in self.caches.items()}
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'caches': caches}}
+
+    def write(self, path:str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome(), f)
+
+# The process-wide tracer, enabled by --profile and --trace-out
+tracer = Tracer()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import zipfile
+
+class Manifest:
+    """Records the hash of every file mim installed into a directory
+
+    The manifest is ``.mim-manifest.json`` in the directory itself, so a plugin set staged
+    and swapped by StagedDirectory carries its own manifest. It is always replaced, never
+    rewritten in place, since staged files are hard links to the live ones.
+    """
+    FILENAME = '.mim-manifest.json'
+
+    def __init__(self, directory:str):
+        self.directory = directory
+        self.path = os.path.join(directory, Manifest.FILENAME)
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.files: dict[str, dict] = json.load(f).get('files', {})
+        except FileNotFoundError:
+            self.files = {}
+
+    def get(self, filename:str) -> dict|None:
+        return self.files.get(filename)
+
+    def record(self, filename:str, checksum:tuple[str, str]|None=None, **details):
+        """Hashes an installed file and records it
+
+        Parameters
+        ----------
+        filename : str
+            The file name within the directory
+        checksum : tuple[str, str], optional
+            The hash algorithm and hex digest published by the repository, by default None
+        **details
+            Recorded with the hash, such as the repository and version
+        """
+        result = verify_file(os.path.join(self.directory, filename), check_zip=False)
+        if result['error']:
+            raise OSError(f'Unable to hash {filename}: {result["error"]}')
+        entry = {'sha256': result['digests']['sha256'], 'size': result['size'], **details}
+        if checksum:
+            entry['checksum'] = f'{checksum[0]}:{checksum[1]}'
+        self.files[filename] = entry
+
+    def remove(self, filename:str):
+        self.files.pop(filename, None)
+
+    def save(self):
+        """Writes the manifest, dropping the entries of files no longer in the directory
+        """
+        self.files = {name: entry for name, entry in self.files.items() if os.path.isfile(os.path.join(self.directory, name))}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=f'{Manifest.FILENAME}.', suffix='.part')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'files': self.files}, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+class _MappedFile:
+    """Presents a memory map as the seekable file zipfile expects"""
+
+    def __init__(self, mapped:mmap.mmap):
+        self._mapped = mapped
+
+    def seekable(self) -> bool:
+        return True
+
+    def __getattr__(self, name:str):
+        return getattr(self._mapped, name)
+
+def verify_file(path:str, algorithms:tuple[str, ...]=('sha256',), check_zip:bool=True) -> dict:
+    """Hashes a file and tests its zip structure and CRCs
+
+    The file is memory mapped, so hashing and decompression read it without copies. Runs
+    in worker processes, so it only takes and returns plain values.
+
+    Parameters
+    ----------
+    path : str
+        The file to verify
+    algorithms : tuple[str, ...], optional
+        The hashlib algorithms to compute, by default sha256
+    check_zip : bool, optional
+        Whether to read the central directory and check the CRC of every entry, by default True
+
+    Returns
+    -------
+    dict
+        The path, size, the hex digest per algorithm, and an error message or None
+    """
+    result = {'path': path, 'size': None, 'digests': {}, 'error': None}
+    try:
+        with open(path, 'rb') as f:
+            result['size'] = size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                result['error'] = 'Empty file'
+                return result
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for algorithm in algorithms:
+                    result['digests'][algorithm] = hashlib.new(algorithm, mm).hexdigest()
+                if check_zip:
+                    with zipfile.ZipFile(_MappedFile(mm)) as archive:
+                        bad = archive.testzip()
+                    if bad is not None:
+                        result['error'] = f'Bad CRC-32 for {bad}'
+    except zipfile.BadZipFile as e:
+        result['error'] = f'Not a valid jar: {e}'
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
@@ -0,0 +1,272 @@
+from __future__ import annotations
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+VersionKey = tuple[tuple[int, ...], int, int, int, str]
+
+_RELEASE = re.compile(r'^\s*[vV]?(\d+(?:\.\d+)*)(.*)$')
+_TOKENS = re.compile(r'[a-z]+|\d+')
+
+# Pre-release phases rank below a final release of the same number
+_PHASES = {
+    'dev': 0, 'snapshot': 0, 'nightly': 0,
+    'alpha': 1, 'a': 1,
+    'beta': 2, 'b': 2,
+    'pre': 3, 'preview': 3, 'rc': 3, 'c': 3,
+}
+_FINAL = 4
+_BUILD_WORDS = {'build', 'post', 'r', 'rev', 'release', 'final', 'ga'}
+
+@lru_cache(maxsize=8192)
+def version_key(version:str) -> VersionKey:
+    """Parses a version string into a totally ordered sort key
+
+    Accepts the loosely formatted versions used by plugin repositories, such as
+    ``v2.1``, ``2.1-beta``, ``7.3.9-SNAPSHOT``, ``1.21.1-130`` or ``2.0.0+build.5``.
+    Trailing zeros in the release are ignored so ``1.20`` equals ``1.20.0``.
+    Strings without a leading release number sort below every parsable version.
+
+    Parameters
+    ----------
+    version : str
+        The version string to parse
+
+    Returns
+    -------
+    VersionKey
+        A tuple of (release, phase, pre-release number, build number, remainder)
+    """
+    match = _RELEASE.match(version)
+    if not match:
+        return ((), -1, 0, 0, version.lower())
+
+    release = [int(part) for part in match.group(1).split('.')]
+    while len(release) > 1 and release[-1] == 0:
+        release.pop()
+
+    rest = match.group(2).lower()
+    tokens = _TOKENS.findall(rest)
+    phase, pre, build = _FINAL, 0, 0
+    i = 0
+    if tokens and tokens[0] in _PHASES:
+        phase = _PHASES[tokens[0]]
+        i = 1
+        if i < len(tokens) and tokens[i].isdigit():
+            pre = int(tokens[i])
+            i += 1
+    elif tokens and tokens[0] in _BUILD_WORDS:
+        i = 1
+    for token in tokens[i:]:
+        if token.isdigit():
+            build = int(token)
+            break
+    return (tuple(release), phase, pre, build, rest)
+
+# An interval of version keys as (lower, lower inclusive, upper, upper inclusive).
+# A bound of None is unbounded.
+Interval = tuple[VersionKey|None, bool, VersionKey|None, bool]
+
+_OPERATOR = re.compile(r'^(>=|<=|==|!=|>|<|=|~|\^)?\s*(.*)$')
+
+def _floor(release:tuple[int, ...]) -> VersionKey:
+    """Returns a key below every version of a release, including its pre-releases
+    """
+    release = list(release)
+    while len(release) > 1 and release[-1] == 0:
+        release.pop()
+    return (tuple(release), -1, 0, 0, '')
+
+def _bump(release:tuple[int, ...]) -> tuple[int, ...]:
+    return release[:-1] + (release[-1] + 1,)
+
+def _release(version:str, expression:str) -> tuple[int, ...]:
+    match = _RELEASE.match(version)
+    if not match:
+        raise ValueError(f'Invalid version "{version}" in range "{expression}"')
+    return tuple(int(part) for part in match.group(1).split('.'))
+
+def _lower(a:Interval, b:Interval) -> tuple[VersionKey|None, bool]:
+    if a[0] is None:
+        return b[0], b[1]
+    if b[0] is None or a[0] > b[0]:
+        return a[0], a[1]
+    if b[0] > a[0]:
+        return b[0], b[1]
+    return a[0], a[1] and b[1]
+
+def _upper(a:Interval, b:Interval) -> tuple[VersionKey|None, bool]:
+    if a[2] is None:
+        return b[2], b[3]
+    if b[2] is None or a[2] < b[2]:
+        return a[2], a[3]
+    if b[2] < a[2]:
+        return b[2], b[3]
+    return a[2], a[3] and b[3]
+
+def _empty(interval:Interval) -> bool:
+    lo, lo_inc, hi, hi_inc = interval
+    if lo is None or hi is None:
+        return False
+    return lo > hi or (lo == hi and not (lo_inc and hi_inc))
+
+class VersionRange:
+    """A set of versions described by a range expression
+
+    Expressions are made of comma separated constraints which must all hold, and
+    alternatives separated by ``||``. Supported constraints are wildcards
+    (``1.20.x``, ``1.x.x``, ``*``), comparisons (``>=1.20.4``, ``<1.21``, ``!=1.20.2``),
+    tilde ranges (``~1.20`` and ``~1.20.4`` allow patch changes below ``1.21``), caret ranges (``^1.20`` is
+    ``>=1.20,<2``) and exact versions (``1.20.1``).
+    """
+
+    def __init__(self, intervals:list[Interval], expression:str|None=None):
+        self.intervals = intervals
+        self.expression = expression
+
+    def __repr__(self) -> str:
+        return f'VersionRange({self.expression!r})'
+
+    def __contains__(self, version:str) -> bool:
+        key = version_key(version)
+        return any(VersionRange._within(key, interval) for interval in self.intervals)
+
+    @staticmethod
+    def _within(key:VersionKey, interval:Interval) -> bool:
+        lo, lo_inc, hi, hi_inc = interval
+        if lo is not None and (key < lo or (key == lo and not lo_inc)):
+            return False
+        if hi is not None and (key > hi or (key == hi and not hi_inc)):
+            return False
+        return True
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def parse(expression:str) -> VersionRange:
+        """Parses a range expression into a union of version key intervals
+
+        Parameters
+        ----------
+        expression : str
+            The range expression, e.g. ``>=1.20.4,<1.21`` or ``1.20.x``
+
+        Returns
+        -------
+        VersionRange
+            The parsed range
+
+        Raises
+        ------
+        ValueError
+            If a constraint cannot be parsed
+        """
+        intervals: list[Interval] = []
+        for alternative in expression.split('||'):
+            current: list[Interval] = [(None, True, None, True)]
+            for constraint in alternative.split(','):
+                constraint = constraint.strip()
+                if not constraint:
+                    continue
+                parsed = VersionRange._constraint(constraint, expression)
+                current = [
+                    (*_lower(a, b), *_upper(a, b))
+                    for a in current for b in parsed
+                ]
+                current = [interval for interval in current if not _empty(interval)]
+            intervals.extend(current)
+        return VersionRange(intervals, expression)
+
+    @staticmethod
+    def _constraint(constraint:str, expression:str) -> list[Interval]:
+        operator, version = _OPERATOR.match(constraint).groups()
+        version = version.strip()
+        if not version:
+            raise ValueError(f'Missing version after "{operator}" in range "{expression}"')
+
+        parts = version.split('.')
+        wildcard = next((i for i, part in enumerate(parts) if part.lower() in ('x', '*')), None)
+        if wildcard is not None:
+            if operator not in (None, '=', '=='):
+                raise ValueError(f'Wildcards cannot be combined with "{operator}" in range "{expression}"')
+            if wildcard == 0:
+                return [(None, True, None, True)]
+            prefix = _release('.'.join(parts[:wildcard]), expression)
+            return [(_floor(prefix), True, _floor(_bump(prefix)), False)]
+
+        if operator in (None, '=', '=='):
+            key = version_key(version)
+            return [(key, True, key, True)]
+
+        release = _release(version, expression)
+        key = version_key(version)
+        if operator == '>=':
+            return [(key, True, None, True)]
+        if operator == '>':
+            return [(key, False, None, True)]
+        if operator == '<=':
+            return [(None, True, key, True)]
+        if operator == '<':
+            # Exclude pre-releases of the upper bound when it is a plain release
+            return [(None, True, _floor(key[0]) if key[1:4] == (_FINAL, 0, 0) else key, False)]
+        if operator == '!=':
+            return [(None, True, key, False), (key, False, None, True)]
+
+        if operator == '~':
+            upper = _bump(release[:2])
+        else:
+            nonzero = next((i for i, part in enumerate(release) if part), len(release) - 1)
+            upper = _bump(release[:nonzero + 1])
+        return [(key, True, _floor(upper), False)]
+
+class VersionIndex:
+    """A sorted catalog of items answering range queries by binary search
+    """
+
+    def __init__(self, items:list, key=version_key):
+        """Initializes an index
+
+        Parameters
+        ----------
+        items : list
+            The items to index
+        key : Callable, optional
+            Returns the version key of an item, by default version_key
+        """
+        pairs = sorted(((key(item), i) for i, item in enumerate(items)))
+        self.keys: list[VersionKey] = [k for k, _ in pairs]
+        self.items: list = [items[i] for _, i in pairs]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def query(self, version_range:VersionRange|str) -> list:
+        """Returns every indexed item within a range, in ascending version order
+
+        Parameters
+        ----------
+        version_range : VersionRange | str
+            A parsed range or a range expression
+
+        Returns
+        -------
+        list
+            The matching items
+        """
+        if isinstance(version_range, str):
+            version_range = VersionRange.parse(version_range)
+
+        spans: list[tuple[int, int]] = []
+        for lo, lo_inc, hi, hi_inc in version_range.intervals:
+            start = 0 if lo is None else (bisect_left if lo_inc else bisect_right)(self.keys, lo)
+            end = len(self.keys) if hi is None else (bisect_right if hi_inc else bisect_left)(self.keys, hi)
+            if start < end:
+                spans.append((start, end))
+
+        results = []
+        position = 0
+        for start, end in sorted(spans):
+            start = max(start, position)
+            if start < end:
+                results.extend(self.items[start:end])
+                position = end
+        return results
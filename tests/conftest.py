@@ -1,11 +1,47 @@
+import os
 import pytest
 import tempfile
 import shutil
 
-import pathlib
+from mim.util.Artifacts import ArtifactCache
+from mim.util.Cache import Cache
+from mim.util.Repository import PluginRepository, ServerRepository
 
 @pytest.fixture
 def tmp_path():
     path = tempfile.mkdtemp()
     yield path
-    shutil.rmtree
\ No newline at end of file
+    shutil.rmtree
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch):
+    # Keep the catalog and other persistent caches out of the user's home directory
+    path = tempfile.mkdtemp()
+    monkeypatch.setenv('MIM_CACHE_DIR', path)
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+SYNTHETIC = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'synthetic')
+
+@pytest.fixture(params=['synthetic', pytest.param('live', marks=pytest.mark.live)])
+def repository_api(request, monkeypatch):
+    # Run repository tests against the live APIs, and offline against the synthetic responses
+    # in tests/fixtures/synthetic. Those follow the format of each API but are generated by
+    # tests/synthetic_api.py, so only the live runs catch changes in the APIs themselves
+    if request.param == 'live':
+        monkeypatch.setenv('MIM_HTTP_MODE', 'live')
+        return
+    generating = request.config.pluginmanager.has_plugin('tests.synthetic_api')
+    monkeypatch.setenv('MIM_HTTP_MODE', 'record' if generating else 'replay')
+    monkeypatch.setenv('MIM_HTTP_FIXTURES', SYNTHETIC)
+
+@pytest.fixture(autouse=True)
+def repository_state(monkeypatch):
+    # Commands run through mim.main register their own repositories and options; restore them after each test
+    for cls in (ServerRepository, PluginRepository):
+        monkeypatch.setattr(cls, '_registry', dict(cls._registry))
+        monkeypatch.setattr(cls, 'catalog', cls.catalog)
+        monkeypatch.setattr(cls, 'offline', cls.offline)
+    monkeypatch.setattr(PluginRepository, 'routes', PluginRepository.routes)
+    monkeypatch.setattr(PluginRepository, '_cache', Cache(maxsize=1024, ttl=600))
+    monkeypatch.setattr(ArtifactCache, 'budget', ArtifactCache.budget)
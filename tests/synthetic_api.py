@@ -0,0 +1,181 @@
+"""Generates the synthetic responses in tests/fixtures/synthetic
+
+The responses follow the formats of the Paper, Modrinth, Spiget, GitHub and Geyser APIs, for a
+small invented set of servers, plugins and versions. They are not recordings of the live APIs.
+Loaded as a pytest plugin, it answers every request and the repository tests record the answers:
+
+    rm -r tests/fixtures/synthetic
+    pytest -m "not live" -p tests.synthetic_api
+"""
+import hashlib
+import io
+import json
+import zipfile
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import pytest
+import requests
+
+
+def jar(name, version):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as z:
+        info = zipfile.ZipInfo('plugin.yml', date_time=(2024, 1, 1, 0, 0, 0))
+        z.writestr(info, f'name: {name}\nversion: {version}\nmain: example.{name.replace("-", "").replace(" ", "")}\n')
+    return buf.getvalue()
+
+
+PAPER_VERSIONS = {'1.21': ['1.21.4', '1.21.3', '1.21.1', '1.21'], '1.20': ['1.20.6', '1.20.4', '1.20.2', '1.20.1']}
+PAPER_BUILD = {'1.21.4': 232, '1.21.3': 83, '1.21.1': 133, '1.21': 130, '1.20.6': 151, '1.20.4': 499, '1.20.2': 318, '1.20.1': 196}
+
+MODRINTH = {
+    'worldedit': ('1u6JkXh5', 'WorldEdit', [
+        ('7.3.10', '2025-01-02T10:00:00Z', ['1.21.1', '1.21.3', '1.21.4'], ['WorldEdit-Bukkit-{v}.jar']),
+        ('7.3.9', '2024-10-15T10:00:00Z', ['1.20.6', '1.21', '1.21.1'], ['WorldEdit-Bukkit-{v}.jar']),
+        ('7.3.4', '2024-06-20T10:00:00Z', ['1.20.4', '1.20.6'], ['WorldEdit-Bukkit-{v}.jar']),
+        ('7.2.15', '2023-08-01T10:00:00Z', ['1.20.1', '1.20.2'], ['WorldEdit-Bukkit-{v}.jar']),
+    ]),
+    'quickshop-hikari': ('ijC5dDkD', 'QuickShop-Hikari', [
+        ('3.3.0.0', '2024-11-20T10:00:00Z', ['1.20.6', '1.21', '1.21.1', '1.21.3'],
+         ['QuickShop-Hikari-{v}.jar', 'Compat-WorldEdit-{v}.jar', 'Compat-GriefPrevention-{v}.jar', 'Addon-DiscordSRV-{v}.jar']),
+        ('3.2.0.0', '2024-07-05T10:00:00Z', ['1.20.4', '1.20.6', '1.21'],
+         ['QuickShop-Hikari-{v}.jar', 'Compat-WorldEdit-{v}.jar', 'Compat-GriefPrevention-{v}.jar']),
+    ]),
+}
+
+SPIGET = {
+    '101066': ('Death Chest', ['1.20', '1.21'], [(571442, '2.2.1'), (548320, '2.2.0'), (520113, '2.1.3')]),
+}
+
+GITHUB = {
+    'QuickShop-Community/QuickShop-Hikari': [('6.2.0.9', ['QuickShop-Hikari-6.2.0.9.jar']), ('6.2.0.8', ['QuickShop-Hikari-6.2.0.8.jar'])],
+    'DevCyntrix/death-chest': [('v2.2.1', ['DeathChest.jar']), ('v2.2.0', ['DeathChest.jar'])],
+}
+
+GEYSER = {
+    'geyser': ('Geyser', '2.6.0', [697, 701], {'spigot': 'Geyser-Spigot.jar', 'velocity': 'Geyser-Velocity.jar', 'bungeecord': 'Geyser-BungeeCord.jar'}),
+    'floodgate': ('Floodgate', '2.2.3', [112, 116], {'spigot': 'floodgate-spigot.jar', 'velocity': 'floodgate-velocity.jar'}),
+}
+
+
+def response(url, status=200, body=b'', headers=None, reason='OK'):
+    r = requests.models.Response()
+    r.status_code = status
+    r.reason = reason
+    r.url = url
+    r.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    r._content = body
+    r.raw = io.BytesIO(body)
+    return r
+
+
+def as_json(url, data, status=200, headers=None):
+    return response(url, status, json.dumps(data, indent=1).encode(), {'Content-Type': 'application/json', **(headers or {})},
+                    'OK' if status == 200 else 'Not Found')
+
+
+def as_jar(url, body):
+    return response(url, 200, body, {'Content-Type': 'application/java-archive'})
+
+
+def handle(url):
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+    host = parts.netloc
+    segments = [s for s in path.split('/') if s]
+
+    if host == 'fill.papermc.io':
+        if segments == ['v3', 'projects', 'paper']:
+            return as_json(url, {'project': {'id': 'paper', 'name': 'Paper'}, 'versions': PAPER_VERSIONS})
+        if segments[:4] == ['v3', 'projects', 'paper', 'versions'] and segments[-1] == 'builds':
+            v = segments[4]
+            build = PAPER_BUILD[v]
+            body = jar('Paper', f'{v}-{build}')
+            name = f'paper-{v}-{build}.jar'
+            return as_json(url, [{
+                'id': build, 'time': '2024-12-01T00:00:00Z', 'channel': 'STABLE', 'commits': [],
+                'downloads': {'server:default': {'name': name, 'checksums': {'sha256': hashlib.sha256(body).hexdigest()}, 'size': len(body),
+                                                 'url': f'https://fill-data.papermc.io/v1/objects/{hashlib.sha256(body).hexdigest()}/{name}'}},
+            }])
+    if host == 'fill-data.papermc.io':
+        name = segments[-1]
+        v, build = name[len('paper-'):-len('.jar')].rsplit('-', 1)
+        return as_jar(url, jar('Paper', f'{v}-{build}'))
+
+    if host == 'api.modrinth.com':
+        if segments == ['v2', 'search']:
+            q = query.get('query', '').lower()
+            hits = [{'project_id': pid, 'slug': slug, 'title': title, 'project_type': 'plugin'}
+                    for slug, (pid, title, _) in MODRINTH.items() if q == slug or q == title.lower()]
+            return as_json(url, {'hits': hits, 'offset': 0, 'limit': 10, 'total_hits': len(hits)})
+        if segments[:2] == ['v2', 'project'] and segments[-1] == 'version':
+            pid = segments[2]
+            slug, (_, title, versions) = next((s, p) for s, p in MODRINTH.items() if p[0] == pid)
+            out = []
+            for v, date, games, files in versions:
+                vid = hashlib.sha1(f'{pid}{v}'.encode()).hexdigest()[:8]
+                entries = []
+                for i, f in enumerate(files):
+                    filename = f.format(v=v)
+                    body = jar(filename.rsplit('-', 1)[0], v)
+                    entries.append({'filename': filename, 'primary': i == 0, 'size': len(body),
+                                    'url': f'https://cdn.modrinth.com/data/{pid}/versions/{vid}/{filename}',
+                                    'hashes': {'sha1': hashlib.sha1(body).hexdigest(), 'sha512': hashlib.sha512(body).hexdigest()}})
+                out.append({'id': vid, 'project_id': pid, 'name': f'{title} {v}', 'version_number': v, 'version_type': 'release',
+                            'date_published': date, 'game_versions': games, 'loaders': ['bukkit', 'paper', 'spigot'], 'files': entries})
+            return as_json(url, out, headers={'ETag': f'W/"{hashlib.sha1(pid.encode()).hexdigest()[:16]}"'})
+    if host == 'cdn.modrinth.com':
+        filename = segments[-1]
+        stem, v = filename[:-len('.jar')].rsplit('-', 1)
+        return as_jar(url, jar(stem, v))
+
+    if host == 'api.spiget.org':
+        rid = segments[2] if len(segments) > 2 else None
+        if rid not in SPIGET:
+            return as_json(url, {'error': 'resource not found'}, status=404)
+        name, tested, versions = SPIGET[rid]
+        if len(segments) == 3:
+            return as_json(url, {'id': int(rid), 'name': name, 'testedVersions': tested, 'version': {'id': versions[0][0]}})
+        if segments[3] == 'versions':
+            page, size = int(query.get('page', 1)), int(query.get('size', 50))
+            batch = versions[(page - 1) * size:page * size]
+            return as_json(url, [{'id': i, 'name': n, 'resource': int(rid), 'releaseDate': 1700000000 + i} for i, n in batch])
+        if segments[3] == 'download':
+            release = int(query['release'])
+            return as_jar(url, jar(name, dict(versions)[release]))
+
+    if host == 'api.github.com':
+        repo = '/'.join(segments[1:3])
+        if repo not in GITHUB or segments[3:] != ['releases']:
+            return as_json(url, {'message': 'Not Found', 'documentation_url': 'https://docs.github.com/rest'}, status=404)
+        out = []
+        for tag, assets in GITHUB[repo]:
+            out.append({'tag_name': tag, 'name': tag, 'draft': False, 'prerelease': False, 'assets': [
+                {'name': a, 'browser_download_url': f'https://github.com/{repo}/releases/download/{tag}/{a}'} for a in assets]})
+        return as_json(url, out, headers={'ETag': f'W/"{hashlib.sha1(repo.encode()).hexdigest()[:16]}"'})
+    if host == 'github.com':
+        tag, name = segments[-2], segments[-1]
+        return as_jar(url, jar(name[:-len('.jar')], tag))
+
+    if host == 'download.geysermc.org':
+        project = segments[2]
+        if project not in GEYSER:
+            return as_json(url, {'error': 'Project not found'}, status=404)
+        title, version, builds, downloads = GEYSER[project]
+        if len(segments) == 3:
+            return as_json(url, {'project_id': project, 'project_name': title, 'versions': [version]})
+        if segments[-1] == 'builds':
+            return as_json(url, {'project_id': project, 'project_name': title, 'version': version, 'builds': [
+                {'build': b, 'time': '2024-12-01T00:00:00Z', 'channel': 'default', 'promoted': False, 'changes': [],
+                 'downloads': {loader: {'name': name, 'sha256': hashlib.sha256(jar(title, f'{version}.{b}')).hexdigest()} for loader, name in downloads.items()}}
+                for b in builds]})
+        if 'downloads' in segments:
+            return as_jar(url, jar(title, f'{version}.{segments[-3]}'))
+
+    raise AssertionError(f'Unhandled request {url}')
+
+
+@pytest.fixture(autouse=True)
+def synthetic_api(monkeypatch):
+    monkeypatch.setattr(requests, 'get', lambda url, **kwargs: handle(url))
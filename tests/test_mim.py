@@ -4,6 +4,19 @@ import os
 import json
 import yaml
 import glob
+import pytest
+import threading
+import zipfile
+from pathlib import Path
+from mim import api, daemon
+from mim.util import Http
+from mim.util.Artifacts import DownloadCancelled, cancellation
+from mim.util.Cache import Cache
+from mim.util.Catalog import Catalog
+from mim.util.Pipeline import FetchPipeline
+from mim.util.Repository import OfflineError, Plugin, PluginAsset, PluginRepository, PluginVersion, Server, ServerRepository
+from mim.util.Routing import RoutingTable
+from mim.util.Verify import Manifest
 
 def test_main_help_and_exit_codes(monkeypatch, capsys):
     # When no func provided (empty argv) -> return 1
@@ -28,16 +41,19 @@ def test_main_help_and_exit_codes(monkeypatch, capsys):
     assert code == 2
     assert 'Error: boom' in captured.err
 
+@pytest.mark.usefixtures('repository_api')
 def test_main_versions_list():
     args = ['versions', '--name', 'WorldEdit', '--loader', 'paper', '--server','1.20.x']
     result = mim.main(args)
     assert result == 0  # Ensure the command executed successfully
 
+@pytest.mark.usefixtures('repository_api')
 def test_main_assets_list():
     args = ['assets', '--name', 'WorldEdit', '--version', '7.3.9']
     result = mim.main(args)
     assert result == 0  # Ensure the command executed successfully
 
+@pytest.mark.usefixtures('repository_api')
 def test_main_download(tmp_path):
     args = ['download', '--name', 'QuickShop-Hikari', '--version', '3.3.0.0', '--asset', 'QuickShop.*', '.*WorldEdit.*', '--destination', tmp_path]
     result = mim.main(args)
@@ -47,6 +63,7 @@ def test_main_download(tmp_path):
     assert os.path.isfile(file1)
     assert os.path.isfile(file2)
 
+@pytest.mark.usefixtures('repository_api')
 def test_main_install(tmp_path):
     # Prepare an install JSON that targets a plugin known to be available in tests
     data = {
@@ -91,6 +108,7 @@ def test_main_install(tmp_path):
     assert qs_matches and os.path.isfile(qs_matches[0])
     # assert qs_matches and qs_matches[0].is_file()
 
+@pytest.mark.usefixtures('repository_api')
 def test_main_install_dryrun(tmp_path):
     # Prepare an install JSON that targets a plugin known to be available in tests
     data = {
@@ -118,4 +136,457 @@ def test_main_install_dryrun(tmp_path):
     # Verify at least one expected asset was not installed into the destination
     qs_matches = glob.glob(os.path.join(tmp_path, "*QuickShop*"))
     assert not qs_matches
-    # assert qs_matches and qs_matches[0].is_file()
\ No newline at end of file
+    # assert qs_matches and qs_matches[0].is_file()
+
+class StubServerRepository(ServerRepository):
+    def __init__(self):
+        super().__init__(name='StubServers')
+        self.servers = [Server(name='Paper', server_version=v, minecraft_version=v, repository=self) for v in ['1.20.4', '1.21', '1.21.1']]
+
+    def list(self):
+        return self.servers
+
+class StubPluginRepository(PluginRepository):
+    def __init__(self):
+        super().__init__(name='StubPlugins')
+
+    def search(self, plugin):
+        servers = ServerRepository.searchAll('1.21.x')
+        return [PluginVersion(plugin=plugin, version=v, repository=self, compatibility=tuple(servers), metadata={'version': v}) for v in ['1.0', '1.1']]
+
+    def listAssets(self, plugin_version):
+        return [PluginAsset(filename=f'{plugin_version.plugin.name}-{plugin_version.version}.jar', plugin_version=plugin_version)]
+
+@pytest.fixture
+def stub_repositories(monkeypatch):
+    for cls in (ServerRepository, PluginRepository):
+        monkeypatch.setattr(cls, '_registry', {})
+        monkeypatch.setattr(cls, 'catalog', None)
+        monkeypatch.setattr(cls, 'offline', False)
+    monkeypatch.setattr(PluginRepository, '_cache', Cache())
+    monkeypatch.setattr(PluginRepository, 'routes', None)
+    return StubServerRepository(), StubPluginRepository()
+
+class FetchedArtifacts(list):
+    """The names of the artifacts fetched into a store directory, in order"""
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def fetch(self, artifact):
+        name = mim.artifact_name(artifact)
+        self.append(name)
+        path = os.path.join(self.store, name)
+        with open(path, 'w') as f:
+            f.write(name)
+        return path
+
+@pytest.fixture
+def fetched(stub_repositories, tmp_path):
+    # Fetch the stub servers and plugins into a store directory, writing each file's name into it
+    store = os.path.join(tmp_path, 'store')
+    os.makedirs(store)
+    servers, plugins = stub_repositories
+    fetched = FetchedArtifacts(store)
+    servers.fetch = plugins.fetch = fetched.fetch
+    return fetched
+
+def test_resolve_offline_lists_everything_missing(stub_repositories, monkeypatch, tmp_path):
+    servers, plugins = stub_repositories
+    catalog = Catalog()
+    catalog.syncServers(servers)
+    catalog.syncPlugin(plugins, Plugin('Synced'))
+    for cls in (ServerRepository, PluginRepository):
+        monkeypatch.setattr(cls, 'catalog', catalog)
+        monkeypatch.setattr(cls, 'offline', True)
+
+    data = {'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Synced'}, {'name': 'Unsynced'}, {'name': 'Other'}]}
+    with pytest.raises(OfflineError) as e:
+        mim.resolve(data)
+    assert e.value.missing == ['metadata for Unsynced from StubPlugins', 'metadata for Other from StubPlugins']
+
+    data['plugins'] = [{'name': 'Synced'}]
+    server, versions = mim.resolve(data)
+    assert server.minecraft_version == '1.21.1'
+    assert [v.version for v in versions] == ['1.1']
+    assert api.missing([api.InstallPlan(None, Path(tmp_path), data, server, versions)]) == [
+        'artifact Paper-1.21.1.jar from StubServers',
+        'artifact Synced-1.1.jar from StubPlugins',
+    ]
+
+def test_compatible_servers_keeps_order(stub_repositories):
+    servers, plugins = stub_repositories
+    s1204, s121, s1211 = servers.servers
+    plugin = Plugin('Example')
+    versions = [PluginVersion(plugin, '1.0', plugins, (s1211,)), PluginVersion(plugin, '1.1', plugins, (s1204, s1211))]
+    assert mim.compatible_servers(versions, [s1211, s121, s1204]) == [s1211, s1204]
+    versions.append(PluginVersion(plugin, '1.2', plugins, None))
+    assert mim.compatible_servers(versions, [s1211, s121]) == [s1211, s121]
+
+def test_install_fleet_fetches_shared_artifacts_once(stub_repositories, fetched, tmp_path):
+    configs = {
+        'lobby': {'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Shared'}, {'name': 'Lobby'}]},
+        'survival': {'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Shared'}]},
+    }
+    fleet = {'servers': []}
+    for name, data in configs.items():
+        (Path(tmp_path) / f'{name}.json').write_text(json.dumps(data))
+        fleet['servers'].append({'file': f'{name}.json', 'destination': name})
+    fleet_file = Path(tmp_path) / 'fleet.yaml'
+    fleet_file.write_text(yaml.safe_dump(fleet))
+
+    mim.install(mim.build_parser().parse_args(['install', '--fleet', str(fleet_file)]))
+    assert sorted(fetched) == ['Lobby-1.1.jar', 'Paper-1.21.1.jar', 'Shared-1.1.jar']
+    assert (Path(tmp_path) / 'lobby' / 'plugins' / 'Lobby-1.1.jar').is_file()
+    assert (Path(tmp_path) / 'survival' / 'plugins' / 'Shared-1.1.jar').is_file()
+    assert (Path(tmp_path) / 'survival' / 'Paper-1.21.1.jar').is_file()
+
+def test_install_targets_pairs_files_and_destinations():
+    args = mim.build_parser().parse_args(['install', '-f', 'a.json', '-d', 'a', '-f', 'b.json', '-d', 'b'])
+    assert mim.install_targets(args) == [(Path('a.json'), Path('a')), (Path('b.json'), Path('b'))]
+    args = mim.build_parser().parse_args(['install', '-f', 'a.json', '-f', 'b.json', '-d', 'b'])
+    with pytest.raises(ValueError):
+        mim.install_targets(args)
+
+def test_daemon_serves_commands(stub_repositories, tmp_path, capsys, monkeypatch):
+    modes = []
+    class RecordingServer(daemon._Server):
+        def server_bind(self):
+            super().server_bind()
+            modes.append(os.stat(self.server_address).st_mode)
+    monkeypatch.setattr(daemon, '_Server', RecordingServer)
+
+    def handle(argv, cwd):
+        args = mim.build_parser().parse_args(argv)
+        mim.absolute_paths(args, cwd)
+        return mim.run_command(args)
+
+    options = {'mirror': None, 'offline': False}
+    server = daemon.Daemon(handle, options, path=os.path.join(tmp_path, 'mim.sock'))
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    try:
+        for _ in range(100):
+            if daemon.status(server.path):
+                break
+            threading.Event().wait(0.05)
+        # Only the owner can connect, from the moment the socket exists
+        assert len(modes) == 1 and modes[0] & 0o077 == 0
+
+        code, stdout, stderr = daemon.request(['versions', '-n', 'Warm', '-s', '1.21.1'], options, path=server.path)
+        assert code == 0
+        assert 'Warm 1.1 (repo=StubPlugins' in stdout
+        assert len(PluginRepository._cache) == 1
+
+        code, stdout, stderr = daemon.request(['assets', '-n', 'Warm', '-v', '9.9'], options, path=server.path)
+        assert (code, stdout) == (0, '')
+
+        assert daemon.request(['versions', '-n', 'Warm'], {'mirror': None, 'offline': True}, path=server.path) is None
+        assert daemon.status(server.path)['requests'] == 2
+
+        server.refresh()
+        assert len(PluginRepository._cache) == 1
+    finally:
+        server.shutdown()
+        thread.join()
+    assert not os.path.exists(server.path)
+    assert daemon.request(['versions', '-n', 'Warm'], options, path=server.path) is None
+
+def test_prefetch_then_offline_install_uses_cache(stub_repositories, tmp_path, monkeypatch):
+    servers, plugins = stub_repositories
+    downloads = []
+    class Download:
+        headers = {}
+        def __init__(self, url):
+            self.url = url
+        def __enter__(self):
+            downloads.append(self.url)
+            return self
+        def __exit__(self, *args):
+            return False
+        def raise_for_status(self):
+            pass
+        def iter_content(self, chunk_size=8192):
+            yield self.url.encode()
+    monkeypatch.setattr(Http.requests, 'get', lambda url, headers=None, stream=False: Download(url))
+    servers.fetch = lambda server: mim.ArtifactCache().fetch(servers.name, server.asset, f'https://example.invalid/{server.asset}')
+    plugins.fetch = lambda asset: mim.ArtifactCache().fetch(plugins.name, asset.filename, f'https://example.invalid/{asset.filename}')
+
+    config = Path(tmp_path) / 'server.json'
+    config.write_text(json.dumps({'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Staged'}]}))
+    dest = Path(tmp_path) / 'server'
+    mim.prefetch(mim.build_parser().parse_args(['prefetch', '-f', str(config), '-d', str(dest)]))
+    assert sorted(downloads) == ['https://example.invalid/Paper-1.21.1.jar', 'https://example.invalid/Staged-1.1.jar']
+    assert not dest.exists()
+
+    monkeypatch.setattr(PluginRepository, 'offline', True)
+    monkeypatch.setattr(ServerRepository, 'offline', True)
+    mim.install(mim.build_parser().parse_args(['install', '-f', str(config), '-d', str(dest)]))
+    assert len(downloads) == 2
+    installed = dest / 'plugins' / 'Staged-1.1.jar'
+    assert installed.read_text() == 'https://example.invalid/Staged-1.1.jar'
+    assert os.path.samefile(installed, mim.ArtifactCache().path(plugins.name, 'Staged-1.1.jar'))
+
+@pytest.mark.usefixtures('fetched')
+def test_install_atomic_swaps_plugin_set(stub_repositories, tmp_path):
+    dest = Path(tmp_path) / 'server'
+    (dest / 'plugins' / 'Atom').mkdir(parents=True)
+    (dest / 'plugins' / 'Atom' / 'config.yml').write_text('data')
+    (dest / 'plugins' / 'Atom-1.0.jar').write_text('old')
+    (dest / 'plugins' / 'Unmanaged.jar').write_text('kept')
+    config = Path(tmp_path) / 'server.json'
+    config.write_text(json.dumps({'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Atom'}]}))
+
+    mim.install(mim.build_parser().parse_args(['install', '-f', str(config), '-d', str(dest), '--atomic']))
+    assert sorted(os.listdir(dest / 'plugins')) == ['.mim-manifest.json', 'Atom', 'Atom-1.1.jar', 'Unmanaged.jar']
+    assert (dest / 'plugins' / 'Atom' / 'config.yml').read_text() == 'data'
+    assert sorted(os.listdir(dest / 'plugins.previous')) == ['Atom-1.0.jar', 'Unmanaged.jar']
+
+    mim.rollback(mim.build_parser().parse_args(['rollback', '-d', str(dest)]))
+    assert sorted(os.listdir(dest / 'plugins')) == ['Atom', 'Atom-1.0.jar', 'Unmanaged.jar']
+
+def test_versions_batch_streams_ndjson(stub_repositories, tmp_path, capsys):
+    servers, plugins = stub_repositories
+    config = Path(tmp_path) / 'server.json'
+    config.write_text(json.dumps({'loader': 'paper', 'server': '1.21', 'plugins': [{'name': 'FromFile'}, {'name': 'First'}]}))
+
+    code = mim.run_command(mim.build_parser().parse_args(['versions', '-n', 'First', '-n', 'Second', '-f', str(config), '--format', 'ndjson']))
+    assert code == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted((r['plugin'], r['version']) for r in records) == [(p, v) for p in ('First', 'FromFile', 'Second') for v in ('1.0', '1.1')]
+    assert all(r['repository'] == 'StubPlugins' and r['compatibility'] == ['1.21', '1.21.1'] for r in records)
+
+    # The server filter of the file applies, and is overridden from the command line
+    code = mim.run_command(mim.build_parser().parse_args(['versions', '-f', str(config), '--server', '1.20.4']))
+    assert code == 0
+    assert capsys.readouterr().out.splitlines() == ['No versions found for FromFile', 'No versions found for First']
+
+    # Configs naming the server range "version" filter the same way
+    config.write_text(json.dumps({'loader': 'paper', 'version': '1.20.4', 'plugins': [{'name': 'FromFile'}]}))
+    code = mim.run_command(mim.build_parser().parse_args(['versions', '-f', str(config)]))
+    assert code == 0
+    assert capsys.readouterr().out.splitlines() == ['No versions found']
+
+    code = mim.run_command(mim.build_parser().parse_args(['assets', '-n', 'First', '-n', 'Second', '-v', '1.1']))
+    assert code == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert 'Assets for First 1.1:' in lines and ' - Second-1.1.jar' in lines
+
+def test_versions_batch_reports_failed_searches(stub_repositories, capsys):
+    class FailingRepository(PluginRepository):
+        def __init__(self):
+            super().__init__(name='Failing')
+        def search(self, plugin):
+            raise Exception('unavailable')
+    FailingRepository()
+
+    code = mim.run_command(mim.build_parser().parse_args(['versions', '-n', 'First', '--format', 'ndjson']))
+    captured = capsys.readouterr()
+    assert code == 2
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    assert {'plugin': 'First', 'id': None, 'repository': 'Failing', 'error': 'unavailable'} in records
+    assert len([r for r in records if 'version' in r]) == 2
+    assert '1 repository searches failed' in captured.err
+
+def test_matrix_shows_newest_compatible_versions(stub_repositories, tmp_path, capsys):
+    servers, plugins = stub_repositories
+    s1204, s121, s1211 = servers.servers
+    versions = {
+        'Old': [('1.0', (s1204, s121)), ('2.0', (s1204,))],
+        'New': [('1.0', (s1204,)), ('2.0', (s121, s1211))],
+        'Any': [('3.0', None)],
+    }
+    plugins.search = lambda plugin: [PluginVersion(plugin, v, plugins, compat) for v, compat in versions[plugin.name]]
+
+    code = mim.run_command(mim.build_parser().parse_args(['matrix', '-n', 'Old', '-n', 'New', '-n', 'Any', '--format', 'json']))
+    assert code == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result['servers'] == ['1.20.4', '1.21', '1.21.1']
+    assert result['plugins'] == {
+        'Old': {'1.20.4': '2.0', '1.21': '1.0', '1.21.1': None},
+        'New': {'1.20.4': '1.0', '1.21': '2.0', '1.21.1': '2.0'},
+        'Any': {'1.20.4': '3.0', '1.21': '3.0', '1.21.1': '3.0'},
+    }
+    assert result['supported_by_all'] == ['1.20.4', '1.21']
+    assert result['highest_supported_by_all'] == '1.21'
+
+    code = mim.run_command(mim.build_parser().parse_args(['matrix', '-n', 'Old', '-n', 'New', '--format', 'csv', '--server', '1.21.x']))
+    assert capsys.readouterr().out.splitlines() == ['plugin,1.21,1.21.1', 'Old,1.0,', 'New,2.0,2.0', 'supported by all,yes,']
+
+    # The server range of a config file applies, whether it is named "server" or "version"
+    config = Path(tmp_path) / 'server.yaml'
+    config.write_text(yaml.safe_dump({'loader': 'paper', 'version': '1.21.x', 'plugins': [{'name': 'Old'}, {'name': 'New'}]}))
+    code = mim.run_command(mim.build_parser().parse_args(['matrix', '-f', str(config), '--format', 'csv']))
+    assert capsys.readouterr().out.splitlines() == ['plugin,1.21,1.21.1', 'Old,1.0,', 'New,2.0,2.0', 'supported by all,yes,']
+
+    code = mim.run_command(mim.build_parser().parse_args(['matrix', '-n', 'Old', '-n', 'New']))
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ['Plugin', '1.21.1', '*1.21*', '1.20.4']
+    assert lines[1].split() == ['Old', '-', '1.0', '2.0']
+    assert lines[-1] == 'Highest server version supported by every plugin: 1.21 (marked *)'
+
+def test_verify_reports_damaged_files(tmp_path, capsys):
+    def make_jar(path):
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as jar:
+            jar.writestr('Example.class', 'class data ' * 200)
+
+    dest = Path(tmp_path) / 'server'
+    plugins = dest / 'plugins'
+    plugins.mkdir(parents=True)
+    make_jar(dest / 'Paper-1.21.1.jar')
+    for name in ('Good.jar', 'Corrupt.jar', 'Modified.jar', 'Missing.jar'):
+        make_jar(plugins / name)
+    manifest = Manifest(str(dest))
+    manifest.record('Paper-1.21.1.jar')
+    manifest.save()
+    manifest = Manifest(str(plugins))
+    for name in ('Good.jar', 'Corrupt.jar', 'Modified.jar', 'Missing.jar'):
+        manifest.record(name)
+    manifest.save()
+
+    (plugins / 'Corrupt.jar').write_bytes((plugins / 'Corrupt.jar').read_bytes()[:100])
+    (plugins / 'Modified.jar').unlink()
+    with zipfile.ZipFile(plugins / 'Modified.jar', 'w') as jar:
+        jar.writestr('Other.class', 'changed')
+    (plugins / 'Missing.jar').unlink()
+    make_jar(plugins / 'Untracked.jar')
+
+    code = mim.run_command(mim.build_parser().parse_args(['verify', '-d', str(dest), '-j', '2']))
+    captured = capsys.readouterr()
+    assert code == 2
+    lines = captured.out.splitlines()
+    assert lines[-1] == 'Verified 6 files in 1 servers: 2 ok, 1 untracked, 1 corrupt, 1 modified, 1 missing'
+    assert sorted(line.split()[0] for line in lines[:-1]) == ['CORRUPT', 'MISSING', 'MODIFIED']
+    assert '3 files failed verification' in captured.err
+
+    (plugins / 'Corrupt.jar').unlink()
+    (plugins / 'Modified.jar').unlink()
+    manifest = Manifest(str(plugins))
+    manifest.save()
+    code = mim.run_command(mim.build_parser().parse_args(['verify', '-d', str(dest), '--verbose']))
+    lines = capsys.readouterr().out.splitlines()
+    assert code == 0
+    assert sorted(line.split()[0] for line in lines[:-1]) == ['OK', 'OK', 'UNTRACKED']
+
+def test_outdated_reports_changes_once(stub_repositories, tmp_path, capsys):
+    servers, plugins = stub_repositories
+    searches = []
+    search = plugins.search
+    plugins.search = lambda plugin: searches.append(plugin.name) or search(plugin)
+
+    config = Path(tmp_path) / 'lobby.json'
+    config.write_text(json.dumps({'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Shared'}, {'name': 'Lobby', 'version': '1.0'}]}))
+    dest = Path(tmp_path) / 'lobby'
+    (dest / 'plugins').mkdir(parents=True)
+    for name in ('Paper-1.21.jar', 'plugins/Shared-1.0.jar', 'plugins/Lobby-1.0.jar'):
+        (dest / name).write_text(name)
+
+    args = ['outdated', '-f', str(config), '-d', str(dest)]
+    assert mim.run_command(mim.build_parser().parse_args(args)) == 1
+    assert sorted(capsys.readouterr().out.splitlines()) == [f'{dest}: Paper 1.21 -> 1.21.1', f'{dest}: Shared 1.0 -> 1.1']
+    assert sorted(searches) == ['Lobby', 'Shared']
+
+    # A second poll within --max-age asks no repository and repeats nothing
+    assert mim.run_command(mim.build_parser().parse_args(args)) == 1
+    assert capsys.readouterr().out == ''
+    assert len(searches) == 2
+    assert mim.run_command(mim.build_parser().parse_args(args + ['--all'])) == 1
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+    (dest / 'Paper-1.21.jar').rename(dest / 'Paper-1.21.1.jar')
+    (dest / 'plugins' / 'Shared-1.0.jar').rename(dest / 'plugins' / 'Shared-1.1.jar')
+    assert mim.run_command(mim.build_parser().parse_args(args + ['--max-age', '0'])) == 0
+    assert sorted(capsys.readouterr().out.splitlines()) == [f'{dest}: Paper up to date', f'{dest}: Shared up to date']
+    assert len(searches) == 4
+
+def test_plugin_searches_follow_pins_and_routes(stub_repositories, monkeypatch):
+    servers, plugins = stub_repositories
+    searched = []
+    class OtherPluginRepository(StubPluginRepository):
+        def __init__(self):
+            PluginRepository.__init__(self, name='OtherPlugins')
+            self.answer = []
+        def search(self, plugin):
+            searched.append(plugin.name)
+            return self.answer
+    other = OtherPluginRepository()
+    monkeypatch.setattr(PluginRepository, 'routes', RoutingTable())
+
+    assert [v.version for v in Plugin('Routed').versions] == ['1.0', '1.1']
+    assert searched == ['Routed']
+    assert PluginRepository.routes.get('Routed') == ['stubplugins']
+    PluginRepository._cache.invalidate()
+    assert [v.version for v in Plugin('Routed').versions] == ['1.0', '1.1']
+    assert searched == ['Routed']
+    assert [v.version for v in Plugin('Routed', repository='StubPlugins').versions] == ['1.0', '1.1']
+    assert len(PluginRepository._cache) == 1
+
+    assert Plugin('Pinned', repository='OtherPlugins').versions == []
+    assert searched == ['Routed', 'Pinned']
+
+    # A failed search does not route the plugin away from the failing repository
+    other.answer = None
+    assert [v.version for v in Plugin('Failed').versions] == ['1.0', '1.1']
+    assert PluginRepository.routes.get('Failed') is None
+    with pytest.raises(ValueError, match='Unknown repository Missing for Pinned'):
+        mim.find_versions('Pinned', None, None, None, 'Missing')
+
+@pytest.mark.usefixtures('fetched')
+def test_api_plans_without_changes_then_applies(stub_repositories, tmp_path):
+    servers, plugins = stub_repositories
+
+    dest = Path(tmp_path) / 'server'
+    (dest / 'plugins').mkdir(parents=True)
+    for name in ('Paper-1.21.jar', 'plugins/Shared-1.0.jar', 'plugins/Kept-1.1.jar'):
+        (dest / name).write_text(name)
+    data = {'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Shared'}, {'name': 'Kept'}, {'name': 'New'}]}
+
+    plan = api.plan(data, dest)
+    summary = json.loads(json.dumps(plan.to_dict()))
+    assert summary['server']['action'] == 'update'
+    assert [(f['action'], os.path.basename(f['path'])) for f in summary['server']['files']] == [('add', 'Paper-1.21.1.jar'), ('remove', 'Paper-1.21.jar')]
+    assert [(p['name'], p['installed'], p['version'], p['action']) for p in summary['plugins']] == [
+        ('Shared', '1.0', '1.1', 'update'), ('Kept', '1.1', '1.1', 'keep'), ('New', None, '1.1', 'install'),
+    ]
+    assert sorted(os.listdir(dest / 'plugins')) == ['Kept-1.1.jar', 'Shared-1.0.jar']
+
+    applied = api.apply(plan)
+    assert sorted((a.action, a.filename) for a in applied) == [
+        ('add', 'New-1.1.jar'), ('add', 'Paper-1.21.1.jar'), ('add', 'Shared-1.1.jar'), ('remove', 'Paper-1.21.jar'), ('remove', 'Shared-1.0.jar'),
+    ]
+    assert sorted(os.listdir(dest / 'plugins')) == ['.mim-manifest.json', 'Kept-1.1.jar', 'New-1.1.jar', 'Shared-1.1.jar']
+    assert not api.plan(data, dest).changed
+
+def test_install_downloads_while_plugins_are_searched(stub_repositories, fetched, tmp_path):
+    servers, plugins = stub_repositories
+    started = threading.Event()
+    def fetch(artifact):
+        started.set()
+        # The first guess of the server is rejected, and its download cancelled part way through
+        if mim.artifact_name(artifact) == 'Paper-1.21.1.jar':
+            assert cancellation.get().wait(5)
+            raise DownloadCancelled('Download cancelled')
+        return fetched.fetch(artifact)
+    servers.fetch = fetch
+    plugins.fetch = fetch
+    search = plugins.search
+    def slow_search(plugin):
+        # The server download starts before any plugin metadata arrives
+        assert started.wait(5)
+        versions = search(plugin)
+        if plugin.name == 'Legacy':
+            legacy = tuple(s for s in ServerRepository.searchAll('1.21') if s.server_version == '1.21')
+            for version in versions:
+                version.compatibility = legacy
+        return versions
+    plugins.search = slow_search
+
+    data = {'loader': 'paper', 'server': '1.21.x', 'plugins': [{'name': 'Any'}, {'name': 'Legacy'}]}
+    with FetchPipeline(2) as pipeline:
+        plans = api.plan_many([(data, Path(tmp_path) / 'server')], pipeline=pipeline)
+        paths = api.fetch(plans, pipeline=pipeline)
+    assert plans[0].server.version == '1.21'
+    assert pipeline.cancelled == 1
+    assert sorted(name for _, name in paths) == ['Any-1.1.jar', 'Legacy-1.1.jar', 'Paper-1.21.jar']
+    assert sorted(fetched) == ['Any-1.1.jar', 'Legacy-1.1.jar', 'Paper-1.21.jar']
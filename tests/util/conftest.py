@@ -6,22 +6,22 @@ from src.mim.util.GeyserRepository import GeyserRepository
 import pytest
 
 
-@pytest.fixture(autouse=True,scope='session')
+@pytest.fixture(autouse=True)
 def spiget_repository():
     return SpigetRepository()
 
-@pytest.fixture(autouse=True,scope='session')
+@pytest.fixture(autouse=True)
 def paper_repository():
     return PaperRepository()
 
-@pytest.fixture(autouse=True,scope='session')
+@pytest.fixture(autouse=True)
 def github_repository():
     return GithubRepository()
 
-@pytest.fixture(autouse=True,scope='session')
+@pytest.fixture(autouse=True)
 def modrinth_repository():
     return ModrinthRepository()
 
-@pytest.fixture(autouse=True,scope='session')
+@pytest.fixture(autouse=True)
 def geyser_repository():
     return GeyserRepository()
\ No newline at end of file
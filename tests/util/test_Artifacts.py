@@ -0,0 +1,113 @@
+from mim.util.Artifacts import ArtifactCache, DownloadCancelled, cancellation
+from mim.util.Repository import OfflineError, PluginRepository
+import mim.util.Http
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+class FakeStream:
+    headers = {}
+
+    def __init__(self, body:bytes):
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=8192):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+@pytest.fixture
+def downloads(monkeypatch):
+    requested = []
+    def fake_get(url, headers=None, stream=False):
+        requested.append(url)
+        return FakeStream(url.encode() * 1000)
+    monkeypatch.setattr(mim.util.Http.requests, 'get', fake_get)
+    return requested
+
+def test_artifact_cache_reuses_downloads(downloads, tmp_path):
+    cache = ArtifactCache()
+    first = cache.install('Example', 'example-1.0.jar', tmp_path, 'https://example.invalid/1.0')
+    assert os.path.isfile(first)
+    os.remove(first)
+    second = cache.install('Example', 'example-1.0.jar', tmp_path, 'https://example.invalid/1.0')
+    assert second == first
+    assert downloads == ['https://example.invalid/1.0']
+    with open(second, 'rb') as f:
+        assert f.read() == b'https://example.invalid/1.0' * 1000
+
+def test_artifact_cache_redownloads_when_url_changes(downloads, tmp_path):
+    cache = ArtifactCache()
+    cache.install('Example', 'server.jar', tmp_path, 'https://example.invalid/build/1')
+    resolved = []
+    def resolve():
+        resolved.append(1)
+        return 'https://example.invalid/build/2'
+    cache.install('Example', 'server.jar', tmp_path, resolve)
+    assert resolved == [1]
+    assert downloads == ['https://example.invalid/build/1', 'https://example.invalid/build/2']
+
+def test_artifact_cache_offline(downloads, tmp_path, monkeypatch):
+    cache = ArtifactCache()
+    cache.install('Example', 'cached.jar', tmp_path, 'https://example.invalid/cached')
+    monkeypatch.setattr(PluginRepository, 'offline', True)
+
+    def unreachable():
+        raise AssertionError('URL resolution must not run offline')
+    assert os.path.isfile(cache.install('Example', 'cached.jar', tmp_path, unreachable))
+    with pytest.raises(OfflineError) as e:
+        cache.install('Example', 'missing.jar', tmp_path, unreachable)
+    assert e.value.missing == ['artifact missing.jar from Example']
+    assert len(downloads) == 1
+
+def test_artifact_cache_concurrent_fetches_download_once(downloads):
+    cache = ArtifactCache()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = set(pool.map(lambda _: cache.fetch('Example', 'shared.jar', 'https://example.invalid/shared'), range(16)))
+    assert len(paths) == 1
+    assert downloads == ['https://example.invalid/shared']
+
+def test_artifact_cache_reads_raw_streams_into_a_buffer(tmp_path, monkeypatch):
+    import io
+    import requests
+    body = os.urandom(300000)
+    def fake_get(url, headers=None, stream=False):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.headers = requests.structures.CaseInsensitiveDict({'Content-Length': str(len(body))})
+        response.raw = io.BytesIO(body)
+        # Reads must go through readinto, not allocate chunks
+        response.iter_content = None
+        return response
+    monkeypatch.setattr(mim.util.Http.requests, 'get', fake_get)
+    monkeypatch.setattr(ArtifactCache, 'buffer_size', 65536)
+    path = ArtifactCache().fetch('Example', 'raw.jar', 'https://example.invalid/raw')
+    with open(path, 'rb') as f:
+        assert f.read() == body
+
+def test_artifact_cache_stops_cancelled_downloads(tmp_path, monkeypatch):
+    event = threading.Event()
+    class Stream(FakeStream):
+        def iter_content(self, chunk_size=8192):
+            yield b'x' * chunk_size
+            event.set()
+            yield b'x' * chunk_size
+    monkeypatch.setattr(mim.util.Http.requests, 'get', lambda url, headers=None, stream=False: Stream(b''))
+    cache = ArtifactCache(os.path.join(tmp_path, 'artifacts'))
+    token = cancellation.set(event)
+    try:
+        with pytest.raises(DownloadCancelled):
+            cache.fetch('Example', 'speculative.jar', 'https://example.invalid/speculative')
+    finally:
+        cancellation.reset(token)
+    assert os.listdir(os.path.join(tmp_path, 'artifacts', 'example')) == []
+    assert cache.fetch('Example', 'speculative.jar', 'https://example.invalid/speculative')
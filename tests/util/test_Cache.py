@@ -0,0 +1,89 @@
+from mim.util.Cache import Cache
+from mim.util.Repository import Plugin, PluginRepository, PluginVersion
+import mim.util.Cache
+import threading
+import time
+import pytest
+
+class CountingRepository(PluginRepository):
+    def __init__(self, delay:float=0):
+        super().__init__(name='Counting')
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, plugin:Plugin) -> list[PluginVersion]|None:
+        self.calls += 1
+        time.sleep(self.delay)
+        return [PluginVersion(plugin=plugin, version='1.0.0', repository=self)]
+
+@pytest.fixture
+def isolated_registry(monkeypatch):
+    monkeypatch.setattr(PluginRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_cache', Cache())
+
+def test_cache_lru_eviction():
+    cache = Cache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+    assert len(cache) == 2
+
+def test_cache_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(mim.util.Cache.time, 'monotonic', lambda: now[0])
+    cache = Cache(ttl=10)
+    cache.set('a', 1)
+    now[0] += 5
+    assert cache.get('a') == 1
+    cache.set('b', 2)
+    assert cache.keys() == ['a', 'b']
+    now[0] += 6
+    assert cache.keys() == ['b']
+    assert cache.get('a') is None
+
+def test_cache_get_or_load_coalesces_concurrent_loads():
+    cache = Cache()
+    calls = []
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.getOrLoad('key', loader))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+def test_cache_get_or_load_does_not_cache_errors():
+    cache = Cache()
+    def failing():
+        raise RuntimeError('boom')
+    with pytest.raises(RuntimeError):
+        cache.getOrLoad('key', failing)
+    assert cache.getOrLoad('key', lambda: 'ok') == 'ok'
+
+def test_searchall_memoizes_per_plugin(isolated_registry):
+    repo = CountingRepository()
+    first = PluginRepository.searchAll(Plugin('Example'))
+    second = PluginRepository.searchAll(Plugin('Example'))
+    assert repo.calls == 1
+    assert first == second
+    PluginRepository.searchAll(Plugin('Example', id='other'))
+    assert repo.calls == 2
+
+def test_searchall_single_flight(isolated_registry):
+    repo = CountingRepository(delay=0.1)
+    threads = [threading.Thread(target=PluginRepository.searchAll, args=(Plugin('Example'),)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert repo.calls == 1
@@ -0,0 +1,137 @@
+from mim.util.Cache import Cache
+from mim.util.Catalog import Catalog
+from mim.util.Repository import Plugin, PluginRepository, PluginVersion, Server, ServerRepository
+import os
+import pytest
+
+class ListServerRepository(ServerRepository):
+    def __init__(self):
+        super().__init__(name='List')
+        self.servers = [Server(name='Paper', server_version=v, minecraft_version=v, repository=self) for v in ['1.20.4', '1.21', '1.21.1']]
+
+    def list(self) -> list[Server]:
+        return self.servers
+
+class IncrementalRepository(PluginRepository):
+    """Serves a growing list of versions and only returns those newer than the sync state"""
+
+    def __init__(self, servers):
+        super().__init__(name='Incremental')
+        self.servers = servers
+        self.published = ['1.0', '1.1']
+        self.compatible = servers[1:]
+        self.searches = 0
+
+    def search(self, plugin:Plugin) -> list[PluginVersion]|None:
+        self.searches += 1
+        return self.sync(plugin, {})
+
+    def sync(self, plugin:Plugin, state:dict) -> list[PluginVersion]|None:
+        known = state.get('known', 0)
+        if known == len(self.published):
+            return None
+        fresh = self.published[known:]
+        state['known'] = len(self.published)
+        compatibility = tuple(self.compatible)
+        return [PluginVersion(plugin=plugin, version=v, repository=self, compatibility=compatibility, metadata={'name': v}) for v in fresh]
+
+@pytest.fixture
+def repositories(monkeypatch):
+    monkeypatch.setattr(ServerRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_cache', Cache())
+    monkeypatch.setattr(PluginRepository, 'catalog', None)
+    servers = ListServerRepository()
+    return servers, IncrementalRepository(servers.servers)
+
+def test_catalog_default_path_uses_cache_dir(cache_dir):
+    assert Catalog.defaultPath() == os.path.join(cache_dir, 'catalog.sqlite3')
+
+def test_catalog_incremental_sync(repositories):
+    servers, repository = repositories
+    catalog = Catalog()
+    plugin = Plugin('Example')
+
+    assert catalog.search(repository, plugin) is None
+    assert catalog.syncPlugin(repository, plugin) == 2
+    assert catalog.syncPlugin(repository, plugin) == 0
+
+    repository.published.append('1.2')
+    assert catalog.syncPlugin(repository, plugin) == 1
+
+    versions = catalog.search(repository, plugin)
+    assert [v.version for v in versions] == ['1.0', '1.1', '1.2']
+    assert [v.metadata for v in versions] == [{'name': '1.0'}, {'name': '1.1'}, {'name': '1.2'}]
+    # Compatibility resolves to the live server objects and is shared between versions
+    assert versions[0].compatibility == tuple(servers.servers[1:])
+    assert versions[0].compatibility is versions[2].compatibility
+
+def test_catalog_answers_searchall(repositories, monkeypatch):
+    _, repository = repositories
+    catalog = Catalog()
+    catalog.syncPlugin(repository, Plugin('Example'))
+    monkeypatch.setattr(PluginRepository, 'catalog', catalog)
+
+    versions = PluginRepository.searchAll(Plugin('Example'))
+    assert [v.version for v in versions] == ['1.0', '1.1']
+    assert repository.searches == 0
+
+    # Plugins which were never synced fall back to the repository
+    PluginRepository.searchAll(Plugin('Other'))
+    assert repository.searches == 1
+
+def test_catalog_stale_sync_searches_the_repository(repositories, monkeypatch):
+    _, repository = repositories
+    catalog = Catalog()
+    catalog.syncPlugin(repository, Plugin('Example'))
+    monkeypatch.setattr(PluginRepository, 'catalog', catalog)
+    monkeypatch.setattr(Catalog, 'max_age', 0)
+
+    repository.published.append('1.2')
+    versions = PluginRepository.searchAll(Plugin('Example'))
+    assert [v.version for v in versions] == ['1.0', '1.1', '1.2']
+    assert repository.searches == 1
+
+    # Offline, the last sync still answers
+    monkeypatch.setattr(PluginRepository, 'offline', True)
+    PluginRepository._cache.invalidate()
+    versions = PluginRepository.searchAll(Plugin('Example'))
+    assert [v.version for v in versions] == ['1.0', '1.1']
+    assert repository.searches == 1
+
+def test_catalog_servers(repositories):
+    servers, _ = repositories
+    catalog = Catalog()
+    assert catalog.listServers(servers) is None
+    assert catalog.syncServers(servers) == 3
+    assert catalog.syncServers(servers) == 0
+    assert [s.minecraft_version for s in catalog.listServers(servers)] == ['1.20.4', '1.21', '1.21.1']
+
+    # Servers withdrawn upstream are dropped on the next sync
+    servers.servers = servers.servers[1:]
+    assert catalog.syncServers(servers) == 0
+    assert [s.minecraft_version for s in catalog.listServers(servers)] == ['1.21', '1.21.1']
+
+def test_catalog_full_resync_prunes_and_refreshes(repositories, monkeypatch):
+    servers, repository = repositories
+    catalog = Catalog()
+    plugin = Plugin('Example')
+    assert catalog.syncPlugin(repository, plugin) == 2
+
+    # Upstream withdraws 1.0 and corrects the compatibility of 1.1, which an incremental sync misses
+    repository.published.remove('1.0')
+    repository.compatible = servers.servers[2:]
+    assert catalog.syncPlugin(repository, plugin) == 0
+    assert [v.version for v in catalog.search(repository, plugin)] == ['1.0', '1.1']
+
+    assert catalog.syncPlugin(repository, plugin, full=True) == 2
+    versions = catalog.search(repository, plugin)
+    assert [v.version for v in versions] == ['1.1']
+    assert versions[0].compatibility == tuple(servers.servers[2:])
+
+    # Full syncs also happen on their own once the last one is older than resync_age
+    repository.published.append('1.2')
+    repository.published.remove('1.1')
+    monkeypatch.setattr(Catalog, 'resync_age', 0)
+    assert catalog.syncPlugin(repository, plugin) == 2
+    assert [v.version for v in catalog.search(repository, plugin)] == ['1.2']
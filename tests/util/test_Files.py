@@ -0,0 +1,23 @@
+from mim.util.Files import copy_file, write_chunks
+import os
+
+def test_copy_file_copies_large_files(tmp_path):
+    source = os.path.join(tmp_path, 'source.jar')
+    body = os.urandom(3 * 1048576 + 17)
+    with open(source, 'wb') as f:
+        f.write(body)
+    target = copy_file(source, os.path.join(tmp_path, 'target.jar'))
+    with open(target, 'rb') as f:
+        assert f.read() == body
+
+def test_write_chunks_trims_preallocation(tmp_path):
+    path = os.path.join(tmp_path, 'download.jar')
+    buffer = memoryview(bytearray(b'abcd'))
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT)
+    try:
+        # A body shorter than its Content-Length leaves no zeros behind
+        assert write_chunks(fd, [buffer[:4], buffer[:2], b'xyz'], size=100) == 9
+    finally:
+        os.close(fd)
+    with open(path, 'rb') as f:
+        assert f.read() == b'abcdabxyz'
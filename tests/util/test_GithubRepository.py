@@ -2,6 +2,8 @@ from mim.util.Repository import Plugin
 import pytest
 import os
 
+pytestmark = pytest.mark.usefixtures('repository_api')
+
 github_plugins = [
     # ('GlobalEffects','saro476/GlobalEffects'),
     ('QuickShop-Hikari','QuickShop-Community/QuickShop-Hikari')
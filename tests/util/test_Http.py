@@ -0,0 +1,73 @@
+from mim.util.StandIn import StandInServer
+import mim.util.Http
+import requests
+import os
+import time
+import pytest
+
+def response(url:str, body:bytes, status:int=200) -> requests.Response:
+    r = requests.models.Response()
+    r.status_code = status
+    r.reason = 'OK'
+    r.url = url
+    r.headers = requests.structures.CaseInsensitiveDict({'Content-Type': 'application/json', 'ETag': '"abc"', 'Content-Encoding': 'gzip'})
+    r._content = body
+    return r
+
+@pytest.fixture
+def recorded(monkeypatch, tmp_path):
+    """Records two responses in a fixture directory, then switches to replay"""
+    fixtures = os.path.join(tmp_path, 'fixtures')
+    monkeypatch.setenv('MIM_HTTP_FIXTURES', fixtures)
+    monkeypatch.setenv('MIM_HTTP_MODE', 'record')
+    requested = []
+    def get(url, **kwargs):
+        requested.append((url, kwargs))
+        return response(url, b'{"versions": [1, 2]}' if 'project' in url else b'x' * 100000)
+    monkeypatch.setattr(mim.util.Http.requests, 'get', get)
+
+    mim.util.Http.get('https://api.modrinth.com/v2/project/abc1/version', params={'loaders': '["paper"]'})
+    mim.util.Http.get('https://cdn.modrinth.com/data/abc1/Example-1.0.jar', stream=True)
+    # Recording reads bodies whole, so that they can be saved
+    assert [kwargs for _, kwargs in requested] == [{}, {}]
+
+    def offline(url, **kwargs):
+        raise AssertionError(f'Unexpected request to {url}')
+    monkeypatch.setattr(mim.util.Http.requests, 'get', offline)
+    monkeypatch.setenv('MIM_HTTP_MODE', 'replay')
+    return fixtures
+
+def test_replay_returns_recorded_responses(recorded):
+    r = mim.util.Http.get('https://api.modrinth.com/v2/project/abc1/version', params={'loaders': '["paper"]'})
+    assert r.status_code == 200
+    assert r.json() == {'versions': [1, 2]}
+    assert r.headers['ETag'] == '"abc"'
+    assert 'Content-Encoding' not in r.headers
+
+    with mim.util.Http.get('https://cdn.modrinth.com/data/abc1/Example-1.0.jar', stream=True) as r:
+        assert sum(len(chunk) for chunk in r.iter_content(8192)) == 100000
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        mim.util.Http.get('https://api.modrinth.com/v2/project/abc1/version')
+
+def test_standin_serves_recorded_responses(recorded, monkeypatch):
+    monkeypatch.setenv('MIM_HTTP_MODE', 'live')
+    monkeypatch.setattr(mim.util.Http.requests, 'get', requests.api.get)
+    with StandInServer(recorded, latency=0.05, bandwidth=1000000) as server:
+        monkeypatch.setenv('MIM_HTTP_STANDIN', server.url)
+
+        start = time.perf_counter()
+        r = mim.util.Http.get('https://api.modrinth.com/v2/project/abc1/version', params={'loaders': '["paper"]'})
+        assert r.json() == {'versions': [1, 2]}
+        assert time.perf_counter() - start >= 0.05
+
+        r = mim.util.Http.get('https://cdn.modrinth.com/data/abc1/Example-1.0.jar', stream=True)
+        assert len(r.content) == 100000
+        # Sent at about 1 MB/s
+        assert time.perf_counter() - start >= 0.15
+
+        r = mim.util.Http.get('https://cdn.modrinth.com/data/abc1/Missing.jar')
+        assert r.status_code == 502
+        assert server.requests == 2
+        assert server.bytes == 100000 + len(b'{"versions": [1, 2]}')
+        assert server.missing == ['https://cdn.modrinth.com/data/abc1/Missing.jar']
@@ -0,0 +1,76 @@
+from mim.util.Lock import FileLock, LockManager
+import json
+import os
+import subprocess
+import sys
+import time
+
+HOLD = """
+import fcntl, sys, time
+f = open(sys.argv[1], 'a')
+fcntl.lockf(f, fcntl.LOCK_EX)
+print('locked', flush=True)
+time.sleep(float(sys.argv[2]))
+"""
+
+def hold(path, seconds):
+    process = subprocess.Popen([sys.executable, '-c', HOLD, path, str(seconds)], stdout=subprocess.PIPE, text=True)
+    assert process.stdout.readline().strip() == 'locked'
+    return process
+
+def test_lock_waits_for_other_process(tmp_path):
+    lock = LockManager(tmp_path).lock('artifact paper/Paper-1.21.1.jar')
+    process = hold(lock.path, 0.5)
+    try:
+        assert not lock.acquire(timeout=0.1)
+        with lock:
+            assert lock.owner()['pid'] == os.getpid()
+    finally:
+        process.wait()
+    assert lock.owner() is None
+
+def test_lock_breaks_stale_lock_from_other_host(tmp_path):
+    lock = FileLock(os.path.join(tmp_path, 'stale.lock'), stale=60)
+    process = hold(lock.path, 30)
+    try:
+        with open(lock.path, 'w') as f:
+            json.dump({'host': 'elsewhere.invalid', 'pid': 1, 'time': time.time() - 120}, f)
+        assert lock.acquire(timeout=5)
+        lock.release()
+    finally:
+        process.kill()
+        process.wait()
+
+def test_lock_keeps_fresh_lock_from_other_host(tmp_path):
+    lock = FileLock(os.path.join(tmp_path, 'fresh.lock'), stale=60)
+    process = hold(lock.path, 30)
+    try:
+        with open(lock.path, 'w') as f:
+            json.dump({'host': 'elsewhere.invalid', 'pid': 1, 'time': time.time()}, f)
+        assert not lock.acquire(timeout=0.3)
+    finally:
+        process.kill()
+        process.wait()
+
+def test_concurrent_breakers_keep_the_new_lock(tmp_path):
+    path = os.path.join(tmp_path, 'contended.lock')
+    first, second = FileLock(path, stale=60), FileLock(path, stale=60)
+    process = hold(path, 30)
+    try:
+        with open(path, 'w') as f:
+            json.dump({'host': 'elsewhere.invalid', 'pid': 1, 'time': time.time() - 120}, f)
+        # Both waiters judge the lock stale before either breaks it
+        judged = first._stale()
+        assert judged is not None and second._stale() == judged
+        first._break(judged)
+        assert first.acquire(timeout=1)
+        try:
+            # The slower breaker finds the new lock file and leaves it in place
+            second._break(judged)
+            assert os.stat(path).st_ino == os.fstat(first._fd).st_ino
+            assert first.owner()['pid'] == os.getpid()
+        finally:
+            first.release()
+    finally:
+        process.kill()
+        process.wait()
@@ -0,0 +1,99 @@
+from mim.util.Cache import Cache
+from mim.util.MirrorRepository import MirrorBuilder, MirrorRepository, MirrorServerRepository, mirror_key
+from mim.util.Repository import Plugin, PluginAsset, PluginRepository, PluginVersion, Server, ServerRepository
+import os
+import pytest
+
+class StubServerRepository(ServerRepository):
+    def __init__(self):
+        super().__init__(name='StubServers')
+        self.servers = [Server(name='Paper', server_version=v, minecraft_version=v, repository=self) for v in ['1.20.4', '1.21.1']]
+
+    def list(self) -> list[Server]:
+        return self.servers
+
+    def install(self, server:Server, destination:str) -> str:
+        path = os.path.join(destination, server.asset)
+        with open(path, 'w') as f:
+            f.write(server.server_version)
+        return path
+
+class StubPluginRepository(PluginRepository):
+    def __init__(self, servers:list[Server]):
+        super().__init__(name='StubPlugins')
+        self.servers = servers
+
+    def search(self, plugin:Plugin) -> list[PluginVersion]|None:
+        return [
+            PluginVersion(plugin=plugin, version='1.0', repository=self, compatibility=tuple(self.servers[:1])),
+            PluginVersion(plugin=plugin, version='2.0', repository=self, compatibility=tuple(self.servers)),
+        ]
+
+    def listAssets(self, plugin_version:PluginVersion) -> list[PluginAsset]:
+        return [PluginAsset(filename=f'{plugin_version.plugin.name}-{plugin_version.version}.jar', plugin_version=plugin_version)]
+
+    def install(self, plugin_asset:PluginAsset, destination:str) -> str:
+        path = os.path.join(destination, plugin_asset.filename)
+        with open(path, 'w') as f:
+            f.write(plugin_asset.version)
+        return path
+
+@pytest.fixture
+def registries(monkeypatch):
+    for cls in (ServerRepository, PluginRepository):
+        monkeypatch.setattr(cls, '_registry', {})
+        monkeypatch.setattr(cls, 'catalog', None)
+        monkeypatch.setattr(cls, 'offline', False)
+    monkeypatch.setattr(PluginRepository, '_cache', Cache())
+
+def test_mirror_key():
+    assert mirror_key(Plugin('QuickShop-Hikari')) == 'quickshop-hikari'
+    assert mirror_key(Plugin('Death Chest', id='Owner/Repo')) == 'death_chest__owner_repo'
+
+def test_mirror_round_trip(registries, monkeypatch, tmp_path):
+    upstream_servers = StubServerRepository()
+    upstream_plugins = StubPluginRepository(upstream_servers.servers)
+    mirror_dir = os.path.join(tmp_path, 'mirror')
+
+    plugin = Plugin('Example')
+    versions = PluginRepository.searchAll(plugin)
+    builder = MirrorBuilder(mirror_dir)
+    builder.addServers(upstream_servers)
+    builder.addPlugin(plugin, versions)
+    builder.addServerFile(upstream_servers.servers[-1])
+    builder.addPluginFile(versions[-1].assets[0])
+    builder.finish()
+
+    # Read the mirror back with no upstream repositories registered
+    monkeypatch.setattr(ServerRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_cache', Cache())
+    servers = MirrorServerRepository(mirror_dir)
+    repository = MirrorRepository(mirror_dir, servers)
+
+    assert [s.minecraft_version for s in ServerRepository.searchAll('1.21.x')] == ['1.21.1']
+    mirrored = PluginRepository.searchAll(Plugin('Example'))
+    assert [v.version for v in mirrored] == ['1.0', '2.0']
+    assert all(v.repository == repository for v in mirrored)
+    assert [s.minecraft_version for s in mirrored[1].compatibility] == ['1.20.4', '1.21.1']
+    assert all(s.repository == servers for s in mirrored[1].compatibility)
+
+    # Pins share the cached search, the mirror limits it to the pinned upstream
+    assert len(PluginRepository.searchAll(Plugin('Example', repository='StubPlugins'))) == 2
+    assert PluginRepository.searchAll(Plugin('Example', repository='Other')) == []
+    assert len(PluginRepository._cache) == 1
+
+    install_dir = os.path.join(tmp_path, 'server')
+    os.makedirs(install_dir)
+    server_file = servers.list()[-1].install(install_dir)
+    assert os.path.basename(server_file) == 'Paper-1.21.1.jar'
+    files = mirrored[1].install(install_dir)
+    assert [os.path.basename(f) for f in files] == ['Example-2.0.jar']
+    with pytest.raises(FileNotFoundError):
+        mirrored[0].install(install_dir)
+
+    # Local mirrors remain usable offline
+    monkeypatch.setattr(PluginRepository, 'offline', True)
+    monkeypatch.setattr(ServerRepository, 'offline', True)
+    monkeypatch.setattr(PluginRepository, '_cache', Cache())
+    assert len(PluginRepository.searchAll(Plugin('Example'))) == 2
@@ -1,4 +1,8 @@
+import pytest
 import os
+
+pytestmark = pytest.mark.usefixtures('repository_api')
+
 def test_list_paper_servers(paper_repository):
     servers = paper_repository.list()
     assert len(servers) > 0
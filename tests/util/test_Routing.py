@@ -0,0 +1,20 @@
+from mim.util.Routing import RoutingTable
+import os
+
+def test_routes_are_merged_and_expire(tmp_path):
+    path = os.path.join(tmp_path, 'routes.json')
+    first, second = RoutingTable(path), RoutingTable(path)
+    first.record('LuckPerms', None, ['Modrinth', 'Spiget'])
+    second.record('Geyser', 'GeyserMC/Geyser', ['Github'])
+    first.save()
+    second.save()
+
+    table = RoutingTable(path)
+    assert table.get('LuckPerms') == ['modrinth', 'spiget']
+    assert table.get('Geyser', 'GeyserMC/Geyser') == ['github']
+    assert table.get('Geyser') is None
+
+    # Plugins found nowhere have no route, and old routes are ignored
+    table.record('LuckPerms', None, [])
+    assert table.get('LuckPerms') is None
+    assert RoutingTable(path, ttl=0).get('Geyser', 'GeyserMC/Geyser') is None
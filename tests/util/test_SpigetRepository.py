@@ -2,6 +2,8 @@ from mim.util.Repository import Plugin
 import pytest
 import os
 
+pytestmark = pytest.mark.usefixtures('repository_api')
+
 spiget_plugins = [
     ('Death Chest','101066'),
     # ('GlobalEffects','113887')
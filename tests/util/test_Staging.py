@@ -0,0 +1,59 @@
+from mim.util.Staging import StagedDirectory
+import json
+import os
+import pytest
+
+def write(path, text=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+def listing(path):
+    return sorted(os.listdir(path))
+
+@pytest.fixture
+def plugins(tmp_path):
+    path = os.path.join(tmp_path, 'plugins')
+    write(os.path.join(path, 'Keep-1.0.jar'), 'keep')
+    write(os.path.join(path, 'Old-1.0.jar'), 'old')
+    write(os.path.join(path, 'Old', 'config.yml'), 'data')
+    return path
+
+def test_stage_commit_and_rollback(plugins):
+    staged = StagedDirectory(plugins)
+    staging = staged.stage(lambda name: name != 'Old-1.0.jar')
+    write(os.path.join(staging, 'Old-2.0.jar'), 'new')
+    assert listing(plugins) == ['Keep-1.0.jar', 'Old', 'Old-1.0.jar']
+    assert os.path.samefile(os.path.join(staging, 'Keep-1.0.jar'), os.path.join(plugins, 'Keep-1.0.jar'))
+
+    staged.commit()
+    assert listing(plugins) == ['Keep-1.0.jar', 'Old', 'Old-2.0.jar']
+    assert listing(staged.previous) == ['Keep-1.0.jar', 'Old-1.0.jar']
+    assert not os.path.exists(staged.staging)
+
+    staged.rollback()
+    assert listing(plugins) == ['Keep-1.0.jar', 'Old', 'Old-1.0.jar']
+    assert listing(staged.previous) == ['Keep-1.0.jar', 'Old-2.0.jar']
+
+def test_recover_completes_interrupted_swap(plugins):
+    staged = StagedDirectory(plugins)
+    staging = staged.stage(lambda name: name != 'Old-1.0.jar')
+    write(os.path.join(staging, 'Old-2.0.jar'), 'new')
+
+    # Crash after the live directory was moved out, before the staging directory was moved in
+    with open(staged.journal, 'w') as f:
+        json.dump({'incoming': staged.staging}, f)
+    os.rename(os.path.join(plugins, 'Old'), os.path.join(staging, 'Old'))
+    os.rename(plugins, staged.outgoing)
+
+    assert StagedDirectory(plugins).recover()
+    assert listing(plugins) == ['Keep-1.0.jar', 'Old', 'Old-2.0.jar']
+    assert listing(staged.previous) == ['Keep-1.0.jar', 'Old-1.0.jar']
+    assert not os.path.exists(staged.journal)
+    assert not StagedDirectory(plugins).recover()
+
+def test_stage_discards_uncommitted_staging(plugins):
+    staged = StagedDirectory(plugins)
+    write(os.path.join(staged.staging, 'Partial.jar'))
+    staged.stage()
+    assert listing(staged.staging) == ['Keep-1.0.jar', 'Old-1.0.jar']
@@ -0,0 +1,74 @@
+from mim.util.Artifacts import ArtifactCache
+from mim.util.Throttle import DownloadBudget, parse_rate
+import mim.util.Http
+import json
+import os
+import threading
+import time
+import pytest
+
+def test_parse_rate():
+    assert parse_rate('500K') == 500 * 1024
+    assert parse_rate('1.5MiB/s') == 1.5 * 1024 * 1024
+    assert parse_rate('2g') == 2 * 1024 ** 3
+    assert parse_rate('1000') == 1000
+    assert parse_rate(None) is None and parse_rate('0') is None
+    with pytest.raises(ValueError):
+        parse_rate('fast')
+
+def test_load_reads_limits_per_host(tmp_path):
+    with open(os.path.join(tmp_path, 'limits.json'), 'w') as f:
+        json.dump({'bandwidth': '10M', 'downloads': 4, 'hosts': {os.uname().nodename: {'downloads': 2}, 'elsewhere': {'downloads': 8}}}, f)
+    budget = DownloadBudget.load(tmp_path)
+    assert (budget.bandwidth, budget.downloads) == (10 * 1024 ** 2, 2)
+    assert budget.directory == os.path.join(tmp_path, 'throttle')
+    budget = DownloadBudget.load(tmp_path, bandwidth='1M', downloads=0)
+    assert (budget.bandwidth, budget.downloads) == (1024 ** 2, None)
+    assert not DownloadBudget.load(os.path.join(tmp_path, 'empty')).enabled
+
+def test_slots_limit_concurrent_downloads(tmp_path):
+    budgets = [DownloadBudget(tmp_path, downloads=2, poll=0.01) for _ in range(4)]
+    active, peak = [0], [0]
+    guard = threading.Lock()
+    def download(budget):
+        with budget.slot():
+            with guard:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.1)
+            with guard:
+                active[0] -= 1
+    threads = [threading.Thread(target=download, args=(b,)) for b in budgets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+
+def test_bandwidth_is_shared_through_the_directory(tmp_path):
+    # Separate budgets over one directory stand for separate processes
+    first = DownloadBudget(tmp_path, bandwidth=100000, burst=0)
+    second = DownloadBudget(tmp_path, bandwidth=100000, burst=0)
+    start = time.perf_counter()
+    first.consume(20000)
+    second.consume(20000)
+    assert time.perf_counter() - start >= 0.35
+
+def test_artifact_downloads_use_the_budget(tmp_path, monkeypatch):
+    class FakeStream:
+        headers = {}
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            return False
+        def raise_for_status(self):
+            pass
+        def iter_content(self, chunk_size=8192):
+            for _ in range(8):
+                yield b'x' * 8192
+    monkeypatch.setattr(mim.util.Http.requests, 'get', lambda url, **kwargs: FakeStream())
+    monkeypatch.setattr(ArtifactCache, 'budget', DownloadBudget(os.path.join(tmp_path, 'throttle'), bandwidth=200000, burst=0))
+    start = time.perf_counter()
+    path = ArtifactCache().fetch('Example', 'throttled.jar', 'https://example.invalid/throttled')
+    assert os.path.getsize(path) == 65536
+    assert time.perf_counter() - start >= 0.3
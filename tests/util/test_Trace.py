@@ -0,0 +1,61 @@
+from mim.util.Http import url_template
+from mim.util.Trace import tracer
+import mim.util.Http
+import json
+import os
+import pytest
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body:bytes):
+        self.content = body
+
+    def iter_content(self, chunk_size=8192):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+@pytest.fixture
+def tracing(monkeypatch):
+    monkeypatch.setattr(tracer, 'enabled', True)
+    tracer.reset()
+    monkeypatch.setattr(mim.util.Http.requests, 'get', lambda url, **kwargs: FakeResponse(b'x' * 10000))
+    yield tracer
+    tracer.reset()
+
+def test_url_template():
+    assert url_template('https://api.spiget.org/v2/resources/28140/versions?size=50&page=2&sort=-id') == '/v2/resources/{}/versions?size={}&page={}&sort={}'
+    assert url_template('https://fill.papermc.io/v3/projects/paper/versions/1.21.1/builds') == '/v3/projects/paper/versions/{}/builds'
+
+def test_http_requests_are_traced(tracing, tmp_path):
+    mim.util.Http.get('https://api.modrinth.com/v2/project/abc1/version', template='/v2/project/{id}/version')
+    mim.util.Http.get('https://api.modrinth.com/v2/project/def2/version', template='/v2/project/{id}/version')
+    response = mim.util.Http.get('https://cdn.modrinth.com/data/abc1/Example-1.0.jar', stream=True)
+    assert len(tracing.requests) == 2
+    assert sum(len(chunk) for chunk in response.iter_content(4096)) == 10000
+    with tracing.span('download'):
+        tracing.cache('artifacts', False)
+
+    assert [(r['host'], r['template'], r['bytes']) for r in tracing.requests] == [
+        ('api.modrinth.com', '/v2/project/{id}/version', 10000),
+        ('api.modrinth.com', '/v2/project/{id}/version', 10000),
+        ('cdn.modrinth.com', '/data/{}/{}', 10000),
+    ]
+    summary = tracing.summary()
+    assert 'api.modrinth.com' in summary and '/v2/project/{id}/version' in summary
+    assert 'artifacts' in summary
+
+    path = os.path.join(tmp_path, 'trace.json')
+    tracing.write(path)
+    with open(path) as f:
+        trace = json.load(f)
+    assert {e['cat'] for e in trace['traceEvents']} == {'http', 'phase'}
+    assert trace['otherData']['caches'] == {'artifacts': {'hits': 0, 'misses': 1}}
+
+def test_disabled_tracer_records_nothing(monkeypatch):
+    monkeypatch.setattr(mim.util.Http.requests, 'get', lambda url, **kwargs: FakeResponse(b''))
+    tracer.reset()
+    mim.util.Http.get('https://example.invalid/')
+    with tracer.span('ignored'):
+        pass
+    assert tracer.requests == [] and tracer.spans == []
@@ -0,0 +1,51 @@
+from mim.util.Verify import Manifest, verify_file
+import hashlib
+import json
+import os
+import zipfile
+
+def make_jar(path, text='class data ' * 200):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as jar:
+        jar.writestr('plugin.yml', 'name: Example')
+        jar.writestr('Example.class', text)
+    return path
+
+def test_verify_file_checks_zip_and_hashes(tmp_path):
+    jar = make_jar(os.path.join(tmp_path, 'ok.jar'))
+    result = verify_file(jar, ('sha256', 'sha1'))
+    with open(jar, 'rb') as f:
+        data = f.read()
+    assert result['error'] is None and result['size'] == len(data)
+    assert result['digests'] == {'sha256': hashlib.sha256(data).hexdigest(), 'sha1': hashlib.sha1(data).hexdigest()}
+
+    # Flip a byte inside the compressed class file
+    corrupt = os.path.join(tmp_path, 'corrupt.jar')
+    with zipfile.ZipFile(jar) as archive:
+        offset = archive.getinfo('Example.class').header_offset + 60
+    with open(corrupt, 'wb') as f:
+        f.write(data[:offset] + bytes([data[offset] ^ 0xff]) + data[offset + 1:])
+    assert verify_file(corrupt)['error']
+
+    truncated = os.path.join(tmp_path, 'truncated.jar')
+    with open(truncated, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    assert verify_file(truncated)['error'].startswith('Not a valid jar')
+
+    empty = os.path.join(tmp_path, 'empty.jar')
+    open(empty, 'wb').close()
+    assert verify_file(empty)['error'] == 'Empty file'
+
+def test_manifest_records_and_prunes(tmp_path):
+    make_jar(os.path.join(tmp_path, 'a.jar'))
+    make_jar(os.path.join(tmp_path, 'b.jar'))
+    manifest = Manifest(tmp_path)
+    manifest.record('a.jar', ('sha1', 'abc'), repository='Modrinth', version='1.0')
+    manifest.record('b.jar')
+    os.remove(os.path.join(tmp_path, 'b.jar'))
+    manifest.save()
+
+    with open(os.path.join(tmp_path, Manifest.FILENAME)) as f:
+        files = json.load(f)['files']
+    assert list(files) == ['a.jar']
+    assert files['a.jar']['checksum'] == 'sha1:abc' and files['a.jar']['version'] == '1.0'
+    assert Manifest(tmp_path).get('a.jar') == files['a.jar']
@@ -0,0 +1,84 @@
+from mim.util.Versioning import VersionIndex, VersionRange, version_key
+from mim.util.Repository import Plugin, PluginVersion, Server, ServerRepository
+import pytest
+
+ordered_versions = [
+    'nightly',
+    '1.0.0-SNAPSHOT',
+    '1.0.0-alpha.1',
+    '1.0.0-beta',
+    '1.0.0-beta.2',
+    '1.0.0-rc1',
+    '1.0.0',
+    '1.0.0+build.5',
+    '1.0.1',
+    'v2.1-beta',
+    'v2.1',
+    '2.10',
+    '10.0',
+]
+
+def test_version_key_total_order():
+    shuffled = list(reversed(ordered_versions))
+    assert sorted(shuffled, key=version_key) == ordered_versions
+
+@pytest.mark.parametrize("a,b", [('1.20', '1.20.0'), ('v1.2.3', '1.2.3'), ('1.21.1-130', '1.21.1-build130')])
+def test_version_key_equivalent(a, b):
+    assert version_key(a)[:4] == version_key(b)[:4]
+
+def test_version_key_numeric_not_lexical():
+    assert version_key('1.21.1-99') < version_key('1.21.1-130')
+    assert version_key('1.9') < version_key('1.10')
+
+def test_sort_key_precomputed():
+    plugin = Plugin('Example')
+    versions = [PluginVersion(plugin=plugin, version=v, repository=None) for v in ['v2.1-beta', '2.0', 'v2.1']]
+    assert max(versions, key=lambda v: v.sort_key).version == 'v2.1'
+    server = Server(name='Paper', server_version='1.21.1', minecraft_version='1.21.1', repository=None)
+    assert server.sort_key == version_key('1.21.1')
+
+catalog = ['1.19.4', '1.20', '1.20.1', '1.20.4', '1.20.6', '1.21-pre1', '1.21', '1.21.1', '1.21.10', '2.0']
+
+@pytest.mark.parametrize("expression,expected", [
+    ('1.20.x', ['1.20', '1.20.1', '1.20.4', '1.20.6']),
+    ('1.x.x', catalog[:-1]),
+    ('*', catalog),
+    ('>=1.20.4,<1.21', ['1.20.4', '1.20.6']),
+    ('~1.20', ['1.20', '1.20.1', '1.20.4', '1.20.6']),
+    ('~1.21.1', ['1.21.1', '1.21.10']),
+    ('^1.20', catalog[1:-1]),
+    ('1.20.1', ['1.20.1']),
+    ('1.20.0', ['1.20']),
+    ('1.19.x || >1.21.1', ['1.19.4', '1.21.10', '2.0']),
+    ('1.20.x,!=1.20.4', ['1.20', '1.20.1', '1.20.6']),
+    ('>=1.21,<1.20', []),
+])
+def test_version_index_query(expression, expected):
+    index = VersionIndex(catalog)
+    assert index.query(expression) == sorted(expected, key=version_key)
+    assert [v for v in catalog if v in VersionRange.parse(expression)] == expected
+
+def test_version_range_does_not_overmatch():
+    # 1.2.x must not match 1.20 the way the old regex translation did
+    assert '1.20' not in VersionRange.parse('1.2.x')
+    assert '1.2.5' in VersionRange.parse('1.2.x')
+
+@pytest.mark.parametrize("expression", ['>=', '>=abc', '>=1.x'])
+def test_version_range_invalid(expression):
+    with pytest.raises(ValueError):
+        VersionRange.parse(expression)
+
+class ListServerRepository(ServerRepository):
+    def __init__(self, versions):
+        super().__init__(name='List')
+        self.servers = [Server(name='Paper', server_version=v, minecraft_version=v, repository=self) for v in versions]
+
+    def list(self) -> list[Server]:
+        return self.servers
+
+def test_server_repository_search(monkeypatch):
+    monkeypatch.setattr(ServerRepository, '_registry', {})
+    repository = ListServerRepository(catalog)
+    servers = ServerRepository.searchAll('>=1.20.4,<1.21')
+    assert [s.minecraft_version for s in servers] == ['1.20.4', '1.20.6']
+    assert all(s.repository == repository for s in servers)
@@ -0,0 +1,121 @@
+from mim.util.Repository import Plugin, PluginAsset, PluginRepository, PluginVersion, Server, ServerRepository
+from mim.util.SpigetRepository import SpigetRepository
+import mim.util.SpigetRepository
+import pytest
+
+def test_model_objects_use_slots():
+    plugin = Plugin('Example')
+    version = PluginVersion(plugin=plugin, version='1.0.0', repository=None)
+    objects = [
+        plugin,
+        version,
+        PluginAsset(filename='Example-1.0.0.jar', plugin_version=version),
+        Server(name='Paper', server_version='1.21.1', minecraft_version='1.21.1', repository=None),
+    ]
+    for obj in objects:
+        assert not hasattr(obj, '__dict__')
+        with pytest.raises(AttributeError):
+            obj.unexpected = True
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+class ListServerRepository(ServerRepository):
+    def __init__(self):
+        super().__init__(name='List')
+        self.servers = [Server(name='Paper', server_version=v, minecraft_version=v, repository=self) for v in ['1.20.1', '1.20.4', '1.21']]
+
+    def list(self) -> list[Server]:
+        return self.servers
+
+def test_spiget_versions_share_trimmed_metadata(monkeypatch):
+    monkeypatch.setattr(ServerRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_registry', {})
+    ListServerRepository()
+    repository = SpigetRepository()
+
+    def fake_get(url, **kwargs):
+        if url.endswith('/resources/1'):
+            return FakeResponse({'testedVersions': ['1.20']})
+        return FakeResponse([
+            {'id': 11, 'name': '1.1', 'releaseDate': 0, 'downloads': 5, 'rating': {'count': 0}},
+            {'id': 10, 'name': '1.0', 'releaseDate': 0, 'downloads': 9, 'rating': {'count': 0}},
+        ])
+    monkeypatch.setattr(mim.util.SpigetRepository.requests, 'get', fake_get)
+
+    versions = repository.search(Plugin('Example', id='1'))
+    assert [v.version for v in versions] == ['1.1', '1.0']
+    assert [v.metadata for v in versions] == [{'id': 11}, {'id': 10}]
+    assert isinstance(versions[0].compatibility, tuple)
+    assert versions[0].compatibility is versions[1].compatibility
+    assert [s.minecraft_version for s in versions[0].compatibility] == ['1.20.1', '1.20.4']
+
+def test_spiget_sync_reports_unchanged_as_none(monkeypatch):
+    monkeypatch.setattr(ServerRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_registry', {})
+    ListServerRepository()
+    repository = SpigetRepository()
+
+    def fake_get(url, **kwargs):
+        if url.endswith('/resources/1'):
+            return FakeResponse({'testedVersions': ['1.20'], 'version': {'id': 11}})
+        return FakeResponse([
+            {'id': 11, 'name': '1.1', 'releaseDate': 0},
+            {'id': 10, 'name': '1.0', 'releaseDate': 0},
+        ])
+    monkeypatch.setattr(mim.util.SpigetRepository.requests, 'get', fake_get)
+
+    state = {}
+    assert [v.version for v in repository.sync(Plugin('Example', id='1'), state)] == ['1.1', '1.0']
+    assert state == {'last_id': 11}
+    assert repository.sync(Plugin('Example', id='1'), state) is None
+
+def test_spiget_search_tells_missing_from_failed(monkeypatch):
+    repository = SpigetRepository()
+    status = {'code': 404}
+    monkeypatch.setattr(mim.util.SpigetRepository.requests, 'get', lambda url, **kwargs: FakeResponse({}, status['code']))
+
+    assert repository.search(Plugin('Example')) == []
+    assert repository.search(Plugin('Example', id='1')) == []
+    status['code'] = 429
+    assert repository.search(Plugin('Example', id='1')) is None
+
+def test_repositories_are_created_on_first_use(monkeypatch):
+    monkeypatch.setattr(ServerRepository, '_registry', {})
+    monkeypatch.setattr(PluginRepository, '_registry', {})
+    created = []
+    def factory():
+        created.append(1)
+        return ListServerRepository()
+    ServerRepository.register('List', factory)
+    assert created == []
+
+    assert ServerRepository.repository('list').name == 'List'
+    assert [r.name for r in ServerRepository.repositories()] == ['List']
+    assert [s.server_version for s in ServerRepository.searchAll('1.20.x')] == ['1.20.1', '1.20.4']
+    assert created == [1]
+
+def test_configure_imports_no_repository_module():
+    import subprocess, sys
+    code = (
+        'import sys, mim.mim as m\n'
+        'm.configure(m.build_parser().parse_args(["versions", "-n", "Example"]))\n'
+        'print(sorted(n for n in sys.modules if n == "requests" or n == "yaml" or n.endswith("Repository") and n != "mim.util.Repository"))\n'
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+def test_cli_start_defers_file_checking_and_catalog_modules():
+    import subprocess, sys
+    code = (
+        'import sys, mim.mim as m\n'
+        'm.configure(m.build_parser().parse_args(["versions", "-n", "Example"]))\n'
+        'print(sorted(n for n in ("hashlib", "mmap", "sqlite3", "mim.util.Verify", "mim.util.Catalog") if n in sys.modules))\n'
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'